@@ -1,5 +1,8 @@
+import asyncio
+import os
 import time
 import random
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from typing import Optional
 from fastapi import FastAPI, Header, HTTPException
 from pydantic import BaseModel
@@ -10,6 +13,26 @@ app = FastAPI(
     version="0.1.0"
 )
 
+# --- Worker-Pool ---
+# Teure Berechnungen laufen im Pool, damit die Event-Loop weiter Anfragen bedient.
+# "thread" für Arbeit, die den GIL freigibt (Sleep, I/O), "process" für CPU-lastigen Python-Code.
+COMPUTE_EXECUTOR = os.environ.get("COMPUTE_EXECUTOR", "thread")
+COMPUTE_WORKERS = int(os.environ.get("COMPUTE_WORKERS", "8"))
+# Berechnungen, die höchstens auf einen freien Worker warten; darüber gibt es 503
+COMPUTE_QUEUE = int(os.environ.get("COMPUTE_QUEUE", "64"))
+compute_executor = (ProcessPoolExecutor if COMPUTE_EXECUTOR == "process" else ThreadPoolExecutor)(max_workers=COMPUTE_WORKERS)
+compute_pending = 0
+
+async def run_computation(fn, *args):
+    global compute_pending
+    if compute_pending >= COMPUTE_WORKERS + COMPUTE_QUEUE:
+        raise HTTPException(status_code=503, detail="Service overloaded", headers={"Retry-After": "1"})
+    compute_pending += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(compute_executor, fn, *args)
+    finally:
+        compute_pending -= 1
+
 # --- Datenmodelle ---
 class AnalysisRequest(BaseModel):
     text: str
@@ -62,8 +85,8 @@ async def analyze_text(
     # 2. Start der 'teuren' Verarbeitung
     start_time = time.time()
     
-    # Simuliere Arbeit (CPU-intensiv)
-    expensive_computation()
+    # Simuliere Arbeit (CPU-intensiv) im Worker-Pool
+    await run_computation(expensive_computation)
     
     # Generiere Dummy-Ergebnis
     sentiment = random.uniform(-1.0, 1.0)
@@ -0,0 +1,70 @@
+"""
+Benchmark: latency per tier under overload, FIFO vs. tier priority.
+
+Simulates requests arriving at 1.5x the capacity of a fixed number of
+computation slots, 20% of them pro. Computations are asyncio sleeps of
+20-80ms (the real 200-800ms scaled down by 10). Prints p50/p99 latency of
+the completed requests and how many were shed with 503, per tier.
+
+Run from the project root:
+    python -m benchmarks.bench_admission
+"""
+import asyncio
+import random
+import time
+from typing import Dict, List
+from src.admission import PriorityAdmissionQueue
+from src.concurrency import AdaptiveConcurrencyLimiter, ConcurrencyLimitExceeded
+
+SLOTS = 4
+REQUESTS = 2_000
+OVERLOAD = 1.5
+PRO_SHARE = 0.2
+TIMEOUT = 0.5
+
+
+def percentile(values: List[float], p: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))] if values else float("nan")
+
+
+async def simulate(head_start: Dict[str, float], seed: int = 1) -> Dict[str, dict]:
+    rng = random.Random(seed)
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=SLOTS, min_limit=SLOTS, max_limit=SLOTS, latency_threshold=1.0)
+    queue = PriorityAdmissionQueue(limiter, timeout=TIMEOUT, head_start=head_start)
+    results = {"free": {"latency": [], "shed": 0}, "pro": {"latency": [], "shed": 0}}
+
+    async def request(tier: str, duration: float):
+        arrived = time.monotonic()
+        try:
+            async with queue.slot(tier):
+                await asyncio.sleep(duration)
+        except ConcurrencyLimitExceeded:
+            results[tier]["shed"] += 1
+            return
+        results[tier]["latency"].append(time.monotonic() - arrived)
+
+    # Mean computation takes 50ms, so SLOTS slots serve SLOTS / 0.05 requests/s
+    interval = 0.05 / SLOTS / OVERLOAD
+    tasks = []
+    for _ in range(REQUESTS):
+        tier = "pro" if rng.random() < PRO_SHARE else "free"
+        tasks.append(asyncio.create_task(request(tier, rng.uniform(0.02, 0.08))))
+        await asyncio.sleep(rng.expovariate(1 / interval))
+    await asyncio.gather(*tasks)
+    return results
+
+
+def main():
+    for name, head_start in [("fifo", {}), ("priority", {"pro": 2.0})]:
+        results = asyncio.run(simulate(head_start))
+        for tier, result in results.items():
+            latency = result["latency"]
+            print(
+                f"{name:<10}{tier:<6}p50 {percentile(latency, 0.5) * 1000:>7.1f} ms"
+                f"  p99 {percentile(latency, 0.99) * 1000:>7.1f} ms  shed {result['shed']:>5}"
+            )
+
+
+if __name__ == "__main__":
+    main()
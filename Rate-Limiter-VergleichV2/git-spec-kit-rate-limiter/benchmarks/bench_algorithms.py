@@ -0,0 +1,44 @@
+"""
+Microbenchmark: decision latency of the rate limiting algorithms.
+
+Run from the project root:
+    python -m benchmarks.bench_algorithms
+"""
+import time
+from src import rate_limiter
+from src.algorithms import ALGORITHMS
+from src.rate_limiter import check_rate_limit, RateLimitExceeded
+
+DECISIONS = 200_000
+CLIENTS = 1_000
+
+
+def bench_algorithm(name: str, decisions: int = DECISIONS, clients: int = CLIENTS) -> float:
+    """Return the mean cost of one check_rate_limit call in nanoseconds."""
+    rate_limiter.rate_limit_store.clear()
+    previous = rate_limiter.TIER_ALGORITHMS["free"]
+    rate_limiter.TIER_ALGORITHMS["free"] = name
+    client_ids = [f"10.0.{i // 256}.{i % 256}" for i in range(clients)]
+    try:
+        start = time.perf_counter_ns()
+        for i in range(decisions):
+            try:
+                check_rate_limit(client_ids[i % clients], "free")
+            except RateLimitExceeded:
+                pass
+        return (time.perf_counter_ns() - start) / decisions
+    finally:
+        rate_limiter.TIER_ALGORITHMS["free"] = previous
+        rate_limiter.rate_limit_store.clear()
+
+
+def main():
+    baseline = bench_algorithm("fixed_window")
+    print(f"{'algorithm':<16}{'ns/decision':>14}{'vs fixed':>10}")
+    for name in sorted(ALGORITHMS):
+        cost = baseline if name == "fixed_window" else bench_algorithm(name)
+        print(f"{name:<16}{cost:>14.0f}{cost / baseline:>9.2f}x")
+
+
+if __name__ == "__main__":
+    main()
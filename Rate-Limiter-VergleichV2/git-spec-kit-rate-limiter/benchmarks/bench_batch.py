@@ -0,0 +1,75 @@
+"""
+Benchmark: items/s of /analyze/batch vs. single /analyze calls.
+
+CLIENTS clients analyze ITEMS short texts together, either one /analyze
+call per text or /analyze/batch calls of BATCH_SIZE texts, with several
+micro-batch sizes. A computation sleeps 20-80ms (the real 200-800ms scaled
+down by 10) whatever the number of texts it analyzes. All texts differ,
+so the result cache cannot answer them. Rate limits are raised out of
+reach and CLIENTS computation slots are available, so only the
+computations limit throughput.
+
+Run from the project root:
+    python -m benchmarks.bench_batch
+"""
+import asyncio
+import random
+import time
+import httpx
+from src import main as service, rate_limiter, route_limits
+from src.admission import PriorityAdmissionQueue
+from src.concurrency import AdaptiveConcurrencyLimiter
+from src.executor import ComputationPool
+
+CLIENTS = 8
+ITEMS = 1_024
+BATCH_SIZE = 64
+MICRO_BATCH_SIZES = [1, 16, 64]
+
+
+def computation():
+    time.sleep(random.uniform(0.02, 0.08))
+
+
+async def run(batch_size: int) -> float:
+    """Items/s with `batch_size` texts per request, single calls if 0."""
+    transport = httpx.ASGITransport(app=service.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        requests = ITEMS // (batch_size or 1)
+        remaining = iter(range(requests))
+
+        async def worker():
+            for request in remaining:
+                if batch_size:
+                    items = [{"text": f"kurz {request} {i}"} for i in range(batch_size)]
+                    response = await client.post("/analyze/batch", json={"items": items})
+                else:
+                    response = await client.post("/analyze", json={"text": f"kurz {request}"})
+                assert response.status_code == 200, response.text
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(CLIENTS)))
+        return ITEMS / (time.perf_counter() - started)
+
+
+def main():
+    rate_limiter.LIMIT_IP = rate_limiter.LIMIT_GLOBAL = None
+    route_limits.set_route_table(route_limits.compile_routes(
+        {"POST /analyze": {"free": 10**9}, "POST /analyze/batch": {"free": 10**9}}
+    ))
+    service.expensive_computation = computation
+    service.computation_pool = ComputationPool("thread", workers=CLIENTS)
+    # CLIENTS computation slots; nothing is shed, so every variant completes all items
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=CLIENTS, min_limit=CLIENTS, max_limit=CLIENTS)
+    service.admission_queue = PriorityAdmissionQueue(limiter, max_depth=ITEMS, timeout=60.0)
+
+    print(f"{'single':<22}{asyncio.run(run(0)):>8.1f} items/s")
+    for micro_batch_size in MICRO_BATCH_SIZES:
+        service.ANALYZE_MICRO_BATCH_SIZE = micro_batch_size
+        name = f"batch {BATCH_SIZE}, micro {micro_batch_size}"
+        print(f"{name:<22}{asyncio.run(run(BATCH_SIZE)):>8.1f} items/s")
+    service.computation_pool.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Benchmark: /analyze throughput and latency with request coalescing, by
+coalescing window.
+
+CLIENTS clients send single /analyze calls back to back for DURATION
+seconds. A computation sleeps 20-80ms (the real 200-800ms scaled down by
+10) whatever the number of texts it analyzes, and SLOTS computation slots
+are available. Every request has its own text, so coalescing is measured
+and not the merging of identical requests (single-flight); the result
+cache is off, and rate limits are raised out of reach.
+
+Run from the project root:
+    python -m benchmarks.bench_coalescing
+"""
+import asyncio
+import itertools
+import random
+import time
+from typing import List
+import httpx
+from src import main as service, metrics, rate_limiter, result_cache, route_limits
+from src.admission import PriorityAdmissionQueue
+from src.coalescing import RequestCoalescer
+from src.concurrency import AdaptiveConcurrencyLimiter
+from src.executor import ComputationPool
+
+CLIENTS = 64
+SLOTS = 8
+DURATION = 3.0
+MAX_BATCH_SIZE = 16
+WINDOWS_MS = [0, 1, 5, 20]
+
+
+def computation():
+    time.sleep(random.uniform(0.02, 0.08))
+
+
+def percentile(values: List[float], p: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))] if values else float("nan")
+
+
+async def load() -> List[float]:
+    transport = httpx.ASGITransport(app=service.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        deadline = time.monotonic() + DURATION
+        latency = []
+
+        texts = itertools.count()
+
+        async def analyze():
+            while time.monotonic() < deadline:
+                started = time.monotonic()
+                response = await client.post("/analyze", json={"text": f"kurz {next(texts)}"})
+                assert response.status_code == 200, response.text
+                latency.append(time.monotonic() - started)
+
+        await asyncio.gather(*(analyze() for _ in range(CLIENTS)))
+    return latency
+
+
+def main():
+    rate_limiter.LIMIT_IP = rate_limiter.LIMIT_GLOBAL = None
+    route_limits.set_route_table(route_limits.compile_routes({"POST /analyze": {"free": 10**9}}))
+    result_cache.analysis_cache = None
+    service.expensive_computation = computation
+    service.computation_pool = ComputationPool("thread", workers=SLOTS)
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=SLOTS, min_limit=SLOTS, max_limit=SLOTS)
+    service.admission_queue = PriorityAdmissionQueue(limiter, max_depth=CLIENTS, timeout=60.0)
+
+    for window_ms in WINDOWS_MS:
+        service.analysis_coalescer = RequestCoalescer(
+            service.analyze_coalesced, MAX_BATCH_SIZE, window_ms / 1000
+        ) if window_ms else None
+        batches = metrics.analyze_batch_size.count, metrics.analyze_batch_size.sum
+        latency = asyncio.run(load())
+        mean_batch = (metrics.analyze_batch_size.sum - batches[1]) / (metrics.analyze_batch_size.count - batches[0])
+        print(
+            f"window {window_ms:>3} ms  {len(latency) / DURATION:>7.1f} req/s"
+            f"  p50 {percentile(latency, 0.5) * 1000:>6.1f} ms  p99 {percentile(latency, 0.99) * 1000:>6.1f} ms"
+            f"  batch {mean_batch:>5.1f}"
+        )
+    service.computation_pool.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Benchmark: per-request overhead of the metrics.
+
+Compares check_rate_limit (instrumented) with the same decision made
+without recording metrics, and times the single metric operations and the
+heavy-hitter tracker (every one of the 1000 clients evicts another from the
+256 tracked keys, its worst case).
+
+Run from the project root:
+    python -m benchmarks.bench_metrics
+"""
+import time
+from src import heavy_hitters, metrics, rate_limiter
+from src.rate_limiter import check_rate_limit, RateLimitExceeded
+
+DECISIONS = 200_000
+CLIENTS = 1_000
+
+
+def bench(decide, decisions: int = DECISIONS) -> float:
+    """Return the mean cost of `decide(client_id)` in nanoseconds."""
+    client_ids = [f"10.0.{i // 256}.{i % 256}" for i in range(CLIENTS)]
+    rate_limiter.rate_limit_store.clear()
+    start = time.perf_counter_ns()
+    for i in range(decisions):
+        try:
+            decide(client_ids[i % CLIENTS])
+        except RateLimitExceeded:
+            pass
+    return (time.perf_counter_ns() - start) / decisions
+
+
+def uninstrumented(client_id: str):
+    limit, algorithm = rate_limiter._tier_policy("free")
+    wait = rate_limiter.rate_limit_backend.acquire(
+        client_id, algorithm, time.time(), limit, rate_limiter.WINDOW_SIZE_SECONDS
+    )
+    if wait > 0:
+        raise RateLimitExceeded(retry_after=rate_limiter.retry_after_seconds(wait))
+
+
+def main():
+    with_metrics = bench(lambda client_id: check_rate_limit(client_id, "free"))
+    without_metrics = bench(uninstrumented)
+    counter = metrics.rate_limit_decisions.labels("free", "allowed")
+    inc = bench(lambda _: counter.inc())
+    labelled_inc = bench(lambda _: metrics.rate_limit_decisions.labels("free", "allowed").inc())
+    observe = bench(lambda _: metrics.rate_limit_decision_seconds.observe(3e-6))
+    tracker = heavy_hitters.HeavyHitterTracker()
+    heavy_hitter = bench(lambda client_id: tracker.record(client_id, False, 1000.0))
+
+    print(f"{'check_rate_limit with metrics':<34}{with_metrics:>10.0f} ns")
+    print(f"{'check_rate_limit without metrics':<34}{without_metrics:>10.0f} ns")
+    print(f"{'overhead per decision':<34}{with_metrics - without_metrics:>10.0f} ns")
+    print(f"{'counter.inc':<34}{inc:>10.0f} ns")
+    print(f"{'counter.labels(...).inc':<34}{labelled_inc:>10.0f} ns")
+    print(f"{'histogram.observe':<34}{observe:>10.0f} ns")
+    print(f"{'heavy hitter record':<34}{heavy_hitter:>10.0f} ns")
+
+
+if __name__ == "__main__":
+    main()
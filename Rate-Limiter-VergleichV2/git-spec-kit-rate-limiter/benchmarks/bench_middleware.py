@@ -0,0 +1,84 @@
+"""
+Benchmark: cost of a rejected /analyze request, dependency vs. ASGI middleware.
+
+Requests are passed to the ASGI app directly (no server, no HTTP client) for
+a client that is already over its limit, so the numbers are the framework
+and limiter cost of saying 429.
+
+Run from the project root:
+    python -m benchmarks.bench_middleware
+"""
+import asyncio
+import json
+import time
+from src import rate_limiter
+from src.main import app
+from src.middleware import RateLimitMiddleware
+
+REQUESTS = 5_000
+BODY_SIZES = [100, 10_000, 100_000]
+
+
+def make_body(size: int) -> bytes:
+    return json.dumps({"text": "x" * max(size - 30, 1), "language": "de"}).encode()
+
+
+async def bench_path(asgi_app, body: bytes, requests: int = REQUESTS) -> float:
+    """Return the mean cost of one rejected request in microseconds."""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": "/analyze",
+        "raw_path": b"/analyze",
+        "query_string": b"",
+        "root_path": "",
+        "headers": [
+            (b"host", b"bench"),
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+        ],
+        "client": ("10.0.0.1", 1234),
+        "server": ("bench", 80),
+    }
+    message = {"type": "http.request", "body": body, "more_body": False}
+    statuses = []
+
+    async def receive():
+        return message
+
+    async def send(event):
+        if event["type"] == "http.response.start":
+            statuses.append(event["status"])
+
+    # Exhaust the quota of the client
+    for _ in range(rate_limiter.LIMIT_FREE):
+        await rate_limiter.check_rate_limit_async("10.0.0.1", "free")
+
+    start = time.perf_counter()
+    for _ in range(requests):
+        await asgi_app(dict(scope, state={}), receive, send)
+    elapsed = time.perf_counter() - start
+    assert set(statuses) == {429}, set(statuses)
+    return elapsed / requests * 1e6
+
+
+async def main():
+    paths = {
+        "dependency": app,
+        "middleware": RateLimitMiddleware(app, paths=["/analyze"]),
+    }
+    print(f"{'body bytes':>10}" + "".join(f"{name + ' us':>16}" for name in paths) + f"{'speedup':>10}")
+    for size in BODY_SIZES:
+        body = make_body(size)
+        costs = []
+        for asgi_app in paths.values():
+            rate_limiter.rate_limit_store.clear()
+            costs.append(await bench_path(asgi_app, body))
+        print(f"{len(body):>10}" + "".join(f"{cost:>16.1f}" for cost in costs) + f"{costs[0] / costs[1]:>9.1f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
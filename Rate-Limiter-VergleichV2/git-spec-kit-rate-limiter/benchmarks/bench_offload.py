@@ -0,0 +1,101 @@
+"""
+Benchmark: /health latency and /analyze throughput under concurrent load,
+with the computation blocking the event loop vs. offloaded to a pool.
+
+CLIENTS clients send /analyze back to back for DURATION seconds while a
+probe requests /health every PROBE_INTERVAL. Computations sleep 20-80ms
+(the real 200-800ms scaled down by 10). Every request has its own text,
+so the result cache cannot answer it. Rate limits are raised out of reach,
+so only the computation slots and the pool limit throughput.
+
+- blocking: the computation runs in the handler, as before the pool
+- thread / process: the computation runs in a ComputationPool
+
+Run from the project root:
+    python -m benchmarks.bench_offload
+"""
+import asyncio
+import itertools
+import random
+import time
+from typing import List
+import httpx
+from src import main as service, rate_limiter, route_limits
+from src.executor import ComputationPool
+
+CLIENTS = 16
+DURATION = 3.0
+PROBE_INTERVAL = 0.02
+WORKERS = 8
+
+
+def computation():
+    time.sleep(random.uniform(0.02, 0.08))
+
+
+class BlockingPool:
+    """Runs the computation in the event loop, like the handler did before."""
+
+    async def run(self, fn, *args):
+        return fn(*args)
+
+    def shutdown(self):
+        pass
+
+
+def percentile(values: List[float], p: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))] if values else float("nan")
+
+
+async def load(pool) -> dict:
+    service.computation_pool = pool
+    service.expensive_computation = computation
+    transport = httpx.ASGITransport(app=service.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        deadline = time.monotonic() + DURATION
+        completed = 0
+        health_latency = []
+
+        texts = itertools.count()
+
+        async def analyze():
+            nonlocal completed
+            while time.monotonic() < deadline:
+                response = await client.post("/analyze", json={"text": f"benchmark {next(texts)}"})
+                if response.status_code == 200:
+                    completed += 1
+
+        async def probe():
+            while time.monotonic() < deadline:
+                started = time.monotonic()
+                await client.get("/health")
+                health_latency.append(time.monotonic() - started)
+                await asyncio.sleep(PROBE_INTERVAL)
+
+        await asyncio.gather(probe(), *(analyze() for _ in range(CLIENTS)))
+    pool.shutdown()
+    return {"health": health_latency, "throughput": completed / DURATION}
+
+
+def main():
+    # Limits high enough to never reject
+    rate_limiter.LIMIT_IP = rate_limiter.LIMIT_GLOBAL = None
+    route_limits.set_route_table(route_limits.compile_routes({"POST /analyze": {"free": 10**9}}))
+    pools = [
+        ("blocking", BlockingPool()),
+        ("thread", ComputationPool("thread", workers=WORKERS)),
+        ("process", ComputationPool("process", workers=WORKERS)),
+    ]
+    for name, pool in pools:
+        result = asyncio.run(load(pool))
+        health = result["health"]
+        print(
+            f"{name:<10}/health p50 {percentile(health, 0.5) * 1000:>7.1f} ms"
+            f"  p99 {percentile(health, 0.99) * 1000:>7.1f} ms"
+            f"  /analyze {result['throughput']:>6.1f} req/s"
+        )
+
+
+if __name__ == "__main__":
+    main()
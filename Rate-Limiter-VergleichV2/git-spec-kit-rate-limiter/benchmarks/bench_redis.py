@@ -0,0 +1,59 @@
+"""
+Benchmark: decision latency of the Redis backend.
+
+Uses the server at RATE_LIMIT_REDIS_URL if set, otherwise an in-process
+fakeredis (only useful to check the scripts, not for latency numbers).
+
+Run from the project root:
+    RATE_LIMIT_REDIS_URL=redis://localhost:6379/0 python -m benchmarks.bench_redis
+"""
+import asyncio
+import os
+import statistics
+import time
+from src.algorithms import ALGORITHMS
+from src.redis_backend import RedisBackend
+
+DECISIONS = 5_000
+CLIENTS = 1_000
+CONCURRENCY = 32
+
+
+def create_backend() -> RedisBackend:
+    url = os.environ.get("RATE_LIMIT_REDIS_URL")
+    if url:
+        return RedisBackend.from_url(url, key_prefix="rate_limit_bench")
+    import fakeredis
+
+    return RedisBackend(fakeredis.FakeAsyncRedis(), key_prefix="rate_limit_bench")
+
+
+async def bench_algorithm(backend: RedisBackend, name: str):
+    """Return the latency samples (microseconds) and throughput of `name`."""
+    algorithm = ALGORITHMS[name]
+    samples = []
+    counter = iter(range(DECISIONS))
+
+    async def worker():
+        for i in counter:
+            start = time.perf_counter()
+            await backend.acquire_async(f"10.0.{i % CLIENTS // 256}.{i % 256}", algorithm, time.time(), 100, 60)
+            samples.append((time.perf_counter() - start) * 1e6)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(CONCURRENCY)))
+    return samples, DECISIONS / (time.perf_counter() - start)
+
+
+async def main():
+    backend = create_backend()
+    print(f"{'algorithm':<16}{'p50 us':>10}{'p99 us':>10}{'decisions/s':>14}")
+    for name in sorted(ALGORITHMS):
+        samples, throughput = await bench_algorithm(backend, name)
+        quantiles = statistics.quantiles(samples, n=100)
+        print(f"{name:<16}{quantiles[49]:>10.0f}{quantiles[98]:>10.0f}{throughput:>14,.0f}")
+    await backend.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
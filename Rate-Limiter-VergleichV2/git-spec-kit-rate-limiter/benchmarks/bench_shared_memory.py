@@ -0,0 +1,70 @@
+"""
+Benchmark: shared memory backend against the in-process store.
+
+Run from the project root:
+    python -m benchmarks.bench_shared_memory
+"""
+import multiprocessing
+import os
+import tempfile
+import time
+from src.algorithms import get_algorithm
+from src.rate_limiter import InMemoryBackend
+from src.shared_memory_backend import SharedMemoryBackend
+from src.store import RateLimitStore
+
+DECISIONS = 200_000
+CLIENTS = 10_000
+PROCESSES = 4
+
+
+def bench_backend(backend, decisions: int = DECISIONS, clients: int = CLIENTS) -> float:
+    """Return the mean cost of one decision in nanoseconds."""
+    algorithm = get_algorithm("fixed_window")
+    client_ids = [f"10.{i // 65536}.{i // 256 % 256}.{i % 256}" for i in range(clients)]
+    now = time.time()
+    start = time.perf_counter_ns()
+    for i in range(decisions):
+        backend.acquire(client_ids[i % clients], algorithm, now, 100, 60)
+    return (time.perf_counter_ns() - start) / decisions
+
+
+def _worker(path, decisions, results):
+    backend = SharedMemoryBackend(path)
+    results.put(bench_backend(backend, decisions))
+    backend.close()
+
+
+def bench_processes(path: str, processes: int = PROCESSES, decisions: int = DECISIONS) -> float:
+    """Return the aggregate decisions per second of several processes sharing one table."""
+    context = multiprocessing.get_context()
+    results = context.Queue()
+    workers = [context.Process(target=_worker, args=(path, decisions, results)) for _ in range(processes)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+    for _ in workers:
+        results.get()
+    return processes * decisions / elapsed
+
+
+def main():
+    path = os.path.join(tempfile.mkdtemp(), "bench-rate-limit.shm")
+    in_process = bench_backend(InMemoryBackend(RateLimitStore()))
+    shared = SharedMemoryBackend(path)
+    shared_cost = bench_backend(shared)
+    shared.clear()
+
+    print(f"{'backend':<22}{'ns/decision':>14}")
+    print(f"{'in-process dict':<22}{in_process:>14.0f}")
+    print(f"{'shared memory':<22}{shared_cost:>14.0f}")
+    print(f"shared memory, {PROCESSES} processes: {bench_processes(path):,.0f} decisions/s")
+    shared.close()
+    os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""
+Benchmark: snapshot write and load time of a full rate limit store.
+
+Run from the project root:
+    python -m benchmarks.bench_snapshot
+"""
+import asyncio
+import os
+import tempfile
+import time
+from src.algorithms import get_algorithm
+from src.rate_limiter import InMemoryBackend
+from src.snapshot import StoreSnapshotter
+from src.store import RateLimitStore
+
+CLIENTS = [10_000, 100_000]
+
+
+def fill_store(clients: int) -> RateLimitStore:
+    store = RateLimitStore(max_entries=clients)
+    backend = InMemoryBackend(store)
+    algorithm = get_algorithm("fixed_window")
+    now = time.time()
+    for i in range(clients):
+        backend.acquire(f"10.{i // 65536}.{i // 256 % 256}.{i % 256}", algorithm, now, 100, 60)
+    return store
+
+
+def main():
+    print(f"{'clients':>10}{'bytes':>12}{'write ms':>10}{'async ms':>10}{'load ms':>10}")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "limits.snap")
+        for clients in CLIENTS:
+            snapshotter = StoreSnapshotter(fill_store(clients), path)
+            snapshotter.save(time.time())
+            write_ms = snapshotter.last_write_seconds * 1000
+            asyncio.run(snapshotter.save_async())
+            async_ms = snapshotter.last_write_seconds * 1000
+
+            restored = StoreSnapshotter(RateLimitStore(max_entries=clients), path)
+            restored.load(time.time())
+            load_ms = restored.last_load_seconds * 1000
+            print(f"{clients:>10}{os.path.getsize(path):>12,}{write_ms:>10.1f}{async_ms:>10.1f}{load_ms:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
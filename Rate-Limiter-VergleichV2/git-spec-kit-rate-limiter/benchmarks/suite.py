@@ -0,0 +1,292 @@
+"""
+Benchmark suite: cost of the rate limiting decision itself.
+
+For every limiter implementation it reports
+- ns/decision, single-threaded
+- decisions/s with a thread pool
+- bytes of memory per tracked client at 10k and 1M clients
+
+Implementations:
+- spec_kit_<algorithm>: the in-memory backend behind check_rate_limit
+- spec_kit_leasing: quota leases over the in-memory store
+- spec_kit_sketch: approximate Count-Min Sketch backend in fixed memory
+- spec_kit_shared_memory: mmap backend shared by workers
+- spec_kit_redis: Redis backend, only if RATE_LIMIT_REDIS_URL is set
+- slowapi_fixed_window: the slowapi Limiter as configured in
+  vibeCode-rate-limiter (memory storage, fixed window, dynamic quota).
+  fast-api-rate-limiter has no limiter, so there is nothing to measure.
+
+Results are written as JSON, one record per measurement. Passing a previous
+result file as --baseline compares against it and exits with status 1 if a
+measurement got worse by more than --tolerance.
+
+Run from the project root:
+    python -m benchmarks.suite --output bench.json
+    python -m benchmarks.suite --quick --baseline bench.json
+"""
+import argparse
+import asyncio
+import gc
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+from src import rate_limiter
+from src.algorithms import ALGORITHMS, get_algorithm
+from src.leases import LeasingBackend
+from src.rate_limiter import InMemoryBackend
+from src.store import RateLimitStore
+
+DECISIONS = 200_000
+CLIENTS = 10_000
+THREADS = 4
+MEMORY_CLIENTS = [10_000, 1_000_000]
+# Decision functions take (client_id, now) and return whatever the limiter returns
+Decide = Callable[[str, float], object]
+
+
+def client_ids(count: int) -> List[str]:
+    return [f"10.{i // 65536}.{i // 256 % 256}.{i % 256}" for i in range(count)]
+
+
+# --- Implementations ---
+# Each factory returns (decide, close); a fresh, empty limiter per call.
+
+def spec_kit_factory(algorithm_name: str, max_entries: int = rate_limiter.MAX_STORE_ENTRIES):
+    algorithm = get_algorithm(algorithm_name)
+    backend = InMemoryBackend(RateLimitStore(max_entries=max_entries))
+
+    def decide(client_id: str, now: float):
+        return backend.acquire(client_id, algorithm, now, rate_limiter.LIMIT_PRO, rate_limiter.WINDOW_SIZE_SECONDS)
+
+    return decide, lambda: None
+
+
+def leasing_factory(max_entries: int = rate_limiter.MAX_STORE_ENTRIES):
+    algorithm = get_algorithm(rate_limiter.DEFAULT_ALGORITHM)
+    backend = LeasingBackend(InMemoryBackend(RateLimitStore(max_entries=max_entries)))
+
+    def decide(client_id: str, now: float):
+        return backend.acquire(client_id, algorithm, now, rate_limiter.LIMIT_PRO, rate_limiter.WINDOW_SIZE_SECONDS)
+
+    return decide, lambda: None
+
+
+def sketch_factory(max_entries: int = 0):
+    from src.sketch_backend import SketchBackend
+
+    algorithm = get_algorithm(rate_limiter.DEFAULT_ALGORITHM)
+    backend = SketchBackend()
+
+    def decide(client_id: str, now: float):
+        return backend.acquire(client_id, algorithm, now, rate_limiter.LIMIT_PRO, rate_limiter.WINDOW_SIZE_SECONDS)
+
+    return decide, lambda: None
+
+
+def shared_memory_factory(max_entries: int = CLIENTS):
+    from src.shared_memory_backend import SharedMemoryBackend
+
+    algorithm = get_algorithm(rate_limiter.DEFAULT_ALGORITHM)
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, "bench.shm")
+    # Same load factor as the default table (8192 buckets * 8 slots)
+    backend = SharedMemoryBackend(path, buckets=max(1, max_entries * 2 // 8))
+
+    def decide(client_id: str, now: float):
+        return backend.acquire(client_id, algorithm, now, rate_limiter.LIMIT_PRO, rate_limiter.WINDOW_SIZE_SECONDS)
+
+    def close():
+        backend.close()
+        os.unlink(path)
+        os.rmdir(directory)
+
+    # The table lives in a mapped file, invisible to tracemalloc
+    decide.mapped_bytes = os.path.getsize(path)
+    return decide, close
+
+
+def slowapi_factory(max_entries: int = 0):
+    from limits import parse
+    from slowapi import Limiter
+    from slowapi.util import get_remote_address
+
+    limiter = Limiter(key_func=get_remote_address)
+    # Route limits and key quotas are parsed once at startup
+    free_quota, pro_quota = parse("5/minute"), parse("100/minute")
+
+    def decide(client_id: str, now: float):
+        # One lookup for the quota, one hit on the storage per request
+        quota = pro_quota if client_id.startswith("pro") else free_quota
+        return limiter.limiter.hit(quota, client_id, "/analyze")
+
+    return decide, lambda: None
+
+
+def implementations() -> Dict[str, Callable]:
+    factories = {f"spec_kit_{name}": (lambda n=name, **kw: spec_kit_factory(n, **kw)) for name in sorted(ALGORITHMS)}
+    factories["spec_kit_leasing"] = leasing_factory
+    factories["spec_kit_sketch"] = sketch_factory
+    try:
+        import fcntl  # noqa: F401
+        factories["spec_kit_shared_memory"] = shared_memory_factory
+    except ImportError:
+        pass
+    try:
+        import slowapi  # noqa: F401
+        factories["slowapi_fixed_window"] = slowapi_factory
+    except ImportError:
+        print("slowapi not installed, skipping slowapi_fixed_window", file=sys.stderr)
+    return factories
+
+
+# --- Measurements ---
+
+def bench_latency(decide: Decide, decisions: int = DECISIONS, clients: int = CLIENTS) -> float:
+    """Return the mean cost of one decision in nanoseconds."""
+    ids = client_ids(clients)
+    now = time.time()
+    start = time.perf_counter_ns()
+    for i in range(decisions):
+        decide(ids[i % clients], now)
+    return (time.perf_counter_ns() - start) / decisions
+
+
+def bench_threads(decide: Decide, threads: int = THREADS, decisions: int = DECISIONS, clients: int = CLIENTS) -> float:
+    """Return the decisions per second of `threads` threads sharing one limiter."""
+    ids = client_ids(clients)
+    now = time.time()
+    per_thread = decisions // threads
+
+    def worker(offset: int):
+        for i in range(offset, offset + per_thread):
+            decide(ids[i % clients], now)
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        start = time.perf_counter()
+        for future in [pool.submit(worker, t * per_thread) for t in range(threads)]:
+            future.result()
+        elapsed = time.perf_counter() - start
+    return per_thread * threads / elapsed
+
+
+def bench_memory(factory: Callable, clients: int) -> float:
+    """
+    Return the bytes allocated per tracked client after one request of each,
+    including tables in mapped files.
+    """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        baseline = tracemalloc.get_traced_memory()[0]
+        decide, close = factory(max_entries=clients)
+        now = time.time()
+        for i in range(clients):
+            decide(f"10.{i // 65536}.{i // 256 % 256}.{i % 256}", now)
+        used = tracemalloc.get_traced_memory()[0] - baseline + getattr(decide, "mapped_bytes", 0)
+    finally:
+        tracemalloc.stop()
+    close()
+    return used / clients
+
+
+async def bench_redis_latency(url: str, decisions: int = 20_000, clients: int = CLIENTS) -> float:
+    from src.redis_backend import RedisBackend
+
+    backend = RedisBackend.from_url(url, key_prefix="rate_limit_bench")
+    algorithm = get_algorithm(rate_limiter.DEFAULT_ALGORITHM)
+    ids = client_ids(clients)
+    try:
+        start = time.perf_counter_ns()
+        for i in range(decisions):
+            await backend.acquire_async(ids[i % clients], algorithm, time.time(), 100, 60)
+        return (time.perf_counter_ns() - start) / decisions
+    finally:
+        await backend.close()
+
+
+def run(quick: bool = False) -> List[dict]:
+    decisions = DECISIONS // 10 if quick else DECISIONS
+    memory_clients = MEMORY_CLIENTS[:1] if quick else MEMORY_CLIENTS
+    results = []
+
+    def record(name: str, metric: str, value: float, unit: str, **params):
+        results.append({"implementation": name, "metric": metric, "value": round(value, 2), "unit": unit, **params})
+        print(f"{name:<28}{metric:<22}{value:>16,.1f} {unit}", file=sys.stderr)
+
+    for name, factory in implementations().items():
+        decide, close = factory()
+        record(name, "latency", bench_latency(decide, decisions), "ns/decision")
+        close()
+        decide, close = factory()
+        record(name, "thread_throughput", bench_threads(decide, decisions=decisions), "decisions/s", threads=THREADS)
+        close()
+        for clients in memory_clients:
+            record(name, "memory_per_client", bench_memory(factory, clients), "bytes", clients=clients)
+
+    url = os.environ.get("RATE_LIMIT_REDIS_URL")
+    if url:
+        record("spec_kit_redis", "latency", asyncio.run(bench_redis_latency(url)), "ns/decision")
+    return results
+
+
+# Metrics where a larger value is better
+HIGHER_IS_BETTER = {"thread_throughput"}
+
+
+def compare(results: List[dict], baseline: List[dict], tolerance: float) -> List[str]:
+    """Return a description of every measurement that regressed by more than `tolerance`."""
+    def key(result):
+        return result["implementation"], result["metric"], result.get("clients"), result.get("threads")
+
+    previous = {key(result): result["value"] for result in baseline}
+    regressions = []
+    for result in results:
+        before = previous.get(key(result))
+        if not before:
+            continue
+        ratio = result["value"] / before
+        if result["metric"] in HIGHER_IS_BETTER:
+            ratio = 1 / ratio if ratio else float("inf")
+        if ratio > 1 + tolerance:
+            regressions.append(f"{result['implementation']} {result['metric']}: {before} -> {result['value']} {result['unit']}")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--output", help="write the JSON results to this file instead of stdout")
+    parser.add_argument("--quick", action="store_true", help="fewer decisions, no 1M client memory run")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown before failing (default 0.2)")
+    args = parser.parse_args(argv)
+
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.time(),
+        "results": run(quick=args.quick),
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output_file:
+            output_file.write(output + "\n")
+    else:
+        print(output)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as baseline_file:
+            regressions = compare(report["results"], json.load(baseline_file)["results"], args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,153 @@
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional
+from src import metrics
+from src.concurrency import AdaptiveConcurrencyLimiter, ConcurrencyLimitExceeded, concurrency_limiter
+
+# Head start of a tier in the queue, in seconds of waiting: a pro request is
+# served before free requests that arrived up to this long before it.
+TIER_HEAD_START_SECONDS: Dict[str, float] = {"pro": 2.0}
+# Time a client waits for its response at most; requests that could not be
+# done within it leave the queue with 503
+QUEUE_TIMEOUT_SECONDS = 5.0
+MAX_QUEUE_DEPTH = 100
+
+
+class PriorityAdmissionQueue:
+    """
+    Bounded waiting room in front of an AdaptiveConcurrencyLimiter.
+
+    Requests that find no free slot wait instead of being shed right away
+    and are admitted by priority as slots are released. The queue is ordered
+    by arrival time minus the head start of the tier, so pro requests are
+    served first, but a free request that has waited longer than the head
+    start goes before pro requests arriving after that (aging): free
+    requests never starve.
+
+    A request leaves the queue with ConcurrencyLimitExceeded once it could
+    no longer be computed within its timeout, i.e. when the time left is
+    below the limiter's average latency, instead of being started too late.
+    Work that was accepted already (e.g. the rest of a batch) is not
+    sheddable: it waits even if the queue is full, with an infinite timeout
+    until a slot is free.
+    """
+
+    def __init__(
+        self,
+        limiter: AdaptiveConcurrencyLimiter,
+        max_depth: int = MAX_QUEUE_DEPTH,
+        timeout: float = QUEUE_TIMEOUT_SECONDS,
+        head_start: Optional[Dict[str, float]] = None,
+    ):
+        """
+        Args:
+            limiter (AdaptiveConcurrencyLimiter): Limiter handing out the slots.
+            max_depth (int): Requests waiting at most; more are shed right away.
+            timeout (float): Default seconds a request may take including its wait.
+            head_start (Dict[str, float], optional): Head start per tier in
+                seconds, TIER_HEAD_START_SECONDS by default.
+        """
+        self.limiter = limiter
+        self.max_depth = max_depth
+        self.timeout = timeout
+        self.head_start = TIER_HEAD_START_SECONDS if head_start is None else head_start
+        self.waiting = 0
+        self.rejected = 0
+        self.expired = 0
+        # (rank, sequence, future) of waiting requests; futures of requests
+        # that gave up are done and skipped when they come up
+        self._heap = []
+        self._sequence = itertools.count()
+
+    async def acquire(self, tier: str, timeout: Optional[float] = None, sheddable: bool = True) -> float:
+        """
+        Wait for a slot for one request of `tier`.
+
+        Args:
+            tier (str): Tier of the request, for its priority.
+            timeout (float, optional): Seconds the request may take including
+                its wait, the queue's default if None, no deadline if math.inf.
+            sheddable (bool): Whether a full queue sheds the request.
+
+        Returns:
+            float: Start time of the request, to be passed to release.
+
+        Raises:
+            ConcurrencyLimitExceeded: If the queue is full or the request
+                could not be computed within its timeout.
+        """
+        enqueued = time.monotonic()
+        if self.waiting == 0:
+            started = self.limiter.try_acquire()
+            if started is not None:
+                metrics.admission_wait_seconds.labels(tier).observe(0.0)
+                return started
+        if sheddable and self.waiting >= self.max_depth:
+            self.rejected += 1
+            raise ConcurrencyLimitExceeded(retry_after=self.limiter.retry_after())
+
+        # Leave time for the computation itself
+        timeout = self.timeout if timeout is None else timeout
+        max_wait = timeout - self.limiter.average_latency
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._heap, (enqueued - self.head_start.get(tier, 0.0), next(self._sequence), future))
+        self.waiting += 1
+        try:
+            started = await asyncio.wait_for(future, None if max_wait == math.inf else max(0.0, max_wait))
+        except asyncio.TimeoutError:
+            self.expired += 1
+            raise ConcurrencyLimitExceeded(retry_after=self.limiter.retry_after()) from None
+        except asyncio.CancelledError:
+            # Given up (e.g. client disconnected) right after being admitted
+            if future.done() and not future.cancelled():
+                self.release(future.result())
+            raise
+        finally:
+            self.waiting -= 1
+        metrics.admission_wait_seconds.labels(tier).observe(started - enqueued)
+        return started
+
+    def release(self, started: float, failed: bool = False) -> None:
+        """Give back the slot of a request and admit the next waiting ones."""
+        self.limiter.release(started, failed)
+        while self._heap:
+            future = self._heap[0][-1]
+            if future.done():
+                heapq.heappop(self._heap)
+                continue
+            started = self.limiter.try_acquire()
+            if started is None:
+                return
+            heapq.heappop(self._heap)
+            future.set_result(started)
+
+    @asynccontextmanager
+    async def slot(self, tier: str, timeout: Optional[float] = None, sheddable: bool = True) -> AsyncIterator[None]:
+        """
+        Run the enclosed block in a slot, waiting for one by priority.
+
+        Raises:
+            ConcurrencyLimitExceeded: See acquire.
+        """
+        started = await self.acquire(tier, timeout, sheddable)
+        failed = True
+        try:
+            yield
+            failed = False
+        finally:
+            self.release(started, failed)
+
+    def stats(self) -> Dict[str, int]:
+        return {"waiting": self.waiting, "rejected": self.rejected, "expired": self.expired}
+
+
+# Queue in front of the expensive computations of this process
+admission_queue = PriorityAdmissionQueue(concurrency_limiter)
+
+metrics.registry.gauge("admission_queue_depth", "Requests waiting for a computation slot.", lambda: admission_queue.waiting)
+metrics.registry.gauge("admission_queue_rejected", "Requests shed because the queue was full.", lambda: admission_queue.rejected)
+metrics.registry.gauge("admission_queue_expired", "Requests dropped before their deadline ran out.", lambda: admission_queue.expired)
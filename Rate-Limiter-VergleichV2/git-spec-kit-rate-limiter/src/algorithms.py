@@ -0,0 +1,328 @@
+import math
+from dataclasses import dataclass, fields
+from functools import lru_cache
+from typing import Dict, List, Tuple
+
+# Tolerance when rounding fractional capacity down to whole units
+_EPSILON = 1e-9
+
+
+@dataclass
+class RateLimitEntry:
+    request_count: int
+    window_start_time: float
+
+
+@dataclass
+class SlidingWindowState:
+    current_count: int
+    previous_count: int
+    window_start_time: float
+
+
+@dataclass
+class GcraState:
+    theoretical_arrival_time: float
+
+
+@dataclass
+class TokenBucketState:
+    tokens: float
+    last_refill_time: float
+
+
+class RateLimitAlgorithm:
+    """
+    Base class for rate limiting strategies.
+
+    An algorithm owns no client data itself. It creates a small, fixed-size
+    state object per client and decides on that state, so every strategy
+    needs O(1) memory per client.
+
+    Deciding is split into two steps: `retry_after` only inspects the state,
+    `consume` records admitted units. Callers that must check several
+    states before committing (e.g. hierarchical quotas) rely on this split.
+
+    A request usually counts as one unit. Callers may take several units at
+    once (quota leases); `units` must not exceed `limit`.
+    """
+
+    name = ""
+    state_type = type(None)
+
+    def new_state(self, now: float, limit: int):
+        """Create the state for a client that has not been seen before."""
+        raise NotImplementedError
+
+    def available(self, state, now: float, limit: int, window: float) -> float:
+        """Return how many units could be admitted right now."""
+        raise NotImplementedError
+
+    def retry_after(self, state, now: float, limit: int, window: float, units: int = 1) -> float:
+        """
+        Return 0 if `units` more units would be admitted, otherwise the number
+        of seconds until they would be.
+        """
+        raise NotImplementedError
+
+    def consume(self, state, now: float, limit: int, window: float, units: int = 1) -> None:
+        """Record `units` admitted units in `state`."""
+        raise NotImplementedError
+
+    def refund(self, state, now: float, limit: int, window: float, units: int) -> None:
+        """Give back `units` that were consumed earlier but not used."""
+        raise NotImplementedError
+
+    def expires_at(self, state, limit: int, window: float) -> float:
+        """
+        Return the time from which `state` is equivalent to a fresh one and
+        can be dropped from the store.
+        """
+        raise NotImplementedError
+
+    def take(
+        self, state, now: float, limit: int, window: float,
+        min_units: int = 1, max_units: int = 1, refund: int = 0,
+    ) -> Tuple[int, float]:
+        """
+        Refund `refund` units, then consume as many units as available, at
+        least `min_units` and at most `max_units`.
+
+        Returns:
+            Tuple[int, float]: Granted units and, if fewer than `min_units`
+            were available, the seconds until they would be.
+        """
+        if refund > 0:
+            self.refund(state, now, limit, window, refund)
+        wait = self.retry_after(state, now, limit, window, min_units) if min_units > 0 else 0.0
+        if wait > 0:
+            return 0, wait
+        available = int(self.available(state, now, limit, window) + _EPSILON)
+        units = min(max_units, max(min_units, available))
+        if units > 0:
+            self.consume(state, now, limit, window, units)
+        return units, 0.0
+
+
+class FixedWindow(RateLimitAlgorithm):
+    """
+    Counts requests in a window that starts with the first request of a client.
+    Cheap, but admits up to 2x the limit around a window boundary.
+    """
+
+    name = "fixed_window"
+    state_type = RateLimitEntry
+
+    def new_state(self, now: float, limit: int) -> RateLimitEntry:
+        return RateLimitEntry(request_count=0, window_start_time=now)
+
+    def _count(self, state: RateLimitEntry, now: float, window: float) -> int:
+        return 0 if now - state.window_start_time >= window else state.request_count
+
+    def available(self, state: RateLimitEntry, now: float, limit: int, window: float) -> float:
+        return limit - self._count(state, now, window)
+
+    def retry_after(self, state: RateLimitEntry, now: float, limit: int, window: float, units: int = 1) -> float:
+        elapsed = now - state.window_start_time
+        if self._count(state, now, window) + units <= limit:
+            return 0.0
+        return window - elapsed if elapsed < window else window
+
+    def consume(self, state: RateLimitEntry, now: float, limit: int, window: float, units: int = 1) -> None:
+        # The window starts with the first admitted request
+        if now - state.window_start_time >= window or state.request_count == 0:
+            state.request_count = 0
+            state.window_start_time = now
+        state.request_count += units
+
+    def refund(self, state: RateLimitEntry, now: float, limit: int, window: float, units: int) -> None:
+        if now - state.window_start_time < window:
+            state.request_count = max(state.request_count - units, 0)
+
+    def expires_at(self, state: RateLimitEntry, limit: int, window: float) -> float:
+        return state.window_start_time + window
+
+
+class SlidingWindowCounter(RateLimitAlgorithm):
+    """
+    Weights the previous fixed window by how much of it still overlaps the
+    sliding window. Smooths the boundary burst of the fixed window while
+    keeping two counters per client.
+    """
+
+    name = "sliding_window"
+    state_type = SlidingWindowState
+
+    def new_state(self, now: float, limit: int) -> SlidingWindowState:
+        return SlidingWindowState(current_count=0, previous_count=0, window_start_time=now)
+
+    def _roll(self, state: SlidingWindowState, now: float, window: float) -> None:
+        aligned_start = now - (now % window)
+        if aligned_start == state.window_start_time:
+            return
+        if aligned_start - state.window_start_time == window:
+            state.previous_count = state.current_count
+        else:
+            state.previous_count = 0
+        state.current_count = 0
+        state.window_start_time = aligned_start
+
+    def _estimate(self, state: SlidingWindowState, now: float, window: float) -> float:
+        self._roll(state, now, window)
+        weight = 1.0 - (now - state.window_start_time) / window
+        return state.previous_count * weight + state.current_count
+
+    def available(self, state: SlidingWindowState, now: float, limit: int, window: float) -> float:
+        return limit - self._estimate(state, now, window)
+
+    def retry_after(self, state: SlidingWindowState, now: float, limit: int, window: float, units: int = 1) -> float:
+        if self._estimate(state, now, window) + units <= limit:
+            return 0.0
+        elapsed = now - state.window_start_time
+
+        if state.current_count + units > limit:
+            if state.current_count == 0:
+                return 2 * window - elapsed
+            # The current window alone is full; wait for the next one and for
+            # the (then previous) current count to decay far enough.
+            decay = window * (1.0 - (limit - units) / state.current_count)
+            return (window - elapsed) + decay
+
+        # Only the weighted previous window is in the way.
+        needed_elapsed = window * (1.0 - (limit - units - state.current_count) / state.previous_count)
+        return max(needed_elapsed - elapsed, 0.0)
+
+    def consume(self, state: SlidingWindowState, now: float, limit: int, window: float, units: int = 1) -> None:
+        self._roll(state, now, window)
+        state.current_count += units
+
+    def refund(self, state: SlidingWindowState, now: float, limit: int, window: float, units: int) -> None:
+        self._roll(state, now, window)
+        state.current_count = max(state.current_count - units, 0)
+
+    def expires_at(self, state: SlidingWindowState, limit: int, window: float) -> float:
+        # The current window still weighs in during the following one
+        return state.window_start_time + 2 * window
+
+
+class Gcra(RateLimitAlgorithm):
+    """
+    Generic Cell Rate Algorithm. Stores a single timestamp per client and
+    spaces requests evenly, allowing a burst of up to `limit` requests.
+    """
+
+    name = "gcra"
+    state_type = GcraState
+
+    def new_state(self, now: float, limit: int) -> GcraState:
+        return GcraState(theoretical_arrival_time=now)
+
+    def available(self, state: GcraState, now: float, limit: int, window: float) -> float:
+        backlog = max(state.theoretical_arrival_time, now) - now
+        return (window - backlog) * limit / window
+
+    def retry_after(self, state: GcraState, now: float, limit: int, window: float, units: int = 1) -> float:
+        emission_interval = window / limit
+        new_tat = max(state.theoretical_arrival_time, now) + emission_interval * units
+        allow_at = new_tat - window
+        if allow_at <= now:
+            return 0.0
+        return allow_at - now
+
+    def consume(self, state: GcraState, now: float, limit: int, window: float, units: int = 1) -> None:
+        emission_interval = window / limit
+        state.theoretical_arrival_time = max(state.theoretical_arrival_time, now) + emission_interval * units
+
+    def refund(self, state: GcraState, now: float, limit: int, window: float, units: int) -> None:
+        emission_interval = window / limit
+        state.theoretical_arrival_time = max(state.theoretical_arrival_time - emission_interval * units, now)
+
+    def expires_at(self, state: GcraState, limit: int, window: float) -> float:
+        return state.theoretical_arrival_time
+
+
+class TokenBucket(RateLimitAlgorithm):
+    """
+    Bucket of `limit` tokens refilled continuously at `limit / window` per second.
+    """
+
+    name = "token_bucket"
+    state_type = TokenBucketState
+
+    def new_state(self, now: float, limit: int) -> TokenBucketState:
+        return TokenBucketState(tokens=float(limit), last_refill_time=now)
+
+    def available(self, state: TokenBucketState, now: float, limit: int, window: float) -> float:
+        elapsed = max(now - state.last_refill_time, 0.0)
+        return min(float(limit), state.tokens + elapsed * limit / window)
+
+    def retry_after(self, state: TokenBucketState, now: float, limit: int, window: float, units: int = 1) -> float:
+        tokens = self.available(state, now, limit, window)
+        if tokens >= units:
+            return 0.0
+        return (units - tokens) * window / limit
+
+    def consume(self, state: TokenBucketState, now: float, limit: int, window: float, units: int = 1) -> None:
+        state.tokens = self.available(state, now, limit, window) - units
+        state.last_refill_time = now
+
+    def refund(self, state: TokenBucketState, now: float, limit: int, window: float, units: int) -> None:
+        state.tokens = min(float(limit), self.available(state, now, limit, window) + units)
+        state.last_refill_time = now
+
+    def expires_at(self, state: TokenBucketState, limit: int, window: float) -> float:
+        # Time at which the bucket is full again
+        return state.last_refill_time + (limit - state.tokens) * window / limit
+
+
+ALGORITHMS: Dict[str, RateLimitAlgorithm] = {
+    algorithm.name: algorithm
+    for algorithm in (FixedWindow(), SlidingWindowCounter(), Gcra(), TokenBucket())
+}
+
+
+def get_algorithm(name: str) -> RateLimitAlgorithm:
+    """
+    Look up a rate limiting algorithm by name.
+
+    Raises:
+        ValueError: If no algorithm with this name is registered.
+    """
+    try:
+        return ALGORITHMS[name]
+    except KeyError:
+        raise ValueError(f"Unknown rate limit algorithm: {name!r}") from None
+
+
+def retry_after_seconds(wait: float) -> int:
+    """Round a wait time up to whole seconds for the Retry-After header."""
+    return max(1, math.ceil(wait))
+
+
+# --- Flat encoding of states, for shared memory tables and snapshots ---
+
+# Every state fits into this many numbers
+STATE_FIELDS = 3
+
+
+@lru_cache(maxsize=None)
+def _state_layout(state_type) -> Tuple[Tuple[str, bool], ...]:
+    """Field names of a state dataclass and whether they hold ints."""
+    layout = tuple((field.name, field.type is int) for field in fields(state_type))
+    if len(layout) > STATE_FIELDS:
+        raise ValueError(f"{state_type.__name__} has more than {STATE_FIELDS} fields")
+    return layout
+
+
+def state_to_values(state) -> List[float]:
+    """Return the fields of `state`, padded to STATE_FIELDS numbers."""
+    values = [getattr(state, name) for name, _ in _state_layout(type(state))]
+    return values + [0.0] * (STATE_FIELDS - len(values))
+
+
+def state_from_values(state_type, values):
+    """Rebuild a state of `state_type` from the output of state_to_values."""
+    return state_type(*(
+        int(value) if is_int else value
+        for (_, is_int), value in zip(_state_layout(state_type), values)
+    ))
@@ -0,0 +1,108 @@
+from dataclasses import dataclass
+from typing import Iterable, List, Sequence, Tuple
+from src.algorithms import RateLimitAlgorithm
+
+
+@dataclass
+class QuotaCheck:
+    """One level of a hierarchical quota (e.g. API key, IP or the whole service)."""
+    client_id: str
+    algorithm: RateLimitAlgorithm
+    limit: int
+    window: float
+    units: int = 1
+    # Service-wide state that every request touches; backends may keep it
+    # outside their client store
+    pinned: bool = False
+
+
+class RateLimitBackend:
+    """
+    Base class for the stores check_rate_limit decides against.
+
+    Backends implement `take`, an atomic refund-then-consume of units on the
+    state of one client. Asynchronous backends override `take_async` instead.
+    A plain request is `acquire`, i.e. taking exactly one unit; a request
+    limited on several levels at once is `acquire_all`.
+    """
+
+    def take(
+        self, client_id: str, algorithm: RateLimitAlgorithm, now: float, limit: int, window: float,
+        min_units: int = 1, max_units: int = 1, refund: int = 0,
+    ) -> Tuple[int, float]:
+        """
+        Atomically refund `refund` units of `client_id` and take between
+        `min_units` and `max_units` units, see RateLimitAlgorithm.take.
+
+        Returns:
+            Tuple[int, float]: Granted units and the wait time if none were granted.
+        """
+        raise NotImplementedError
+
+    async def take_async(
+        self, client_id: str, algorithm: RateLimitAlgorithm, now: float, limit: int, window: float,
+        min_units: int = 1, max_units: int = 1, refund: int = 0,
+    ) -> Tuple[int, float]:
+        return self.take(client_id, algorithm, now, limit, window, min_units, max_units, refund)
+
+    async def take_many_async(self, calls: Iterable[tuple]) -> List[Tuple[int, float]]:
+        """
+        Run several `take` calls, given as tuples of its arguments.
+        Network backends send them in a single round trip.
+        """
+        return [await self.take_async(*call) for call in calls]
+
+    def acquire(self, client_id: str, algorithm: RateLimitAlgorithm, now: float, limit: int, window: float) -> float:
+        """
+        Decide on one request of `client_id` and record it if admitted.
+
+        Returns:
+            float: 0 if the request is admitted, otherwise seconds until it would be.
+        """
+        return self.take(client_id, algorithm, now, limit, window)[1]
+
+    async def acquire_async(
+        self, client_id: str, algorithm: RateLimitAlgorithm, now: float, limit: int, window: float
+    ) -> float:
+        return (await self.take_async(client_id, algorithm, now, limit, window))[1]
+
+    def acquire_all(self, checks: Sequence[QuotaCheck], now: float) -> float:
+        """
+        Decide on a request limited by all `checks` at once, all or nothing:
+        it is recorded on every level or on none.
+
+        This default takes the levels one by one and gives back the units
+        already taken if a level rejects, so for a moment a rejected request
+        holds units on the other levels. That is only unobservable for an
+        in-process backend that decides under the GIL without yielding;
+        shared backends override it to check all states before consuming.
+
+        Returns:
+            float: 0 if the request is admitted, otherwise seconds until it would be.
+        """
+        taken = []
+        for check in checks:
+            _, wait = self.take(check.client_id, check.algorithm, now, check.limit, check.window, check.units, check.units)
+            if wait > 0:
+                for done in taken:
+                    self.take(done.client_id, done.algorithm, now, done.limit, done.window, 0, 0, done.units)
+                return wait
+            taken.append(check)
+        return 0.0
+
+    async def acquire_all_async(self, checks: Sequence[QuotaCheck], now: float) -> float:
+        return self.acquire_all(checks, now)
+
+    def release_all(self, checks: Sequence[QuotaCheck], now: float) -> None:
+        """
+        Give back the units of a request admitted with `checks`, e.g. when it
+        is refused later after all.
+        """
+        for check in checks:
+            self.take(check.client_id, check.algorithm, now, check.limit, check.window, 0, 0, check.units)
+
+    async def release_all_async(self, checks: Sequence[QuotaCheck], now: float) -> None:
+        await self.take_many_async([
+            (check.client_id, check.algorithm, now, check.limit, check.window, 0, 0, check.units)
+            for check in checks
+        ])
@@ -0,0 +1,77 @@
+import asyncio
+from typing import Any, Awaitable, Callable, List, Optional, Set, Tuple
+
+# Requests collected into one batch at most
+MAX_BATCH_SIZE = 16
+# Seconds the first request of a batch waits for others
+WINDOW_SECONDS = 0.005
+
+
+class RequestCoalescer:
+    """
+    Runs concurrent requests together in batches.
+
+    A batch starts with the first request submitted after the previous batch
+    and collects the requests submitted within `window` seconds after it, or
+    until it holds `max_batch_size`. It is then run with one call of
+    `run_batch`, and every request gets its own result back. A longer window
+    makes larger batches (throughput) at the cost of up to `window` extra
+    latency per request.
+
+    If `run_batch` fails, every request of the batch gets the exception.
+    """
+
+    def __init__(
+        self,
+        run_batch: Callable[[List[Any]], Awaitable[List[Any]]],
+        max_batch_size: int = MAX_BATCH_SIZE,
+        window: float = WINDOW_SECONDS,
+    ):
+        """
+        Args:
+            run_batch: Coroutine function computing a list of results, one per
+                item and in the same order, from a list of items.
+            max_batch_size (int): Requests per batch at most.
+            window (float): Seconds a batch collects requests at most.
+        """
+        self.run_batch = run_batch
+        self.max_batch_size = max_batch_size
+        self.window = window
+        self._pending: List[Tuple[Any, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        # Running batches, referenced until done
+        self._running: Set[asyncio.Task] = set()
+
+    async def submit(self, item: Any) -> Any:
+        """Add `item` to the current batch and return its result once the batch ran."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.ensure_future(self._run(batch))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _run(self, batch: List[Tuple[Any, asyncio.Future]]) -> None:
+        try:
+            results = await self.run_batch([item for item, _ in batch])
+        except Exception as exc:
+            for _, future in batch:
+                # Requests whose client went away are cancelled already
+                if not future.done():
+                    future.set_exception(exc)
+            return
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
@@ -0,0 +1,136 @@
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+from src import metrics
+
+# Requests slower than this signal overload; expensive_computation alone takes at most 0.8s
+LATENCY_THRESHOLD_SECONDS = 1.0
+
+
+class ConcurrencyLimitExceeded(Exception):
+    def __init__(self, retry_after: int):
+        self.retry_after = retry_after
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    Global limit on requests processed at the same time, adapted with AIMD
+    (additive increase, multiplicative decrease) to the observed latency.
+
+    Per-client quotas do not help when many distinct clients arrive at once;
+    this limiter sheds whatever exceeds the current limit right away instead
+    of letting latency grow for everyone.
+
+    - A request that completes within `latency_threshold` while the limit was
+      in use raises the limit by about one per `limit` completions.
+    - A request that is slower or fails shrinks the limit by `backoff`. Only
+      requests started after the last decrease count, so one overload
+      episode shrinks the limit once, not once per slow request.
+    """
+
+    def __init__(
+        self,
+        initial_limit: int = 8,
+        min_limit: int = 1,
+        max_limit: int = 64,
+        latency_threshold: float = LATENCY_THRESHOLD_SECONDS,
+        backoff: float = 0.7,
+    ):
+        """
+        Args:
+            initial_limit (int): Requests allowed in flight at the start.
+            min_limit (int): Lower bound of the limit.
+            max_limit (int): Upper bound of the limit.
+            latency_threshold (float): Latency in seconds above which a request
+                counts as a sign of overload.
+            backoff (float): Factor applied to the limit on overload.
+        """
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_threshold = latency_threshold
+        self.backoff = backoff
+        self.limit = float(initial_limit)
+        self.in_flight = 0
+        self.rejected = 0
+        # Smoothed latency of completed requests, for Retry-After
+        self.average_latency = latency_threshold / 2
+        self._last_decrease = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """
+        Take a slot for one request.
+
+        Returns:
+            float: Start time of the request, to be passed to release.
+
+        Raises:
+            ConcurrencyLimitExceeded: If the limit is reached.
+        """
+        started = self.try_acquire()
+        if started is None:
+            with self._lock:
+                self.rejected += 1
+            raise ConcurrencyLimitExceeded(retry_after=self.retry_after())
+        return started
+
+    def try_acquire(self) -> Optional[float]:
+        """Take a slot if one is free; return its start time, or None without counting a rejection."""
+        with self._lock:
+            if self.in_flight >= int(self.limit):
+                return None
+            self.in_flight += 1
+        return time.monotonic()
+
+    def retry_after(self) -> int:
+        """Seconds a shed request should wait, about the time one computation takes."""
+        return max(1, math.ceil(self.average_latency))
+
+    def release(self, started: float, failed: bool = False) -> None:
+        """Give back the slot of a request started at `started` and adapt the limit."""
+        now = time.monotonic()
+        latency = now - started
+        with self._lock:
+            saturated = self.in_flight >= int(self.limit)
+            self.in_flight -= 1
+            self.average_latency += 0.2 * (latency - self.average_latency)
+            if failed or latency > self.latency_threshold:
+                if started >= self._last_decrease:
+                    self.limit = max(float(self.min_limit), self.limit * self.backoff)
+                    self._last_decrease = now
+            elif saturated:
+                self.limit = min(float(self.max_limit), self.limit + 1.0 / self.limit)
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        """
+        Run the enclosed block in a slot of the limiter.
+
+        Raises:
+            ConcurrencyLimitExceeded: If the limit is reached.
+        """
+        started = self.acquire()
+        failed = True
+        try:
+            yield
+            failed = False
+        finally:
+            self.release(started, failed)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "limit": int(self.limit),
+            "in_flight": self.in_flight,
+            "rejected": self.rejected,
+            "average_latency": round(self.average_latency, 3),
+        }
+
+
+# Limit on concurrent expensive computations of this process
+concurrency_limiter = AdaptiveConcurrencyLimiter()
+
+metrics.registry.gauge("concurrency_limit", "Current adaptive concurrency limit.", lambda: int(concurrency_limiter.limit))
+metrics.registry.gauge("concurrency_in_flight", "Computations currently running.", lambda: concurrency_limiter.in_flight)
+metrics.registry.gauge("concurrency_rejected", "Requests shed with 503.", lambda: concurrency_limiter.rejected)
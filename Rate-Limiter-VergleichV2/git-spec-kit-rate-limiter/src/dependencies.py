@@ -1,28 +1,101 @@
-from fastapi import Request, Header, HTTPException
-from typing import Optional
-from src.rate_limiter import check_rate_limit
-
-async def get_rate_limiter(
-    request: Request,
-    x_api_key: Optional[str] = Header(None)
-):
+from fastapi import Depends, Request, Header, HTTPException
+from typing import Callable, Optional, Tuple
+from src import key_registry, route_limits
+from src.rate_limiter import RateLimitExceeded, check_rate_limit_async, release_rate_limit_async, tier_limit
+
+def identify_client(x_api_key: Optional[str], host: Optional[str]) -> Tuple[str, str, Optional[int]]:
     """
-    Dependency to check rate limits.
-    Identifies user tier and calls the rate limiter logic.
+    Determine client identifier, user tier and quota of a request.
+
+    Returns:
+        Tuple[str, str, Optional[int]]: (client_id, user_tier, limit); limit is
+        None if the tier limit applies.
     """
-    # Determine User Tier
-    user_tier = "free"
-    if x_api_key == "secret-pro-key":
-        user_tier = "pro"
-    
+    # Determine User Tier from the key registry, unknown keys are Free users
+    user_tier, limit = "free", None
+    record = key_registry.api_key_registry.lookup(x_api_key) if x_api_key else None
+    if record is not None:
+        user_tier, limit = record.tier, record.limit
+
     # Identify Client
-    # For Free users, use IP. For Pro users, use API Key.
-    if user_tier == "pro":
+    # For Free users, use IP. For users with a registered key, use the API Key.
+    if record is not None:
         client_id = x_api_key
     else:
-        client_id = request.client.host if request.client else "unknown"
-        
-    # Check Limit
-    check_rate_limit(client_id, user_tier)
-    
-    return user_tier
\ No newline at end of file
+        client_id = host or "unknown"
+    return client_id, user_tier, limit
+
+def _one_unit() -> int:
+    return 1
+
+def _reject_over_quota(units: int, user_tier: str, limit: Optional[int]) -> None:
+    quota = tier_limit(user_tier, limit)
+    if units > quota:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Request costs {units} units, more than the quota of {quota} per window"
+        )
+
+def rate_limited(cost: Callable[..., int] = _one_unit, capped: bool = True):
+    """
+    Create a dependency that checks the rate limit of the route it is used
+    on (see src/route_limits.py), charging `cost` work units per request.
+    `cost` is a dependency itself, so it can use the parsed request body
+    (see request_cost). Routes without a configured limit are not limited.
+
+    A request costing more than the client's whole quota is charged the
+    whole quota, so a single long text stays admissible. With `capped=False`
+    it is refused with 413 instead, for requests whose cost has no natural
+    bound such as batches.
+    """
+    async def dependency(
+        request: Request,
+        x_api_key: Optional[str] = Header(None),
+        units: int = Depends(cost)
+    ):
+        # Already admitted by RateLimitMiddleware, which charged one unit
+        # before the body was read; charge the rest now, up to the whole quota
+        admitted = getattr(request.state, "rate_limit_identity", None)
+        if admitted is not None:
+            client_id, user_tier, limit, host = admitted
+            rest = min(units, tier_limit(user_tier, limit)) - 1
+            try:
+                if not capped:
+                    _reject_over_quota(units, user_tier, limit)
+                if rest > 0:
+                    await check_rate_limit_async(client_id, user_tier, limit, host, rest, compute=False)
+            except (HTTPException, RateLimitExceeded):
+                # Refused after all: the middleware's unit is not spent either
+                await release_rate_limit_async(client_id, user_tier, limit, host)
+                raise
+            return user_tier
+
+        host = request.client.host if request.client else None
+        client_id, user_tier, limit = identify_client(x_api_key, host)
+
+        # One lookup by method and route template, no parsing per request
+        route = route_limits.lookup(request.method, request.scope["route"].path)
+        if route is None:
+            request.state.rate_limit_identity = None
+            return user_tier
+        client_id, limit = route.client_key(client_id), route.limit_for(user_tier, limit)
+        if not capped:
+            _reject_over_quota(units, user_tier, limit)
+
+        # Check Limit (client, IP and global quota)
+        await check_rate_limit_async(client_id, user_tier, limit, host, units)
+
+        # The endpoint charges its processing time to this client
+        request.state.rate_limit_identity = (client_id, user_tier, limit, host)
+        return user_tier
+
+    return dependency
+
+def limited_client_id(request: Request) -> Optional[str]:
+    """Client a request was rate limited as, None if its route is not limited."""
+    identity = getattr(request.state, "rate_limit_identity", None)
+    return identity[0] if identity is not None else None
+
+# Dependency to check rate limits.
+# Identifies user tier and calls the rate limiter logic, one unit per request.
+get_rate_limiter = rate_limited()
@@ -0,0 +1,93 @@
+import asyncio
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+from src import metrics
+from src.concurrency import ConcurrencyLimitExceeded
+
+EXECUTOR_KINDS = ("thread", "process")
+
+
+class ComputationPool:
+    """
+    Worker pool the expensive computations run in, so the event loop keeps
+    serving other requests (e.g. /health) while they run.
+
+    - 'thread': for work that releases the GIL while it runs (sleeping,
+      I/O, native code).
+    - 'process': for CPU-bound Python code; the function and its arguments
+      must be picklable.
+
+    At most `workers` computations run and `max_queue` more wait for a
+    worker; further ones are refused with ConcurrencyLimitExceeded instead
+    of piling up in the executor's unbounded queue. The executor is created
+    on first use, so a pool that was shut down starts again when needed.
+    """
+
+    def __init__(self, kind: str = "thread", workers: int = 8, max_queue: int = 64):
+        """
+        Args:
+            kind (str): 'thread' or 'process'.
+            workers (int): Computations running at the same time.
+            max_queue (int): Computations waiting for a worker at most.
+
+        Raises:
+            ValueError: If the kind is unknown.
+        """
+        if kind not in EXECUTOR_KINDS:
+            raise ValueError(f"Unknown executor kind: {kind!r}")
+        self.kind = kind
+        self.workers = workers
+        self.max_queue = max_queue
+        self.pending = 0
+        self.rejected = 0
+        self._executor: Optional[Executor] = None
+
+    @classmethod
+    def from_env(cls) -> "ComputationPool":
+        """Pool configured by COMPUTE_EXECUTOR, COMPUTE_WORKERS and COMPUTE_QUEUE."""
+        return cls(
+            kind=os.environ.get("COMPUTE_EXECUTOR", "thread"),
+            workers=int(os.environ.get("COMPUTE_WORKERS", "8")),
+            max_queue=int(os.environ.get("COMPUTE_QUEUE", "64")),
+        )
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="computation")
+        return self._executor
+
+    async def run(self, fn: Callable, *args):
+        """
+        Run `fn(*args)` in the pool and return its result.
+
+        Raises:
+            ConcurrencyLimitExceeded: If all workers are busy and the queue is full.
+        """
+        if self.pending >= self.workers + self.max_queue:
+            self.rejected += 1
+            raise ConcurrencyLimitExceeded(retry_after=1)
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._get_executor(), fn, *args)
+        finally:
+            self.pending -= 1
+
+    def shutdown(self) -> None:
+        """Stop the workers once the running computations are done."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def stats(self) -> Dict[str, object]:
+        return {"kind": self.kind, "workers": self.workers, "pending": self.pending, "rejected": self.rejected}
+
+
+# Pool running the expensive computations of this process
+computation_pool = ComputationPool.from_env()
+
+metrics.registry.gauge("computation_pool_pending", "Computations running or waiting in the pool.", lambda: computation_pool.pending)
+metrics.registry.gauge("computation_pool_rejected", "Computations refused because the pool queue was full.", lambda: computation_pool.rejected)
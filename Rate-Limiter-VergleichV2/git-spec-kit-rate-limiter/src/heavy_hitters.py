@@ -0,0 +1,141 @@
+import heapq
+from collections import deque
+from typing import Dict, List
+
+# Keys tracked per window; the top keys are exact as long as each of them
+# makes up more than 1/CAPACITY of the requests
+CAPACITY = 256
+WINDOW_SECONDS = 60.0
+# Windows kept, i.e. reports reach back WINDOWS * WINDOW_SECONDS
+WINDOWS = 5
+
+
+class SpaceSaving:
+    """
+    Space-Saving summary of a stream: approximate counts of the most frequent
+    keys in fixed memory.
+
+    At most `capacity` keys are counted. A new key replaces the key with the
+    smallest count and inherits that count as its error, so counts are never
+    too low and too high by at most `error`. Keys are grouped by count
+    (stream-summary), so finding the smallest count costs O(1) even when
+    every request evicts a key.
+    """
+
+    def __init__(self, capacity: int = CAPACITY):
+        self.capacity = capacity
+        # Key -> [count, error, denied]; denied counts only requests seen
+        # since the key was last admitted to the summary
+        self.counters: Dict[str, List[int]] = {}
+        # Count -> keys with that count, as an insertion-ordered dict
+        self._buckets: Dict[int, Dict[str, None]] = {}
+        self._min_count = 0
+
+    def add(self, key: str, denied: bool = False) -> None:
+        buckets = self._buckets
+        counter = self.counters.get(key)
+        if counter is None:
+            floor = 0
+            if len(self.counters) >= self.capacity:
+                floor = self._evict()
+            counter = self.counters[key] = [floor, floor, 0]
+        else:
+            bucket = buckets[counter[0]]
+            del bucket[key]
+            if not bucket:
+                del buckets[counter[0]]
+        count = counter[0] = counter[0] + 1
+        bucket = buckets.get(count)
+        if bucket is None:
+            bucket = buckets[count] = {}
+        bucket[key] = None
+        # Only a new key or the last key leaving the smallest count moves the minimum
+        if count == 1 or self._min_count not in buckets:
+            self._min_count = count
+        if denied:
+            counter[2] += 1
+
+    @property
+    def floor(self) -> int:
+        """
+        Most requests a key missing from the summary can have had: the
+        smallest count once the summary is full, 0 before.
+        """
+        return self._min_count if len(self.counters) >= self.capacity else 0
+
+    def _evict(self) -> int:
+        """Drop the oldest key with the smallest count and return that count."""
+        count = self._min_count
+        bucket = self._buckets[count]
+        key = next(iter(bucket))
+        del bucket[key]
+        if not bucket:
+            del self._buckets[count]
+        del self.counters[key]
+        return count
+
+
+class HeavyHitterTracker:
+    """
+    Top keys by request volume over rolling windows.
+
+    Every window has its own SpaceSaving summary; the last `windows` are kept
+    and merged when reporting, so memory stays at `capacity * windows` keys
+    whatever the number of clients. A key missing from a window's summary
+    is counted with that summary's floor, as count and as error, so merged
+    counts stay upper bounds.
+    """
+
+    def __init__(self, capacity: int = CAPACITY, window: float = WINDOW_SECONDS, windows: int = WINDOWS):
+        self.capacity = capacity
+        self.window = window
+        self._summaries = deque(maxlen=windows)
+        self._current_start = float("-inf")
+        self._current = None
+
+    def record(self, key: str, denied: bool, now: float) -> None:
+        if now - self._current_start >= self.window:
+            self._current_start = now - now % self.window
+            self._current = SpaceSaving(self.capacity)
+            self._summaries.append((self._current_start, self._current))
+        self._current.add(key, denied)
+
+    def top(self, now: float, k: int = 10, windows: int = 1) -> List[dict]:
+        """
+        Heaviest keys of the last `windows` windows, the current one included.
+
+        Returns:
+            List[dict]: Up to `k` entries with key, requests (upper bound),
+            error (requests may be too high by at most this) and deny_ratio,
+            heaviest first.
+        """
+        since = now - now % self.window - (windows - 1) * self.window
+        summaries = [summary for start, summary in self._summaries if start >= since]
+        # Every key starts with the floors of all windows; a window that has
+        # the key replaces its floor with the key's own count and error
+        floors = sum(summary.floor for summary in summaries)
+        merged: Dict[str, List[int]] = {}
+        for summary in summaries:
+            floor = summary.floor
+            for key, (count, error, denied) in summary.counters.items():
+                total = merged.setdefault(key, [floors, floors, 0])
+                total[0] += count - floor
+                total[1] += error - floor
+                total[2] += denied
+        heaviest = heapq.nlargest(k, merged.items(), key=lambda item: item[1][0])
+        return [
+            {
+                "key": key,
+                "requests": count,
+                "error": error,
+                # Over the requests actually counted for this key
+                "deny_ratio": round(denied / (count - error), 3) if count > error else 0.0,
+            }
+            for key, (count, error, denied) in heaviest
+        ]
+
+
+# Heaviest clients (API keys, or IP addresses of clients without key) and
+# IP addresses, fed by every rate limit decision
+heavy_clients = HeavyHitterTracker()
+heavy_ips = HeavyHitterTracker()
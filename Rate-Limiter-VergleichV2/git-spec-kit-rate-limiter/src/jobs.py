@@ -0,0 +1,221 @@
+import asyncio
+import json
+import logging
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional
+from src.concurrency import ConcurrencyLimitExceeded
+
+logger = logging.getLogger(__name__)
+
+# Jobs computed at the same time, jobs waiting at most, and seconds a
+# finished job is kept for its client to fetch
+JOB_WORKERS = int(os.environ.get("ANALYZE_JOB_WORKERS", "4"))
+JOB_QUEUE = int(os.environ.get("ANALYZE_JOB_QUEUE", "1000"))
+JOB_TTL_SECONDS = float(os.environ.get("ANALYZE_JOB_TTL", "3600"))
+# Seconds between removals of expired jobs
+EXPIRY_INTERVAL_SECONDS = 30.0
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+@dataclass
+class Job:
+    id: str
+    status: str = QUEUED
+    submitted_at: float = 0.0
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    # Result of a done job, reason of a failed one
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (DONE, FAILED)
+
+
+class JobTable:
+    """Jobs by ID, in this process."""
+
+    def __init__(self):
+        self._jobs: Dict[str, Job] = {}
+
+    def save(self, job: Job) -> None:
+        self._jobs[job.id] = job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def expire(self, finished_before: float) -> int:
+        """Remove jobs finished before `finished_before`; return how many."""
+        expired = [job.id for job in self._jobs.values() if job.finished and job.finished_at < finished_before]
+        for job_id in expired:
+            del self._jobs[job_id]
+        return len(expired)
+
+    def __len__(self) -> int:
+        return len(self._jobs)
+
+
+class SQLiteJobTable(JobTable):
+    """
+    Jobs in memory and in the `jobs` table of a SQLite database, so results
+    survive a restart. Jobs that were queued or running at the restart are
+    failed, since the texts are not stored.
+    """
+
+    def __init__(self, path: str):
+        super().__init__()
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS jobs (id TEXT PRIMARY KEY, status TEXT, submitted_at REAL,"
+            " started_at REAL, finished_at REAL, result TEXT, error TEXT)"
+        )
+        now = time.time()
+        for row in self._connection.execute(
+            "SELECT id, status, submitted_at, started_at, finished_at, result, error FROM jobs"
+        ).fetchall():
+            job = Job(*row[:5], result=json.loads(row[5]) if row[5] else None, error=row[6])
+            if not job.finished:
+                job.status, job.finished_at, job.error = FAILED, now, "Interrupted by restart"
+            self.save(job)
+
+    def save(self, job: Job) -> None:
+        super().save(job)
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO jobs VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job.id, job.status, job.submitted_at, job.started_at, job.finished_at,
+                 json.dumps(job.result) if job.result is not None else None, job.error),
+            )
+            self._connection.commit()
+
+    def expire(self, finished_before: float) -> int:
+        expired = super().expire(finished_before)
+        if expired:
+            with self._lock:
+                self._connection.execute(
+                    "DELETE FROM jobs WHERE status IN (?, ?) AND finished_at < ?", (DONE, FAILED, finished_before)
+                )
+                self._connection.commit()
+        return expired
+
+    def close(self) -> None:
+        self._connection.close()
+
+
+class JobRunner:
+    """
+    Runs submitted jobs in the background with a fixed number of workers.
+
+    Submitting returns right away with the job, which the client polls by
+    ID. At most `max_queued` jobs wait for a worker; more are refused with
+    ConcurrencyLimitExceeded. Finished jobs are kept for `ttl` seconds.
+    The workers run in run(), started with the application.
+    """
+
+    def __init__(
+        self,
+        table: JobTable,
+        process: Callable[[Any], Awaitable[Dict[str, Any]]],
+        workers: int = JOB_WORKERS,
+        max_queued: int = JOB_QUEUE,
+        ttl: float = JOB_TTL_SECONDS,
+    ):
+        """
+        Args:
+            table (JobTable): Where jobs are kept.
+            process: Coroutine function computing the result of a job from
+                the payload it was submitted with.
+            workers (int): Jobs processed at the same time.
+            max_queued (int): Jobs waiting for a worker at most.
+            ttl (float): Seconds a finished job is kept.
+        """
+        self.table = table
+        self.process = process
+        self.workers = workers
+        self.max_queued = max_queued
+        self.ttl = ttl
+        self.running = 0
+        self._queue: asyncio.Queue = asyncio.Queue(max_queued)
+
+    @property
+    def queued(self) -> int:
+        return self._queue.qsize()
+
+    def submit(self, payload: Any) -> Job:
+        """
+        Queue a job for `payload`.
+
+        Raises:
+            ConcurrencyLimitExceeded: If `max_queued` jobs are waiting already.
+        """
+        if self._queue.full():
+            raise ConcurrencyLimitExceeded(retry_after=1)
+        job = Job(id=secrets.token_urlsafe(16), submitted_at=time.time())
+        self.table.save(job)
+        self._queue.put_nowait((job, payload))
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """The job with this ID, None if there is none or it expired."""
+        job = self.table.get(job_id)
+        if job is None or (job.finished and job.finished_at < time.time() - self.ttl):
+            return None
+        return job
+
+    async def run(self) -> None:
+        """Process jobs and remove expired ones until cancelled."""
+        # The queue belongs to the loop it is awaited in; move jobs
+        # submitted before into a queue of this loop
+        queue, self._queue = self._queue, asyncio.Queue(self.max_queued)
+        while not queue.empty():
+            self._queue.put_nowait(queue.get_nowait())
+        workers = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+        try:
+            while True:
+                await asyncio.sleep(EXPIRY_INTERVAL_SECONDS)
+                self.table.expire(time.time() - self.ttl)
+        finally:
+            for worker in workers:
+                worker.cancel()
+
+    async def _work(self) -> None:
+        while True:
+            job, payload = await self._queue.get()
+            self.running += 1
+            job.status, job.started_at = RUNNING, time.time()
+            self.table.save(job)
+            try:
+                job.result = await self.process(payload)
+                job.status = DONE
+            except ConcurrencyLimitExceeded:
+                job.status, job.error = FAILED, "Service overloaded"
+            except Exception as exc:
+                logger.exception("Job %s failed", job.id)
+                job.status, job.error = FAILED, f"{type(exc).__name__}: {exc}"
+            finally:
+                self.running -= 1
+            job.finished_at = time.time()
+            self.table.save(job)
+
+
+def create_job_table() -> JobTable:
+    """In-memory job table, or persisted in the SQLite database at ANALYZE_JOB_DB_PATH."""
+    path = os.environ.get("ANALYZE_JOB_DB_PATH")
+    return SQLiteJobTable(path) if path else JobTable()
+
+
+def job_timings(job: Job) -> Dict[str, Optional[float]]:
+    """Seconds the job waited for a worker and was processed, None while unknown."""
+    return {
+        "queue_seconds": job.started_at - job.submitted_at if job.started_at is not None else None,
+        "run_seconds": job.finished_at - job.started_at if job.finished_at is not None and job.started_at is not None else None,
+    }
@@ -0,0 +1,159 @@
+import asyncio
+import hashlib
+import logging
+import os
+import sqlite3
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Key that was hardcoded before the registry existed, used if no key source is configured
+DEFAULT_PRO_KEY = "secret-pro-key"
+
+
+@dataclass(frozen=True)
+class ApiKeyRecord:
+    tier: str
+    # Requests per window for this key, None uses the tier limit
+    limit: Optional[int] = None
+
+
+def hash_key(api_key: str) -> str:
+    """Hash an API key the way it is stored in key files and tables."""
+    return hashlib.sha256(api_key.encode()).hexdigest()
+
+
+def load_key_file(path: str) -> Dict[str, ApiKeyRecord]:
+    """
+    Read a key file with one key per line: `<sha256 hex> <tier> [limit]`.
+    Empty lines and lines starting with '#' are ignored.
+
+    Raises:
+        ValueError: If a line is malformed.
+    """
+    records = {}
+    with open(path, encoding="utf-8") as key_file:
+        for line_number, line in enumerate(key_file, 1):
+            fields = line.split()
+            if not fields or fields[0].startswith("#"):
+                continue
+            if len(fields) not in (2, 3) or len(fields[0]) != 64:
+                raise ValueError(f"{path}:{line_number}: expected '<sha256 hex> <tier> [limit]'")
+            limit = int(fields[2]) if len(fields) == 3 else None
+            records[fields[0].lower()] = ApiKeyRecord(tier=fields[1], limit=limit)
+    return records
+
+
+def load_key_table(path: str) -> Dict[str, ApiKeyRecord]:
+    """
+    Read the `api_keys(key_hash TEXT PRIMARY KEY, tier TEXT, rate_limit INTEGER)`
+    table of a SQLite database.
+    """
+    connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        rows = connection.execute("SELECT key_hash, tier, rate_limit FROM api_keys").fetchall()
+    finally:
+        connection.close()
+    return {key_hash.lower(): ApiKeyRecord(tier=tier, limit=limit) for key_hash, tier, limit in rows}
+
+
+class KeyRegistry:
+    """
+    Resolves API keys to their tier and quota.
+
+    Only SHA-256 hashes of the keys are kept, in a dict, so a lookup is one
+    hash plus one dict access regardless of the number of keys. Recently
+    presented keys skip the hashing through a small LRU cache.
+
+    The key set is loaded from a key file or a SQLite database (.db, .sqlite).
+    `reload_if_changed` builds the new key set off the request path and
+    swaps it in with a single assignment; lookups never take a lock and see
+    either the old or the new key set, never a mix.
+    """
+
+    def __init__(self, path: Optional[str] = None, cache_size: int = 1024):
+        """
+        Args:
+            path (str, optional): Key file or SQLite database. Without a path
+                only DEFAULT_PRO_KEY is known (as 'pro').
+            cache_size (int): Number of recently presented keys to cache.
+        """
+        self.path = path
+        self.cache_size = cache_size
+        self._version: Optional[Tuple[int, int]] = None
+        # Records and the cache for them are replaced together
+        self._state: Tuple[Dict[str, ApiKeyRecord], OrderedDict] = ({}, OrderedDict())
+        self.reloads = 0
+        if path is None:
+            self.replace({hash_key(DEFAULT_PRO_KEY): ApiKeyRecord(tier="pro")})
+        else:
+            self.reload_if_changed()
+
+    def __len__(self) -> int:
+        return len(self._state[0])
+
+    def replace(self, records: Dict[str, ApiKeyRecord]) -> None:
+        """Atomically switch to a new key set."""
+        self._state = (records, OrderedDict())
+        self.reloads += 1
+
+    def lookup(self, api_key: str) -> Optional[ApiKeyRecord]:
+        """Return the record of `api_key`, or None if the key is unknown."""
+        records, cache = self._state
+        try:
+            record = cache[api_key]
+            cache.move_to_end(api_key)
+            return record
+        except KeyError:
+            pass
+        record = records.get(hash_key(api_key))
+        cache[api_key] = record
+        if len(cache) > self.cache_size:
+            try:
+                cache.popitem(last=False)
+            except KeyError:
+                pass
+        return record
+
+    def _source_version(self) -> Tuple[int, int]:
+        stat = os.stat(self.path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def reload_if_changed(self) -> bool:
+        """
+        Reload the key source if it changed since the last load.
+
+        Returns:
+            bool: True if a new key set was swapped in.
+        """
+        version = self._source_version()
+        if version == self._version:
+            return False
+        if self.path.endswith((".db", ".sqlite", ".sqlite3")):
+            records = load_key_table(self.path)
+        else:
+            records = load_key_file(self.path)
+        self.replace(records)
+        self._version = version
+        return True
+
+    async def run_reloader(self, interval: float = 5.0) -> None:
+        """Check the key source every `interval` seconds until cancelled."""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                # Parsing thousands of keys must not stall the event loop
+                await asyncio.to_thread(self.reload_if_changed)
+            except Exception:
+                logger.exception("Reloading API keys from %s failed, keeping the previous keys", self.path)
+
+
+def registry_from_env() -> KeyRegistry:
+    """Create the registry for the key source in API_KEYS_PATH, if set."""
+    return KeyRegistry(os.environ.get("API_KEYS_PATH") or None)
+
+
+# Registry used to identify clients
+api_key_registry = registry_from_env()
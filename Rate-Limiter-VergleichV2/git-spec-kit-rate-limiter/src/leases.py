@@ -0,0 +1,301 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, replace
+from typing import Dict, List, Optional, Sequence, Tuple
+from src.algorithms import RateLimitAlgorithm, RateLimitEntry, get_algorithm
+from src.backend import QuotaCheck, RateLimitBackend
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class QuotaLease(RateLimitEntry):
+    """
+    Slice of a client's quota leased from the shared backend.
+
+    `request_count` counts the units admitted locally since the lease was
+    taken at `window_start_time`; `granted` is the size of the slice.
+    """
+    granted: int = 0
+    expires_at: float = 0.0
+    client_id: str = ""
+    algorithm: str = ""
+    limit: int = 0
+    window: float = 0.0
+
+    @property
+    def remaining(self) -> int:
+        return self.granted - self.request_count
+
+
+class LeasingBackend(RateLimitBackend):
+    """
+    Decides locally from quota leases instead of asking the shared backend
+    on every request.
+
+    On a miss the worker takes a lease of `lease_fraction * limit` units from
+    the shared backend in one round trip and admits the following requests
+    of that client from it without any I/O. In the background, `reconcile`
+    sends one batch per interval that tops up leases running low and gives
+    back the unused units of leases that expired.
+
+    Leased units are taken from the shared quota up front, so within a window
+    workers never admit more than the limit together. Units refunded after
+    the window they were taken in has ended are credited to the new window;
+    this bounds over-admission to one lease per worker and client per window.
+    Until a lease is refunded, its unused units are not available to other
+    workers.
+
+    A request limited on several levels is admitted locally only if the
+    leases of all levels cover it. Otherwise the levels without one are
+    leased from the shared backend in a single all-or-nothing acquire_all,
+    and if that is rejected, nothing is taken on any level.
+    """
+
+    def __init__(
+        self,
+        backend: RateLimitBackend,
+        lease_fraction: float = 0.1,
+        lease_seconds: float = 5.0,
+        refill_threshold: float = 0.25,
+    ):
+        """
+        Args:
+            backend (RateLimitBackend): Shared backend the leases are taken from.
+            lease_fraction (float): Lease size as a fraction of the tier limit.
+            lease_seconds (float): Time after which unused units are given back.
+            refill_threshold (float): Fraction of a lease left at which the
+                reconciler tops it up.
+        """
+        self.backend = backend
+        self.lease_fraction = lease_fraction
+        self.lease_seconds = lease_seconds
+        self.refill_threshold = refill_threshold
+        # Key: "<algorithm>:<client_id>", only leases of recently active clients
+        self.leases: Dict[str, QuotaLease] = {}
+        self.local_decisions = 0
+        self.remote_calls = 0
+        self.refunded_units = 0
+
+    def lease_size(self, limit: int) -> int:
+        return max(1, int(limit * self.lease_fraction))
+
+    def _take_local(self, key: str, now: float, min_units: int, max_units: int) -> Optional[Tuple[int, float]]:
+        lease = self.leases.get(key)
+        if lease is None or lease.expires_at <= now or lease.remaining < min_units:
+            return None
+        units = min(max_units, lease.remaining)
+        lease.request_count += units
+        self.local_decisions += 1
+        return units, 0.0
+
+    def _charge_local(self, key: str, now: float, max_units: int) -> int:
+        """Take up to `max_units` from the lease of `key`; return how many."""
+        lease = self.leases.get(key)
+        if lease is None or lease.expires_at <= now:
+            return 0
+        units = min(max_units, lease.remaining)
+        lease.request_count += units
+        return units
+
+    def _renewal(self, key: str, limit: int, min_units: int, max_units: int, refund: int) -> Tuple[int, int, int]:
+        """Arguments for the backend call that replaces the lease of `key`."""
+        lease = self.leases.pop(key, None)
+        unused = lease.remaining if lease is not None else 0
+        self.remote_calls += 1
+        return min_units, max(self.lease_size(limit), max_units), refund + unused
+
+    def _install(
+        self, key: str, client_id: str, algorithm: RateLimitAlgorithm, now: float, limit: int, window: float,
+        max_units: int, granted: int, wait: float,
+    ) -> Tuple[int, float]:
+        if granted == 0:
+            return 0, wait
+        units = min(max_units, granted)
+        # The reconciler may have installed a top-up while the call was in flight
+        concurrent = self.leases.get(key)
+        if concurrent is not None:
+            granted += concurrent.remaining
+        self.leases[key] = QuotaLease(
+            request_count=units,
+            window_start_time=now,
+            granted=granted,
+            expires_at=now + self.lease_seconds,
+            client_id=client_id,
+            algorithm=algorithm.name,
+            limit=limit,
+            window=window,
+        )
+        return units, 0.0
+
+    def take(
+        self, client_id: str, algorithm: RateLimitAlgorithm, now: float, limit: int, window: float,
+        min_units: int = 1, max_units: int = 1, refund: int = 0,
+    ) -> Tuple[int, float]:
+        key = f"{algorithm.name}:{client_id}"
+        if refund == 0 and min_units == 0:
+            # A charge (e.g. compute time): what the lease cannot cover is
+            # taken from the shared backend instead of being dropped
+            taken = self._charge_local(key, now, max_units)
+            if taken == max_units:
+                return taken, 0.0
+            self.remote_calls += 1
+            granted, wait = self.backend.take(client_id, algorithm, now, limit, window, 0, max_units - taken)
+            return taken + granted, wait
+        if refund == 0:
+            local = self._take_local(key, now, min_units, max_units)
+            if local is not None:
+                return local
+        lease_min, lease_max, lease_refund = self._renewal(key, limit, min_units, max_units, refund)
+        granted, wait = self.backend.take(client_id, algorithm, now, limit, window, lease_min, lease_max, lease_refund)
+        return self._install(key, client_id, algorithm, now, limit, window, max_units, granted, wait)
+
+    async def take_async(
+        self, client_id: str, algorithm: RateLimitAlgorithm, now: float, limit: int, window: float,
+        min_units: int = 1, max_units: int = 1, refund: int = 0,
+    ) -> Tuple[int, float]:
+        key = f"{algorithm.name}:{client_id}"
+        if refund == 0 and min_units == 0:
+            # A charge (e.g. compute time): what the lease cannot cover is
+            # taken from the shared backend instead of being dropped
+            taken = self._charge_local(key, now, max_units)
+            if taken == max_units:
+                return taken, 0.0
+            self.remote_calls += 1
+            granted, wait = await self.backend.take_async(
+                client_id, algorithm, now, limit, window, 0, max_units - taken
+            )
+            return taken + granted, wait
+        if refund == 0:
+            local = self._take_local(key, now, min_units, max_units)
+            if local is not None:
+                return local
+        lease_min, lease_max, lease_refund = self._renewal(key, limit, min_units, max_units, refund)
+        granted, wait = await self.backend.take_async(
+            client_id, algorithm, now, limit, window, lease_min, lease_max, lease_refund
+        )
+        return self._install(key, client_id, algorithm, now, limit, window, max_units, granted, wait)
+
+    def _reserve_all(self, checks: Sequence[QuotaCheck], now: float) -> Tuple[list, List[QuotaCheck]]:
+        """
+        Take the units of every level whose lease covers them.
+
+        Returns:
+            The reserved (lease, units) pairs and the checks of the levels
+            that need the shared backend.
+        """
+        reserved, missing = [], []
+        for check in checks:
+            lease = self.leases.get(f"{check.algorithm.name}:{check.client_id}")
+            if lease is not None and lease.expires_at > now and lease.remaining >= check.units:
+                lease.request_count += check.units
+                reserved.append((lease, check.units))
+            else:
+                missing.append(check)
+        if not missing:
+            self.local_decisions += 1
+        return reserved, missing
+
+    def _lease_checks(self, missing: List[QuotaCheck]) -> List[QuotaCheck]:
+        """Checks leasing a whole slice for each level without a lease."""
+        return [replace(check, units=max(check.units, self.lease_size(check.limit))) for check in missing]
+
+    def _finish_all(
+        self, reserved: list, missing: List[QuotaCheck], leased: List[QuotaCheck], now: float, wait: float
+    ) -> float:
+        if wait > 0:
+            for lease, units in reserved:
+                lease.request_count -= units
+            return wait
+        for check, lease_check in zip(missing, leased):
+            self._install(
+                f"{check.algorithm.name}:{check.client_id}", check.client_id, check.algorithm, now,
+                check.limit, check.window, check.units, lease_check.units, 0.0,
+            )
+        return 0.0
+
+    def acquire_all(self, checks: Sequence[QuotaCheck], now: float) -> float:
+        reserved, missing = self._reserve_all(checks, now)
+        if not missing:
+            return 0.0
+        leased = self._lease_checks(missing)
+        self.remote_calls += 1
+        wait = self.backend.acquire_all(leased, now)
+        if wait > 0 and leased != missing:
+            # No room for whole slices, the request alone may still fit
+            leased = missing
+            self.remote_calls += 1
+            wait = self.backend.acquire_all(leased, now)
+        return self._finish_all(reserved, missing, leased, now, wait)
+
+    async def acquire_all_async(self, checks: Sequence[QuotaCheck], now: float) -> float:
+        reserved, missing = self._reserve_all(checks, now)
+        if not missing:
+            return 0.0
+        leased = self._lease_checks(missing)
+        self.remote_calls += 1
+        wait = await self.backend.acquire_all_async(leased, now)
+        if wait > 0 and leased != missing:
+            leased = missing
+            self.remote_calls += 1
+            wait = await self.backend.acquire_all_async(leased, now)
+        return self._finish_all(reserved, missing, leased, now, wait)
+
+    async def reconcile(self, now: float) -> int:
+        """
+        Give back unused units of expired leases and top up leases that are
+        running low, in a single batch against the shared backend.
+
+        Returns:
+            int: Number of leases sent to the backend.
+        """
+        calls, targets = [], []
+        for key, lease in list(self.leases.items()):
+            algorithm = get_algorithm(lease.algorithm)
+            if lease.expires_at <= now:
+                del self.leases[key]
+                if lease.remaining > 0:
+                    calls.append((lease.client_id, algorithm, now, lease.limit, lease.window, 0, 0, lease.remaining))
+                    targets.append((None, calls[-1]))
+                    self.refunded_units += lease.remaining
+            elif lease.remaining <= self.lease_size(lease.limit) * self.refill_threshold:
+                top_up = self.lease_size(lease.limit) - lease.remaining
+                calls.append((lease.client_id, algorithm, now, lease.limit, lease.window, 0, top_up, 0))
+                targets.append((key, calls[-1]))
+
+        results = await self.backend.take_many_async(calls)
+        for (key, call), (granted, _) in zip(targets, results):
+            if key is None or granted == 0:
+                continue
+            lease = self.leases.get(key)
+            if lease is None:
+                # A request renewed the lease while the batch was in flight;
+                # park the units in a fresh lease, _install merges them
+                client_id, algorithm, _, limit, window = call[:5]
+                lease = QuotaLease(
+                    request_count=0, window_start_time=now, expires_at=now + self.lease_seconds,
+                    client_id=client_id, algorithm=algorithm.name, limit=limit, window=window,
+                )
+                self.leases[key] = lease
+            # The expiry is not extended: a client that went idle after the
+            # top-up gets its units refunded once the lease runs out
+            lease.granted += granted
+        return len(calls)
+
+    async def run_reconciler(self, interval: float = 1.0) -> None:
+        """Reconcile every `interval` seconds until cancelled."""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.reconcile(time.time())
+            except Exception:
+                logger.exception("Quota lease reconciliation failed")
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "leases": len(self.leases),
+            "local_decisions": self.local_decisions,
+            "remote_calls": self.remote_calls,
+            "refunded_units": self.refunded_units,
+        }
@@ -1,18 +1,72 @@
+import asyncio
+import ipaddress
+import logging
+import math
+import os
+import secrets
 import time
 import random
-from typing import Optional
-from fastapi import FastAPI, Header, HTTPException, Depends, Request
-from fastapi.responses import JSONResponse
-from pydantic import BaseModel
-from src.dependencies import get_rate_limiter
-from src.rate_limiter import RateLimitExceeded
+from contextlib import asynccontextmanager
+from typing import List, Optional, Tuple
+from fastapi import FastAPI, Header, HTTPException, Depends, Request, Response
+from fastapi.responses import JSONResponse, PlainTextResponse
+from pydantic import BaseModel, Field
+from src import heavy_hitters, key_registry, metrics, rate_limiter, result_cache
+from src.admission import admission_queue
+from src.coalescing import MAX_BATCH_SIZE, RequestCoalescer
+from src.concurrency import ConcurrencyLimitExceeded
+from src.dependencies import get_rate_limiter, limited_client_id, rate_limited
+from src.executor import computation_pool
+from src.jobs import DONE, Job, JobRunner, create_job_table, job_timings
+from src.middleware import RateLimitMiddleware
+from src.rate_limiter import RateLimitExceeded, charge_compute_time_async, request_cost
+from src.single_flight import SingleFlight
+from src.snapshot import StoreSnapshotter
+
+logger = logging.getLogger(__name__)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Quota leases are reconciled with the shared backend in the background
+    background_tasks = []
+    run_reconciler = getattr(rate_limiter.rate_limit_backend, "run_reconciler", None)
+    if run_reconciler is not None:
+        background_tasks.append(asyncio.create_task(run_reconciler()))
+    # API keys are reloaded when their file or table changes
+    if key_registry.api_key_registry.path is not None:
+        background_tasks.append(asyncio.create_task(key_registry.api_key_registry.run_reloader()))
+    # Analysis jobs are processed in the background
+    background_tasks.append(asyncio.create_task(analysis_jobs.run()))
+    # Warm restart: continue with the limiter state of the last snapshot
+    snapshotter = None
+    snapshot_path = os.environ.get("RATE_LIMIT_SNAPSHOT_PATH")
+    if snapshot_path:
+        snapshotter = StoreSnapshotter(rate_limiter.rate_limit_store, snapshot_path)
+        try:
+            snapshotter.load(time.time())
+        except ValueError:
+            logger.exception("Ignoring unreadable rate limit snapshot")
+        interval = float(os.environ.get("RATE_LIMIT_SNAPSHOT_INTERVAL", "10"))
+        background_tasks.append(asyncio.create_task(snapshotter.run(interval)))
+    yield
+    for task in background_tasks:
+        task.cancel()
+    if snapshotter is not None:
+        await snapshotter.save_async()
+    await asyncio.to_thread(computation_pool.shutdown)
 
 app = FastAPI(
     title="Sentiment Analysis Service (Base Project)",
     description="Eine API, die Text analysiert. Simuliert teure Berechnungen.",
-    version="0.1.0"
+    version="0.1.0",
+    lifespan=lifespan
 )
 
+# Mit RATE_LIMIT_MIDDLEWARE=1 werden Anfragen über dem Limit abgewiesen,
+# bevor der Body gelesen und validiert wird.
+if os.environ.get("RATE_LIMIT_MIDDLEWARE") == "1":
+    app.add_middleware(RateLimitMiddleware, paths=["/analyze"])
+
 @app.exception_handler(RateLimitExceeded)
 async def rate_limit_handler(request: Request, exc: RateLimitExceeded):
     return JSONResponse(
@@ -21,6 +75,14 @@ async def rate_limit_handler(request: Request, exc: RateLimitExceeded):
         headers={"Retry-After": str(exc.retry_after)}
     )
 
+@app.exception_handler(ConcurrencyLimitExceeded)
+async def overload_handler(request: Request, exc: ConcurrencyLimitExceeded):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Service overloaded"},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
 # --- Datenmodelle ---
 class AnalysisRequest(BaseModel):
     text: str
@@ -32,6 +94,26 @@ class AnalysisResponse(BaseModel):
     processing_time_ms: float
     status: str
 
+def analysis_cost(request: AnalysisRequest) -> int:
+    # Lange Texte verbrauchen mehr vom Kontingent (Arbeitseinheiten)
+    return request_cost(request.text, request.language)
+
+# Texte pro Batch-Anfrage und pro Aufruf der Berechnung (Micro-Batch)
+ANALYZE_BATCH_MAX_ITEMS = int(os.environ.get("ANALYZE_BATCH_MAX_ITEMS", "100"))
+ANALYZE_MICRO_BATCH_SIZE = int(os.environ.get("ANALYZE_MICRO_BATCH_SIZE", "16"))
+# Micro-Batches einer Batch-Anfrage, die gleichzeitig rechnen
+ANALYZE_BATCH_CONCURRENCY = int(os.environ.get("ANALYZE_BATCH_CONCURRENCY", "4"))
+
+class AnalysisBatchRequest(BaseModel):
+    items: List[AnalysisRequest] = Field(min_length=1, max_length=ANALYZE_BATCH_MAX_ITEMS)
+
+class AnalysisBatchResponse(BaseModel):
+    results: List[AnalysisResponse]
+
+def batch_cost(request: AnalysisBatchRequest) -> int:
+    # Einmal für alle Texte, als hätte der Client sie einzeln geschickt
+    return sum(analysis_cost(item) for item in request.items)
+
 # --- Dummy Datenbank / Business Logic ---
 
 def expensive_computation():
@@ -42,20 +124,155 @@ def expensive_computation():
     # Zufällige Verzögerung zwischen 200ms und 800ms
     time.sleep(random.uniform(0.2, 0.8))
 
+def analyze_micro_batch(texts: List[str]) -> List[float]:
+    """
+    Analysiert mehrere Texte in einem Aufruf der 'teuren' Berechnung,
+    deren Fixkosten (Modell laden, Aufruf) sich alle Texte teilen.
+    """
+    expensive_computation()
+    return [random.uniform(-1.0, 1.0) for _ in texts]
+
+async def analyze_coalesced(items: List[Tuple[str, str]]) -> List[Tuple[float, float, float]]:
+    """
+    Ein Durchlauf der Berechnung für gleichzeitige /analyze-Anfragen
+    (Text, Tier). Liefert pro Anfrage (Sentiment, Dauer des Durchlaufs,
+    Anteil an der Rechenzeit).
+    """
+    # Ein Platz für alle, mit der Priorität des bevorzugten Tiers im Batch
+    tier = max((user_tier for _, user_tier in items), key=lambda user_tier: admission_queue.head_start.get(user_tier, 0.0))
+    async with admission_queue.slot(tier):
+        start_time = time.time()
+        sentiments = await computation_pool.run(analyze_micro_batch, [text for text, _ in items])
+    duration = time.time() - start_time
+    metrics.analyze_processing_seconds.observe(duration)
+    metrics.analyze_batch_size.observe(len(items))
+    return [(sentiment, duration, duration / len(items)) for sentiment in sentiments]
+
+async def analyze_single(
+    text: str, user_tier: str, timeout: Optional[float] = None, sheddable: bool = True
+) -> Tuple[float, float, float]:
+    """
+    Berechnung für eine /analyze-Anfrage. Liefert (Sentiment, Dauer,
+    Rechenzeit des Clients). `timeout` und `sheddable` gelten für das Warten
+    auf einen Platz (siehe PriorityAdmissionQueue.acquire).
+    """
+    if analysis_coalescer is not None and timeout is None and sheddable:
+        # Gleichzeitige Anfragen teilen sich einen Durchlauf der Berechnung;
+        # Jobs warten anders auf einen Platz und rechnen daher einzeln
+        return await analysis_coalescer.submit((text, user_tier))
+
+    # Globales, adaptives Limit paralleler Berechnungen; wer keinen Platz
+    # bekommt, wartet nach Tier priorisiert (Pro zuerst), sonst 503
+    async with admission_queue.slot(user_tier, timeout, sheddable):
+        start_time = time.time()
+
+        # Simuliere Arbeit (CPU-intensiv) im Worker-Pool (COMPUTE_EXECUTOR),
+        # damit die Event-Loop andere Anfragen (z.B. /health) weiter bedient
+        await computation_pool.run(expensive_computation)
+
+    # Generiere Dummy-Ergebnis
+    sentiment = random.uniform(-1.0, 1.0)
+
+    duration = time.time() - start_time
+    metrics.analyze_processing_seconds.observe(duration)
+    metrics.analyze_batch_size.observe(1)
+    return sentiment, duration, duration
+
+# Laufende Berechnungen nach cache_key, für gleichzeitige gleiche Anfragen
+analysis_flights = SingleFlight()
+
+async def analyze_cached(
+    text: str, language: str, user_tier: str, timeout: Optional[float] = None, sheddable: bool = True
+) -> Tuple[float, float, float]:
+    """
+    Ergebnis aus dem Cache oder einer (geteilten) Berechnung. Liefert
+    (Sentiment, Dauer, Rechenzeit des Clients).
+    """
+    # Gleiche Texte werden nur einmal berechnet (ANALYZE_CACHE_SIZE); das
+    # Rate Limiting der Anfrage gilt auch für Treffer
+    cache = result_cache.analysis_cache
+    key = result_cache.cache_key(text, language)
+    start_time = time.time()
+    sentiment = await cache.get(key) if cache is not None else None
+    if sentiment is not None:
+        return sentiment, time.time() - start_time, 0.0
+
+    async def compute():
+        result = await analyze_single(text, user_tier, timeout, sheddable)
+        if cache is not None:
+            await cache.set(key, result[0])
+        return result
+
+    # Gleiche Anfragen, die währenddessen eintreffen, warten auf dieselbe
+    # Berechnung; nur die erste zahlt die Rechenzeit. Wer nicht abgewiesen
+    # werden darf (Jobs), teilt nur mit seinesgleichen
+    flight = key if sheddable else (key, "accepted")
+    (sentiment, duration, compute_time), shared = await analysis_flights.do(flight, compute)
+    return sentiment, duration, 0.0 if shared else compute_time
+
+# Mit ANALYZE_COALESCE_WINDOW_MS > 0 werden gleichzeitige /analyze-Anfragen
+# gesammelt (höchstens so lange bzw. bis ANALYZE_COALESCE_MAX_BATCH) und
+# gemeinsam berechnet: längeres Fenster = größere Batches, mehr Latenz
+ANALYZE_COALESCE_WINDOW_MS = float(os.environ.get("ANALYZE_COALESCE_WINDOW_MS", "0"))
+ANALYZE_COALESCE_MAX_BATCH = int(os.environ.get("ANALYZE_COALESCE_MAX_BATCH", str(MAX_BATCH_SIZE)))
+analysis_coalescer = RequestCoalescer(
+    analyze_coalesced, ANALYZE_COALESCE_MAX_BATCH, ANALYZE_COALESCE_WINDOW_MS / 1000
+) if ANALYZE_COALESCE_WINDOW_MS > 0 else None
+
 # --- Endpoints ---
 
-@app.get("/")
+# Begrenzt nur, wenn für die Route ein Limit konfiguriert ist (RATE_LIMIT_ROUTES_PATH)
+@app.get("/", dependencies=[Depends(get_rate_limiter)])
 async def root():
     return {"message": "Service is online. Use /analyze to process text."}
 
-@app.get("/health")
+@app.get("/health", dependencies=[Depends(get_rate_limiter)])
 async def health_check():
     return {"status": "ok", "load": "low"}
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    # Prometheus-Textformat
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
+
+# Admin-Endpoints sind nur mit ADMIN_TOKEN (Header X-Admin-Token) erreichbar
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN")
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    if not ADMIN_TOKEN or not x_admin_token or not secrets.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+def _public_key(client_id: str) -> str:
+    # API-Keys nur als SHA-256 ausgeben (wie in der Key-Datei), IP-Adressen im Klartext
+    try:
+        ipaddress.ip_address(client_id)
+        return client_id
+    except ValueError:
+        return key_registry.hash_key(client_id)
+
+@app.get("/admin/heavy-hitters", dependencies=[Depends(require_admin)])
+async def heavy_hitters_endpoint(limit: int = 10, windows: int = 1):
+    """
+    Clients und IP-Adressen mit den meisten Anfragen in den letzten
+    `windows` Minuten, mit Anteil abgelehnter Anfragen.
+    """
+    limit = max(1, min(limit, heavy_hitters.CAPACITY))
+    windows = max(1, min(windows, heavy_hitters.WINDOWS))
+    now = time.time()
+    clients = heavy_hitters.heavy_clients.top(now, limit, windows)
+    for entry in clients:
+        entry["key"] = _public_key(entry["key"])
+    return {
+        "window_seconds": heavy_hitters.WINDOW_SECONDS * windows,
+        "clients": clients,
+        "ips": heavy_hitters.heavy_ips.top(now, limit, windows),
+    }
+
 @app.post("/analyze", response_model=AnalysisResponse)
 async def analyze_text(
     request: AnalysisRequest,
-    user_tier: str = Depends(get_rate_limiter)
+    http_request: Request,
+    user_tier: str = Depends(rate_limited(analysis_cost))
 ):
     """
     Dieser Endpoint führt die 'schwere' Arbeit aus.
@@ -65,22 +282,175 @@ async def analyze_text(
     print(f"Request from User-Tier: {user_tier}")
 
     # 2. Start der 'teuren' Verarbeitung
-    start_time = time.time()
-    
-    # Simuliere Arbeit (CPU-intensiv)
-    expensive_computation()
-    
-    # Generiere Dummy-Ergebnis
-    sentiment = random.uniform(-1.0, 1.0)
-    
-    duration = (time.time() - start_time) * 1000
+    sentiment, duration, compute_time = await analyze_cached(request.text, request.language, user_tier)
+
+    # Gemessene Rechenzeit vom Zeitbudget des Clients abziehen (nur auf
+    # begrenzten Routen)
+    client_id = limited_client_id(http_request)
+    if client_id is not None:
+        await charge_compute_time_async(client_id, user_tier, compute_time)
 
     # 3. Rückgabe
     return AnalysisResponse(
         text_length=len(request.text),
         sentiment_score=round(sentiment, 2),
-        processing_time_ms=round(duration, 2),
+        processing_time_ms=round(duration * 1000, 2),
         status=f"Processed for {user_tier} tier"
     )
 
+@app.post("/analyze/batch", response_model=AnalysisBatchResponse)
+async def analyze_batch(
+    request: AnalysisBatchRequest,
+    http_request: Request,
+    user_tier: str = Depends(rate_limited(batch_cost, capped=False))
+):
+    """
+    Analysiert viele Texte mit einer Anfrage: ein Rate-Limit-Check für alle
+    Texte, die Berechnung läuft in Micro-Batches (ANALYZE_MICRO_BATCH_SIZE).
+    Ergebnisse in der Reihenfolge der Texte.
+    """
+    items = request.items
+    client_id = limited_client_id(http_request)
+    durations: List[float] = []
+
+    async def run_micro_batch(micro_batch: List[AnalysisRequest], sheddable: bool = True):
+        # Jeder Micro-Batch ist eine Berechnung und braucht einen Platz wie
+        # ein einzelner /analyze-Aufruf, so bleibt die Latenz pro Platz gleich
+        timeout = None if sheddable else math.inf
+        async with admission_queue.slot(user_tier, timeout, sheddable):
+            start_time = time.time()
+            sentiments = await computation_pool.run(analyze_micro_batch, [item.text for item in micro_batch])
+        duration = time.time() - start_time
+        durations.append(duration)
+        metrics.analyze_processing_seconds.observe(duration)
+        metrics.analyze_batch_size.observe(len(micro_batch))
+        return [
+            AnalysisResponse(
+                text_length=len(item.text),
+                sentiment_score=round(sentiment, 2),
+                processing_time_ms=round(duration * 1000, 2),
+                status=f"Processed for {user_tier} tier"
+            )
+            for item, sentiment in zip(micro_batch, sentiments)
+        ]
+
+    semaphore = asyncio.Semaphore(ANALYZE_BATCH_CONCURRENCY)
+
+    async def run_accepted_micro_batch(micro_batch: List[AnalysisRequest]):
+        async with semaphore:
+            return await run_micro_batch(micro_batch, sheddable=False)
+
+    micro_batches = [
+        items[offset:offset + ANALYZE_MICRO_BATCH_SIZE] for offset in range(0, len(items), ANALYZE_MICRO_BATCH_SIZE)
+    ]
+    try:
+        # Der erste Micro-Batch wird wie eine /analyze-Anfrage zugelassen (bei
+        # Überlast 503, bevor gerechnet wurde). Danach ist die Anfrage
+        # angenommen: die übrigen warten auf einen Platz, statt abgewiesen zu
+        # werden, und konkurrieren höchstens zu ANALYZE_BATCH_CONCURRENCY
+        # untereinander um Plätze
+        results = await run_micro_batch(micro_batches[0])
+        outcomes = await asyncio.gather(
+            *(run_accepted_micro_batch(micro_batch) for micro_batch in micro_batches[1:]),
+            return_exceptions=True
+        )
+        for outcome in outcomes:
+            if isinstance(outcome, BaseException):
+                raise outcome
+            results += outcome
+    finally:
+        # Gemessene Rechenzeit aller gelaufenen Micro-Batches vom Zeitbudget
+        # des Clients abziehen, auch wenn ein Micro-Batch fehlschlug
+        if client_id is not None:
+            await charge_compute_time_async(client_id, user_tier, sum(durations))
+
+    return AnalysisBatchResponse(results=results)
+
+# --- Jobs ---
+# Für lange Texte: Auftrag abgeben, Status abfragen, Ergebnis abholen, ohne
+# die Verbindung während der Berechnung offen zu halten
+
+class JobResponse(BaseModel):
+    job_id: str
+    status: str
+    submitted_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    queue_seconds: Optional[float] = None
+    run_seconds: Optional[float] = None
+    result: Optional[AnalysisResponse] = None
+    error: Optional[str] = None
+
+def job_response(job: Job) -> JobResponse:
+    return JobResponse(
+        job_id=job.id,
+        status=job.status,
+        submitted_at=job.submitted_at,
+        started_at=job.started_at,
+        finished_at=job.finished_at,
+        result=job.result,
+        error=job.error,
+        **job_timings(job)
+    )
+
+# Jobs warten auf einen Platz, statt wie /analyze nach
+# QUEUE_TIMEOUT_SECONDS mit "Service overloaded" zu scheitern: ohne Frist
+# oder höchstens ANALYZE_JOB_SLOT_TIMEOUT Sekunden, auch bei voller
+# Warteschlange (ihre Zahl begrenzen die Job-Worker)
+ANALYZE_JOB_SLOT_TIMEOUT = float(os.environ.get("ANALYZE_JOB_SLOT_TIMEOUT", "inf"))
+
+async def run_analysis_job(payload: Tuple[str, str, str, Optional[str]]) -> dict:
+    text, language, user_tier, client_id = payload
+    sentiment, duration, compute_time = await analyze_cached(
+        text, language, user_tier, timeout=ANALYZE_JOB_SLOT_TIMEOUT, sheddable=False
+    )
+    if client_id is not None:
+        await charge_compute_time_async(client_id, user_tier, compute_time)
+    return AnalysisResponse(
+        text_length=len(text),
+        sentiment_score=round(sentiment, 2),
+        processing_time_ms=round(duration * 1000, 2),
+        status=f"Processed for {user_tier} tier"
+    ).model_dump()
+
+# Feste Zahl an Workern (ANALYZE_JOB_WORKERS), Jobs im Speicher oder in
+# SQLite (ANALYZE_JOB_DB_PATH), fertige Jobs verfallen nach ANALYZE_JOB_TTL
+analysis_jobs = JobRunner(create_job_table(), run_analysis_job)
+
+metrics.registry.gauge("analyze_jobs_queued", "Analysis jobs waiting for a worker.", lambda: analysis_jobs.queued)
+metrics.registry.gauge("analyze_jobs_running", "Analysis jobs being processed.", lambda: analysis_jobs.running)
+
+@app.post("/analyze/jobs", response_model=JobResponse, status_code=202)
+async def submit_analysis_job(
+    request: AnalysisRequest,
+    http_request: Request,
+    response: Response,
+    user_tier: str = Depends(rate_limited(analysis_cost))
+):
+    """
+    Nimmt eine Analyse an und antwortet sofort mit der Job-ID; das
+    Kontingent wird wie bei /analyze bei der Abgabe belastet.
+    """
+    client_id = limited_client_id(http_request)
+    job = analysis_jobs.submit((request.text, request.language, user_tier, client_id))
+    response.headers["Location"] = f"/analyze/jobs/{job.id}"
+    return job_response(job)
+
+def _find_job(job_id: str) -> Job:
+    job = analysis_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    return job
+
+@app.get("/analyze/jobs/{job_id}", response_model=JobResponse)
+async def analysis_job_status(job_id: str):
+    return job_response(_find_job(job_id))
+
+@app.get("/analyze/jobs/{job_id}/result", response_model=AnalysisResponse)
+async def analysis_job_result(job_id: str):
+    job = _find_job(job_id)
+    if job.status != DONE:
+        raise HTTPException(status_code=409, detail=job.error or f"Job is {job.status}")
+    return job.result
+
 # Zum Starten: uvicorn main:app --reload
\ No newline at end of file
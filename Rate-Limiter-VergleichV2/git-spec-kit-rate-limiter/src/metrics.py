@@ -0,0 +1,172 @@
+from bisect import bisect_left
+from typing import Callable, Dict, List, Sequence, Tuple
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Counter:
+    """Monotonic counter. One child per label combination, see `labels`."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._children: Dict[Tuple[str, ...], "Counter"] = {}
+        self.value = 0.0
+
+    def labels(self, *values: str) -> "Counter":
+        """Return the child for these label values; keep it to skip the lookup on hot paths."""
+        child = self._children.get(values)
+        if child is None:
+            child = self._children[values] = Counter(self.name, self.help_text)
+        return child
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def samples(self) -> List[str]:
+        if not self.label_names:
+            return [f"{self.name} {_format_value(self.value)}"]
+        return [
+            f"{self.name}{_format_labels(self.label_names, values)} {_format_value(child.value)}"
+            for values, child in self._children.items()
+        ]
+
+
+class Histogram:
+    """
+    Histogram with fixed bucket bounds. Observing is a binary search over
+    the bounds plus three additions, no allocation.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, buckets: Sequence[float], label_names: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.bounds = tuple(sorted(buckets))
+        self.label_names = tuple(label_names)
+        self._children: Dict[Tuple[str, ...], "Histogram"] = {}
+        # Last bucket counts observations above all bounds (+Inf)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def labels(self, *values: str) -> "Histogram":
+        """Return the child for these label values; keep it to skip the lookup on hot paths."""
+        child = self._children.get(values)
+        if child is None:
+            child = self._children[values] = Histogram(self.name, self.help_text, self.bounds)
+        return child
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self) -> List[str]:
+        if not self.label_names:
+            return self._samples((), ())
+        lines = []
+        for values, child in self._children.items():
+            lines.extend(child._samples(self.label_names, values))
+        return lines
+
+    def _samples(self, label_names: Sequence[str], values: Sequence[str]) -> List[str]:
+        lines, cumulative = [], 0
+        for bound, count in zip(self.bounds + (float("inf"),), self.counts):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            bucket_labels = _format_labels(label_names, values, f'le="{le}"')
+            lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+        labels = _format_labels(label_names, values)
+        lines.append(f"{self.name}_sum{labels} {self.sum!r}")
+        lines.append(f"{self.name}_count{labels} {self.count}")
+        return lines
+
+
+class Gauge:
+    """Gauge read from a callback at scrape time, costs nothing per request."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str, read: Callable[[], float]):
+        self.name = name
+        self.help_text = help_text
+        self.read = read
+
+    def samples(self) -> List[str]:
+        return [f"{self.name} {_format_value(self.read())}"]
+
+
+class MetricsRegistry:
+    """
+    Collects metrics and renders them in the Prometheus text format.
+
+    Metrics are plain attributes updated without locks: requests are
+    handled on the event loop thread, so updates never race. Label children
+    are created once and can be kept by the caller.
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+
+    def _register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name!r} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help_text: str, label_names: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, help_text, label_names))
+
+    def histogram(
+        self, name: str, help_text: str, buckets: Sequence[float], label_names: Sequence[str] = ()
+    ) -> Histogram:
+        return self._register(Histogram(name, help_text, buckets, label_names))
+
+    def gauge(self, name: str, help_text: str, read: Callable[[], float]) -> Gauge:
+        return self._register(Gauge(name, help_text, read))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help_text}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+# Registry of the service, exposed on /metrics
+registry = MetricsRegistry()
+
+rate_limit_decisions = registry.counter(
+    "rate_limit_decisions_total", "Rate limit decisions by tier and outcome.", ["tier", "decision"]
+)
+rate_limit_decision_seconds = registry.histogram(
+    "rate_limit_decision_seconds", "Time spent deciding on the rate limit of a request.",
+    [1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 1e-3, 1e-2],
+)
+analyze_processing_seconds = registry.histogram(
+    "analyze_processing_seconds", "Processing time of /analyze requests.",
+    [0.05, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.8, 1.0, 2.0, 5.0],
+)
+analyze_batch_size = registry.histogram(
+    "analyze_batch_size", "Texts analyzed per computation (coalesced /analyze requests, /analyze/batch micro-batches).",
+    [1, 2, 4, 8, 16, 32, 64, 128],
+)
+admission_wait_seconds = registry.histogram(
+    "admission_queue_wait_seconds", "Time /analyze requests waited for a computation slot, by tier.",
+    [0.001, 0.01, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0], ["tier"],
+)
@@ -0,0 +1,76 @@
+import json
+from typing import Iterable, Optional
+from src import route_limits
+from src.dependencies import identify_client
+from src.rate_limiter import RateLimitExceeded, check_rate_limit_async
+
+_REJECT_BODY = json.dumps({"detail": "Rate limit exceeded"}).encode()
+
+
+class RateLimitMiddleware:
+    """
+    Pure ASGI middleware checking the rate limit before the app sees a request.
+
+    The client is identified from the request headers and the connection in
+    the ASGI scope only. Rejected requests are answered with 429 and a
+    Retry-After header without reading the body and without entering the
+    app, so routing, body parsing and validation cost nothing for them.
+
+    Admitted requests are charged one work unit and carry the client in
+    `request.state.rate_limit_identity`; the rate limit dependency then only
+    charges the remaining units once the body is known.
+
+    The quota is looked up in the route table by method and raw path, since
+    routing has not happened yet; routes with path parameters are left to
+    the dependency.
+    """
+
+    def __init__(self, app, paths: Optional[Iterable[str]] = None):
+        """
+        Args:
+            app: The ASGI application to wrap.
+            paths (Iterable[str], optional): Limited paths. All HTTP paths if None.
+        """
+        self.app = app
+        self.paths = frozenset(paths) if paths is not None else None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or (self.paths is not None and scope["path"] not in self.paths):
+            await self.app(scope, receive, send)
+            return
+        route = route_limits.lookup(scope["method"], scope["path"])
+        if route is None:
+            await self.app(scope, receive, send)
+            return
+
+        x_api_key = None
+        for name, value in scope["headers"]:
+            if name == b"x-api-key":
+                x_api_key = value.decode("latin-1")
+                break
+        client = scope.get("client")
+        host = client[0] if client else None
+        client_id, user_tier, limit = identify_client(x_api_key, host)
+        client_id, limit = route.client_key(client_id), route.limit_for(user_tier, limit)
+
+        try:
+            await check_rate_limit_async(client_id, user_tier, limit, host)
+        except RateLimitExceeded as exc:
+            await self._reject(send, exc.retry_after)
+            return
+
+        scope.setdefault("state", {})["rate_limit_identity"] = (client_id, user_tier, limit, host)
+        await self.app(scope, receive, send)
+
+    @staticmethod
+    async def _reject(send, retry_after: int) -> None:
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(_REJECT_BODY)).encode()),
+                (b"retry-after", str(retry_after).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": _REJECT_BODY})
@@ -1,59 +1,408 @@
+import asyncio
+import math
+import os
 import time
-from dataclasses import dataclass
-from typing import Dict
-
-@dataclass
-class RateLimitEntry:
-    request_count: int
-    window_start_time: float
+from functools import lru_cache
+from typing import Dict, List, Optional
+from src.algorithms import RateLimitAlgorithm, RateLimitEntry, get_algorithm, retry_after_seconds
+from src import heavy_hitters, metrics
+from src.backend import QuotaCheck, RateLimitBackend
+from src.sketch_backend import DEFAULT_WIDTH, SketchBackend
+from src.store import RateLimitStore
 
 class RateLimitExceeded(Exception):
     def __init__(self, retry_after: int):
         self.retry_after = retry_after
 
-# Global in-memory store
-# Key: Client Identifier (IP or API Key)
-# Value: RateLimitEntry
-rate_limit_store: Dict[str, RateLimitEntry] = {}
-
 WINDOW_SIZE_SECONDS = 60
 LIMIT_FREE = 5
 LIMIT_PRO = 100
 
-def check_rate_limit(client_id: str, user_tier: str):
+# Quota levels checked together with the client's own quota; None disables a level.
+# All requests from one IP address, whatever their tier or API key
+LIMIT_IP: Optional[int] = 300
+# All requests to the service (per backend, i.e. per worker for the in-memory store)
+LIMIT_GLOBAL: Optional[int] = 1000
+GLOBAL_KEY = "global"
+
+# Budgets are work units: a request costs one unit per started
+# COST_CHARS_PER_UNIT characters of text, scaled by the factor of its language
+# (1.0 if not listed). A plain request without text costs one unit.
+COST_CHARS_PER_UNIT = 1000
+LANGUAGE_COST_FACTORS: Dict[str, float] = {}
+
+# Compute-time budgets: milliseconds of processing per window and tier. Admission
+# takes one millisecond, the rest is charged after the request from its measured
+# duration, so clients with slow requests run out first. Tiers without a budget
+# are not limited by compute time. Set with RATE_LIMIT_COMPUTE_BUDGET, e.g.
+# "free=2,pro=60" (seconds per window).
+COMPUTE_KEY_PREFIX = "cpu:"
+
+def compute_budgets(spec: str) -> Dict[str, int]:
+    """
+    Parse budgets given as comma-separated `tier=seconds` pairs.
+
+    Raises:
+        ValueError: If a pair is malformed.
+    """
+    budgets = {}
+    for pair in filter(None, (part.strip() for part in spec.split(","))):
+        tier, separator, seconds = pair.partition("=")
+        if not separator:
+            raise ValueError(f"Invalid compute budget: {pair!r}")
+        budgets[tier.strip()] = round(float(seconds) * 1000)
+    return budgets
+
+COMPUTE_BUDGET_MS: Dict[str, int] = compute_budgets(os.environ.get("RATE_LIMIT_COMPUTE_BUDGET", ""))
+
+# Shaping: a request that would be admitted within MAX_DELAY_SECONDS waits for
+# it on an asyncio timer instead of getting 429 (0 disables). At most
+# MAX_PARKED requests wait at the same time, further ones are rejected as usual.
+MAX_DELAY_SECONDS = float(os.environ.get("RATE_LIMIT_MAX_DELAY", "0"))
+MAX_PARKED = int(os.environ.get("RATE_LIMIT_MAX_PARKED", "1000"))
+parked_requests = 0
+
+# Upper bound on tracked clients, least recently used clients are evicted first
+MAX_STORE_ENTRIES = 100_000
+
+# Once the store holds this many clients, new clients are limited approximately
+# in a Count-Min Sketch of fixed memory (see src/sketch_backend.py) instead of
+# evicting tracked ones. 0 disables the sketch.
+SKETCH_THRESHOLD = int(os.environ.get("RATE_LIMIT_SKETCH_THRESHOLD", str(MAX_STORE_ENTRIES)))
+SKETCH_WIDTH = int(os.environ.get("RATE_LIMIT_SKETCH_WIDTH", str(DEFAULT_WIDTH)))
+
+# Global in-memory store
+# Key: Client Identifier (IP or API Key)
+# Value: Per-client state of the tier's algorithm (e.g. RateLimitEntry)
+# Entries expire once their window is over, see src/store.py.
+rate_limit_store = RateLimitStore(max_entries=MAX_STORE_ENTRIES)
+
+metrics.registry.gauge("rate_limit_store_entries", "Clients tracked in the in-memory store.", lambda: len(rate_limit_store))
+metrics.registry.gauge("rate_limit_store_evicted", "Entries evicted because the store was full.", lambda: rate_limit_store.evicted)
+metrics.registry.gauge("rate_limit_store_expired", "Entries dropped after their window ended.", lambda: rate_limit_store.expired)
+metrics.registry.gauge("rate_limit_parked", "Requests waiting to be admitted instead of rejected.", lambda: parked_requests)
+rate_limit_delayed = metrics.registry.counter("rate_limit_delayed_total", "Requests admitted after waiting.")
+
+# Algorithm used per user tier, see src/algorithms.py for the available names.
+DEFAULT_ALGORITHM = "fixed_window"
+TIER_ALGORITHMS: Dict[str, str] = {
+    "free": DEFAULT_ALGORITHM,
+    "pro": DEFAULT_ALGORITHM,
+}
+
+class InMemoryBackend(RateLimitBackend):
+    """
+    Keeps client state in a RateLimitStore of the current process.
+    Every worker process enforces its own quota.
+
+    With a `sketch`, clients not yet in the store are limited approximately
+    in the sketch's fixed memory while the store holds `sketch_threshold`
+    entries or more, so a flood of new clients neither grows the store nor
+    evicts the clients already tracked. Tracked clients stay exact.
+    """
+
+    def __init__(self, store: RateLimitStore, sketch: Optional[SketchBackend] = None, sketch_threshold: int = 0):
+        self.store = store
+        self.sketch = sketch
+        self.sketch_threshold = sketch_threshold
+
+    def approximate(self) -> bool:
+        """Whether new clients go to the sketch instead of the store."""
+        return self.sketch is not None and len(self.store) >= self.sketch_threshold
+
+    def take(
+        self, client_id: str, algorithm: RateLimitAlgorithm, now: float, limit: int, window: float,
+        min_units: int = 1, max_units: int = 1, refund: int = 0,
+    ):
+        self.store.sweep(now)
+        entry = self.store.get(client_id)
+        if entry is None and self.approximate():
+            return self.sketch.take(client_id, algorithm, now, limit, window, min_units, max_units, refund)
+        if not isinstance(entry, algorithm.state_type):
+            # Unknown client, or the tier's algorithm changed since the last request
+            entry = algorithm.new_state(now, limit)
+            self.store[client_id] = entry
+
+        granted, wait = algorithm.take(entry, now, limit, window, min_units, max_units, refund)
+        if granted or refund:
+            self.store.schedule(client_id, algorithm.expires_at(entry, limit, window))
+        return granted, wait
+
+    def acquire_all(self, checks: List[QuotaCheck], now: float) -> float:
+        """
+        Check every level before consuming on any, in one pass over the store.
+        Pinned (service-wide) states live in a plain dict next to the LRU
+        entries, so they cost no LRU update and are never evicted.
+        """
+        self.store.sweep(now)
+        pending, wait = [], 0.0
+        for check in checks:
+            states = self.store.pinned if check.pinned else self.store
+            entry = states.get(check.client_id)
+            if entry is None and not check.pinned and self.approximate():
+                pending.append((check, None, False))
+                level_wait = self.sketch.retry_after(check.client_id, now, check.limit, check.window, check.units)
+                if level_wait > wait:
+                    wait = level_wait
+                continue
+            is_new = not isinstance(entry, check.algorithm.state_type)
+            if is_new:
+                entry = check.algorithm.new_state(now, check.limit)
+            pending.append((check, entry, is_new))
+            level_wait = check.algorithm.retry_after(entry, now, check.limit, check.window, check.units)
+            if level_wait > wait:
+                wait = level_wait
+        if wait > 0:
+            return wait
+
+        for check, entry, is_new in pending:
+            if entry is None:
+                self.sketch.consume(check.client_id, now, check.limit, check.window, check.units)
+                continue
+            check.algorithm.consume(entry, now, check.limit, check.window, check.units)
+            if check.pinned:
+                self.store.pinned[check.client_id] = entry
+                continue
+            if is_new:
+                self.store[check.client_id] = entry
+            self.store.schedule(check.client_id, check.algorithm.expires_at(entry, check.limit, check.window))
+        return 0.0
+
+    async def acquire_all_async(self, checks: List[QuotaCheck], now: float) -> float:
+        return self.acquire_all(checks, now)
+
+    def release_all(self, checks: List[QuotaCheck], now: float) -> None:
+        for check in checks:
+            if not check.pinned:
+                self.take(check.client_id, check.algorithm, now, check.limit, check.window, 0, 0, check.units)
+                continue
+            entry = self.store.pinned.get(check.client_id)
+            if isinstance(entry, check.algorithm.state_type):
+                check.algorithm.refund(entry, now, check.limit, check.window, check.units)
+
+    async def release_all_async(self, checks: List[QuotaCheck], now: float) -> None:
+        self.release_all(checks, now)
+
+def create_backend(name: str):
     """
-    Check if the client has exceeded the rate limit using the Fixed Window algorithm.
-    
+    Create a rate limit backend by name.
+
+    Args:
+        name (str): 'memory' (per process), 'sketch' (per process,
+            approximate in fixed memory), 'shared_memory' (shared by all
+            workers on this host, table path from RATE_LIMIT_SHM_PATH) or
+            'redis' (shared by all nodes, URL from RATE_LIMIT_REDIS_URL).
+
+    Raises:
+        ValueError: If the backend name is unknown.
+    """
+    if name == "memory":
+        if not SKETCH_THRESHOLD:
+            return InMemoryBackend(rate_limit_store)
+        return InMemoryBackend(rate_limit_store, SketchBackend(SKETCH_WIDTH), SKETCH_THRESHOLD)
+    if name == "sketch":
+        return SketchBackend(SKETCH_WIDTH)
+    if name == "shared_memory":
+        from src.shared_memory_backend import DEFAULT_PATH, SharedMemoryBackend
+        return SharedMemoryBackend(os.environ.get("RATE_LIMIT_SHM_PATH", DEFAULT_PATH))
+    if name == "redis":
+        from src.redis_backend import RedisBackend
+        return RedisBackend.from_url(os.environ.get("RATE_LIMIT_REDIS_URL", "redis://localhost:6379/0"))
+    raise ValueError(f"Unknown rate limit backend: {name!r}")
+
+def backend_from_env():
+    """
+    Create the backend configured by the environment, so every uvicorn worker
+    picks up the same configuration.
+
+    RATE_LIMIT_BACKEND selects the backend (see create_backend). If
+    RATE_LIMIT_LEASE_FRACTION is set, requests are decided locally from quota
+    leases of that fraction of the tier limit (see src/leases.py).
+    """
+    backend = create_backend(os.environ.get("RATE_LIMIT_BACKEND", "memory"))
+    lease_fraction = os.environ.get("RATE_LIMIT_LEASE_FRACTION")
+    if lease_fraction:
+        from src.leases import LeasingBackend
+        backend = LeasingBackend(backend, lease_fraction=float(lease_fraction))
+    return backend
+
+# Backend deciding on requests
+rate_limit_backend = backend_from_env()
+
+def set_rate_limit_backend(backend) -> None:
+    """Replace the backend used by check_rate_limit."""
+    global rate_limit_backend
+    rate_limit_backend = backend
+
+def _tier_policy(user_tier: str, limit: Optional[int] = None):
+    if limit is None:
+        limit = LIMIT_PRO if user_tier == "pro" else LIMIT_FREE
+    return limit, get_algorithm(TIER_ALGORITHMS.get(user_tier, DEFAULT_ALGORITHM))
+
+def tier_limit(user_tier: str, limit: Optional[int] = None) -> int:
+    """Work units a client may use per window; `limit` overrides the tier limit."""
+    return _tier_policy(user_tier, limit)[0]
+
+def request_cost(text: str, language: str = "de") -> int:
+    """Work units charged for analyzing `text`, see COST_CHARS_PER_UNIT."""
+    factor = LANGUAGE_COST_FACTORS.get(language, 1.0)
+    return max(1, math.ceil(len(text) * factor / COST_CHARS_PER_UNIT))
+
+def _quota_checks(
+    client_id: str, user_tier: str, limit: Optional[int], ip: Optional[str], units: int = 1,
+    compute: bool = True,
+) -> List[QuotaCheck]:
+    """
+    Quota levels of a request: the client's own, its compute-time budget, its
+    IP address and the whole service. A request never costs more than a
+    level's whole budget, so it stays admissible.
+    """
+    limit, algorithm = _tier_policy(user_tier, limit)
+    checks = [QuotaCheck(client_id, algorithm, limit, WINDOW_SIZE_SECONDS, min(units, limit))]
+    budget = COMPUTE_BUDGET_MS.get(user_tier) if compute else None
+    if budget is not None:
+        checks.append(QuotaCheck(
+            COMPUTE_KEY_PREFIX + client_id, get_algorithm(DEFAULT_ALGORITHM), budget, WINDOW_SIZE_SECONDS
+        ))
+    if ip is not None and LIMIT_IP is not None:
+        checks.append(QuotaCheck(
+            f"ip:{ip}", get_algorithm(DEFAULT_ALGORITHM), LIMIT_IP, WINDOW_SIZE_SECONDS, min(units, LIMIT_IP)
+        ))
+    if LIMIT_GLOBAL is not None:
+        checks.append(_global_check(LIMIT_GLOBAL, WINDOW_SIZE_SECONDS, min(units, LIMIT_GLOBAL)))
+    return checks
+
+@lru_cache(maxsize=64)
+def _global_check(limit: int, window: float, units: int) -> QuotaCheck:
+    return QuotaCheck(GLOBAL_KEY, get_algorithm(DEFAULT_ALGORITHM), limit, window, units, pinned=True)
+
+def _record_decision(
+    user_tier: str, wait: float, started: float, client_id: str, ip: Optional[str], now: float
+) -> None:
+    metrics.rate_limit_decision_seconds.observe(time.perf_counter() - started)
+    metrics.rate_limit_decisions.labels(user_tier, "denied" if wait > 0 else "allowed").inc()
+    heavy_hitters.heavy_clients.record(client_id, wait > 0, now)
+    if ip is not None:
+        heavy_hitters.heavy_ips.record(ip, wait > 0, now)
+
+def check_rate_limit(
+    client_id: str, user_tier: str, limit: Optional[int] = None, ip: Optional[str] = None, units: int = 1,
+    compute: bool = True,
+):
+    """
+    Check if the client has exceeded the rate limit using the algorithm configured for its tier.
+
     Args:
         client_id (str): Unique identifier for the client (IP or API Key).
         user_tier (str): The tier of the user ('free' or 'pro').
-        
+        limit (int, optional): Quota of this client, overrides the tier limit.
+        ip (str, optional): IP address of the request, limited by LIMIT_IP.
+        units (int): Work units the request costs, see request_cost.
+        compute (bool): Whether to check the compute-time budget
+            (COMPUTE_BUDGET_MS); False when charging more units of a request
+            that was already admitted.
+
+    The client's quota, its compute-time budget, the IP quota and the global
+    quota (LIMIT_GLOBAL) are checked together: a request rejected on one
+    level consumes no quota on the others.
+
     Raises:
-        RateLimitExceeded: If the request count exceeds the limit for the current window.
-    """
-    current_time = time.time()
-    limit = LIMIT_PRO if user_tier == "pro" else LIMIT_FREE
-    
-    if client_id not in rate_limit_store:
-        rate_limit_store[client_id] = RateLimitEntry(
-            request_count=1,
-            window_start_time=current_time
-        )
-        return
-
-    entry = rate_limit_store[client_id]
-    
-    # Check if window has expired
-    if current_time - entry.window_start_time > WINDOW_SIZE_SECONDS:
-        # Reset window
-        entry.request_count = 1
-        entry.window_start_time = current_time
-        return
-
-    # Check limit
-    if entry.request_count >= limit:
-        retry_after = int(WINDOW_SIZE_SECONDS - (current_time - entry.window_start_time))
-        raise RateLimitExceeded(retry_after=retry_after)
-
-    # Increment count
-    entry.request_count += 1
\ No newline at end of file
+        RateLimitExceeded: If the request would exceed any of the quotas.
+    """
+    started = time.perf_counter()
+    checks = _quota_checks(client_id, user_tier, limit, ip, units, compute)
+    now = time.time()
+    wait = rate_limit_backend.acquire_all(checks, now)
+    _record_decision(user_tier, wait, started, client_id, ip, now)
+    if wait > 0:
+        raise RateLimitExceeded(retry_after=retry_after_seconds(wait))
+
+async def check_rate_limit_async(
+    client_id: str, user_tier: str, limit: Optional[int] = None, ip: Optional[str] = None, units: int = 1,
+    compute: bool = True,
+):
+    """
+    Same as check_rate_limit, but also works with asynchronous backends (Redis).
+
+    If shaping is enabled (MAX_DELAY_SECONDS), a request that would be
+    admitted within that delay waits for it instead of being rejected; the
+    decision time then includes the wait.
+
+    Raises:
+        RateLimitExceeded: If the request would exceed any of the quotas.
+    """
+    started = time.perf_counter()
+    checks = _quota_checks(client_id, user_tier, limit, ip, units, compute)
+    now = time.time()
+    wait = await rate_limit_backend.acquire_all_async(checks, now)
+    if 0 < wait <= MAX_DELAY_SECONDS and parked_requests < MAX_PARKED:
+        wait = await _park(checks, wait)
+    _record_decision(user_tier, wait, started, client_id, ip, now)
+    if wait > 0:
+        raise RateLimitExceeded(retry_after=retry_after_seconds(wait))
+
+async def release_rate_limit_async(
+    client_id: str, user_tier: str, limit: Optional[int] = None, ip: Optional[str] = None, units: int = 1,
+) -> None:
+    """
+    Give back `units` units of a request admitted by check_rate_limit_async
+    on all of its quota levels, e.g. when it is refused after all.
+    """
+    checks = _quota_checks(client_id, user_tier, limit, ip, units)
+    await rate_limit_backend.release_all_async(checks, time.time())
+
+async def _park(checks: List[QuotaCheck], wait: float) -> float:
+    """
+    Wait until the request of `checks` is admitted, for MAX_DELAY_SECONDS at
+    most. Another request may take the units first, so the request tries again
+    after each wait.
+
+    Returns:
+        float: 0 if the request was admitted, otherwise the last wait time.
+    """
+    global parked_requests
+    parked_requests += 1
+    delay_left = MAX_DELAY_SECONDS
+    try:
+        while 0 < wait <= delay_left:
+            await asyncio.sleep(wait)
+            delay_left -= wait
+            wait = await rate_limit_backend.acquire_all_async(checks, time.time())
+    finally:
+        parked_requests -= 1
+    if wait == 0:
+        rate_limit_delayed.inc()
+    return wait
+
+def _compute_charge(client_id: str, user_tier: str, seconds: float):
+    budget = COMPUTE_BUDGET_MS.get(user_tier)
+    # One millisecond was taken on admission
+    milliseconds = round(seconds * 1000) - 1
+    if budget is None or milliseconds <= 0:
+        return None
+    # Take what is left, up to the measured time: a request is never refused
+    # after the fact, it only exhausts the budget for the following ones
+    return (
+        COMPUTE_KEY_PREFIX + client_id, get_algorithm(DEFAULT_ALGORITHM), time.time(),
+        budget, WINDOW_SIZE_SECONDS, 0, milliseconds,
+    )
+
+def charge_compute_time(client_id: str, user_tier: str, seconds: float) -> None:
+    """
+    Charge the measured processing time of an admitted request to the
+    client's compute-time budget (COMPUTE_BUDGET_MS).
+
+    Args:
+        client_id (str): Client the request was admitted for.
+        user_tier (str): The tier of the user.
+        seconds (float): Measured processing time of the request.
+    """
+    charge = _compute_charge(client_id, user_tier, seconds)
+    if charge is not None:
+        rate_limit_backend.take(*charge)
+
+async def charge_compute_time_async(client_id: str, user_tier: str, seconds: float) -> None:
+    """Same as charge_compute_time, but also works with asynchronous backends (Redis)."""
+    charge = _compute_charge(client_id, user_tier, seconds)
+    if charge is not None:
+        await rate_limit_backend.take_async(*charge)
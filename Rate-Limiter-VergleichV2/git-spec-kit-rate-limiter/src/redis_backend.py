@@ -0,0 +1,264 @@
+from typing import Dict, Iterable, List, Sequence, Tuple
+from src.algorithms import RateLimitAlgorithm
+from src.backend import QuotaCheck, RateLimitBackend
+
+# Each function implements RateLimitAlgorithm.take of one algorithm in
+# src/algorithms.py on a Redis hash: refund, check and consume happen
+# atomically on the server. With `dry` set, it only decides and writes
+# nothing.
+#
+# Arguments: state key, now, limit, window (seconds), min_units, max_units,
+# refund, dry. Returns granted units and wait.
+_PRELUDE = """
+local function fmt(value) return string.format('%.17g', value) end
+local function grant(available, min_units, max_units)
+  return math.min(max_units, math.max(min_units, math.floor(available + 1e-9)))
+end
+local takes = {}
+"""
+
+_TAKES: Dict[str, str] = {
+    "fixed_window": """
+takes.fixed_window = function(key, now, limit, window, min_units, max_units, refund, dry)
+  local state = redis.call('HMGET', key, 'count', 'start')
+  local count, start = tonumber(state[1]), tonumber(state[2])
+  local expired = not count or count == 0 or now - start >= window
+  if expired then
+    count = 0
+  elseif refund > 0 then
+    count = math.max(count - refund, 0)
+  end
+  local granted, wait = 0, 0
+  if min_units > 0 and count + min_units > limit then
+    if expired then wait = window else wait = window - (now - start) end
+  else
+    granted = grant(limit - count, min_units, max_units)
+    if granted > 0 and count == 0 then start = now end
+    count = count + granted
+  end
+  if not dry and (granted > 0 or (refund > 0 and not expired)) then
+    redis.call('HSET', key, 'count', count, 'start', fmt(start))
+    redis.call('PEXPIREAT', key, math.ceil((start + window) * 1000))
+  end
+  return granted, wait
+end
+""",
+    "sliding_window": """
+takes.sliding_window = function(key, now, limit, window, min_units, max_units, refund, dry)
+  local state = redis.call('HMGET', key, 'current', 'previous', 'start')
+  local current = tonumber(state[1]) or 0
+  local previous = tonumber(state[2]) or 0
+  local start = tonumber(state[3]) or now
+  local aligned = now - (now % window)
+  if aligned ~= start then
+    if aligned - start == window then previous = current else previous = 0 end
+    current, start = 0, aligned
+  end
+  if refund > 0 then current = math.max(current - refund, 0) end
+  local elapsed = now - start
+  local estimate = previous * (1 - elapsed / window) + current
+  local granted, wait = 0, 0
+  if min_units > 0 and estimate + min_units > limit then
+    if current + min_units > limit then
+      if current == 0 then
+        wait = 2 * window - elapsed
+      else
+        wait = (window - elapsed) + window * (1 - (limit - min_units) / current)
+      end
+    else
+      wait = math.max(window * (1 - (limit - min_units - current) / previous) - elapsed, 0)
+    end
+  end
+  if wait <= 0 then
+    granted = grant(limit - estimate, min_units, max_units)
+    current = current + granted
+  end
+  if not dry and (granted > 0 or refund > 0) then
+    redis.call('HSET', key, 'current', current, 'previous', previous, 'start', fmt(start))
+    redis.call('PEXPIREAT', key, math.ceil((start + 2 * window) * 1000))
+  end
+  return granted, wait
+end
+""",
+    "gcra": """
+takes.gcra = function(key, now, limit, window, min_units, max_units, refund, dry)
+  local tat = tonumber(redis.call('HGET', key, 'tat')) or now
+  local interval = window / limit
+  if refund > 0 then tat = math.max(tat - interval * refund, now) end
+  local base = math.max(tat, now)
+  local granted, wait = 0, 0
+  if min_units > 0 then
+    local allow_at = base + interval * min_units - window
+    if allow_at > now then wait = allow_at - now end
+  end
+  if wait <= 0 then
+    granted = grant((window - (base - now)) * limit / window, min_units, max_units)
+    if granted > 0 then tat = base + interval * granted end
+  end
+  if not dry and (granted > 0 or refund > 0) then
+    redis.call('HSET', key, 'tat', fmt(tat))
+    redis.call('PEXPIREAT', key, math.ceil(tat * 1000))
+  end
+  return granted, wait
+end
+""",
+    "token_bucket": """
+takes.token_bucket = function(key, now, limit, window, min_units, max_units, refund, dry)
+  local state = redis.call('HMGET', key, 'tokens', 'last')
+  local tokens = tonumber(state[1]) or limit
+  local last = tonumber(state[2]) or now
+  tokens = math.min(limit, tokens + math.max(now - last, 0) * limit / window)
+  if refund > 0 then tokens = math.min(limit, tokens + refund) end
+  local granted, wait = 0, 0
+  if min_units > 0 and tokens < min_units then
+    wait = (min_units - tokens) * window / limit
+  else
+    granted = grant(tokens, min_units, max_units)
+    tokens = tokens - granted
+  end
+  if not dry and (granted > 0 or refund > 0) then
+    redis.call('HSET', key, 'tokens', fmt(tokens), 'last', fmt(now))
+    redis.call('PEXPIREAT', key, math.ceil((now + (limit - tokens) * window / limit) * 1000))
+  end
+  return granted, wait
+end
+""",
+}
+
+# One take of a client.
+#
+# KEYS[1]: state key of the client
+# ARGV: now, limit, window (seconds), min_units, max_units, refund
+# Returns {granted, wait} as strings, since Redis truncates Lua numbers in
+# replies to integers.
+_TAKE = """
+local granted, wait = takes[ALGORITHM](
+  KEYS[1], tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3]),
+  tonumber(ARGV[4]), tonumber(ARGV[5]), tonumber(ARGV[6]), false
+)
+return {tostring(granted), fmt(wait)}
+"""
+
+# A request limited on several levels, all or nothing: every level is
+# checked before any is written, so a rejected request consumes nothing.
+#
+# KEYS: state key of each level
+# ARGV: now, then algorithm, limit, window and units of each level
+# Returns the wait as a string, 0 if the request is admitted.
+_ACQUIRE_ALL = """
+local now = tonumber(ARGV[1])
+local function level(i, dry)
+  local arg = 2 + (i - 1) * 4
+  local units = tonumber(ARGV[arg + 3])
+  local _, wait = takes[ARGV[arg]](
+    KEYS[i], now, tonumber(ARGV[arg + 1]), tonumber(ARGV[arg + 2]), units, units, 0, dry
+  )
+  return wait
+end
+local wait = 0
+for i = 1, #KEYS do wait = math.max(wait, level(i, true)) end
+if wait <= 0 then
+  for i = 1, #KEYS do level(i, false) end
+end
+return fmt(wait)
+"""
+
+_SCRIPTS: Dict[str, str] = {
+    name: _PRELUDE + source + _TAKE.replace("ALGORITHM", repr(name)) for name, source in _TAKES.items()
+}
+
+
+class RedisBackend(RateLimitBackend):
+    """
+    Rate limit backend on a Redis-compatible store, sharing quotas across nodes.
+
+    Every decision is a single EVALSHA round trip: the algorithm's script
+    reads the client state, decides and writes it back atomically on the
+    server, and sets the key to expire when the state is stale. Batches of
+    decisions (take_many_async) are pipelined into one round trip, and a
+    request limited on several levels (acquire_all_async) is one script that
+    checks all of their keys before writing any. On Redis Cluster, those
+    keys must hash to the same slot.
+    Connections come from the pool of the given asyncio client.
+
+    The decision time is passed in by the caller, so the clocks of all nodes
+    must be synchronized (e.g. NTP).
+    """
+
+    def __init__(self, client, key_prefix: str = "rate_limit"):
+        """
+        Args:
+            client: A `redis.asyncio.Redis` (or compatible, e.g. fakeredis) client.
+            key_prefix (str): Prefix for all keys written by the backend.
+        """
+        self.client = client
+        self.key_prefix = key_prefix
+        self._scripts = {name: client.register_script(source) for name, source in _SCRIPTS.items()}
+        self._acquire_all = client.register_script(_PRELUDE + "".join(_TAKES.values()) + _ACQUIRE_ALL)
+
+    @classmethod
+    def from_url(cls, url: str, max_connections: int = 50, **kwargs) -> "RedisBackend":
+        """Create a backend with its own connection pool."""
+        import redis.asyncio as redis
+
+        return cls(redis.Redis.from_url(url, max_connections=max_connections), **kwargs)
+
+    def _key(self, algorithm: RateLimitAlgorithm, client_id: str) -> str:
+        return f"{self.key_prefix}:{algorithm.name}:{client_id}"
+
+    def _script_call(self, client_id, algorithm, now, limit, window, min_units=1, max_units=1, refund=0):
+        script = self._scripts.get(algorithm.name)
+        if script is None:
+            raise ValueError(f"No Redis script for rate limit algorithm: {algorithm.name!r}")
+        keys = [self._key(algorithm, client_id)]
+        args = [repr(now), limit, window, min_units, max_units, refund]
+        return script, keys, args
+
+    @staticmethod
+    def _parse(reply) -> Tuple[int, float]:
+        granted, wait = reply
+        return int(float(granted)), float(wait)
+
+    def take(self, *args, **kwargs):
+        raise RuntimeError("RedisBackend is asynchronous, use check_rate_limit_async")
+
+    async def take_async(
+        self, client_id: str, algorithm: RateLimitAlgorithm, now: float, limit: int, window: float,
+        min_units: int = 1, max_units: int = 1, refund: int = 0,
+    ) -> Tuple[int, float]:
+        """
+        Raises:
+            ValueError: If there is no script for the algorithm.
+        """
+        script, keys, args = self._script_call(
+            client_id, algorithm, now, limit, window, min_units, max_units, refund
+        )
+        return self._parse(await script(keys=keys, args=args))
+
+    async def take_many_async(self, calls: Iterable[tuple]) -> List[Tuple[int, float]]:
+        calls = [self._script_call(*call) for call in calls]
+        if not calls:
+            return []
+        async with self.client.pipeline(transaction=False) as pipe:
+            for script, keys, args in calls:
+                await script(keys=keys, args=args, client=pipe)
+            replies = await pipe.execute()
+        return [self._parse(reply) for reply in replies]
+
+    async def acquire_all_async(self, checks: Sequence[QuotaCheck], now: float) -> float:
+        """
+        Raises:
+            ValueError: If there is no script for the algorithm of a level.
+        """
+        keys, args = [], [repr(now)]
+        for check in checks:
+            if check.algorithm.name not in _TAKES:
+                raise ValueError(f"No Redis script for rate limit algorithm: {check.algorithm.name!r}")
+            keys.append(self._key(check.algorithm, check.client_id))
+            args += [check.algorithm.name, check.limit, check.window, check.units]
+        if not keys:
+            return 0.0
+        return float(await self._acquire_all(keys=keys, args=args))
+
+    async def close(self) -> None:
+        await self.client.aclose()
@@ -0,0 +1,137 @@
+import hashlib
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+from src import metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ENTRIES = 10_000
+DEFAULT_TTL_SECONDS = 3600.0
+
+
+def cache_key(text: str, language: str) -> str:
+    """Key of the result for `text` in `language`: SHA-256 of both, so texts are not kept as keys."""
+    return hashlib.sha256(f"{language}\0{text}".encode()).hexdigest()
+
+
+class ResultCache:
+    """
+    Analysis results by cache_key, in this process.
+
+    At most `max_entries` results are kept; the least recently used one is
+    dropped for a new one. Results expire `ttl` seconds after they were
+    stored. Lookups are counted as hits and misses.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, ttl: float = DEFAULT_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        # Key -> (expiry in time.monotonic(), result), least recently used first
+        self._entries: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    async def get(self, key: str) -> Optional[float]:
+        """Stored result of `key`, None if there is none or it expired."""
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            del self._entries[key]
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, result: float) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl, result)
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class RedisResultCache(ResultCache):
+    """
+    Analysis results in Redis, shared by all workers and nodes.
+
+    Results expire after `ttl` seconds on the server. The size bound is left
+    to the server, e.g. `maxmemory` with `maxmemory-policy allkeys-lru` on a
+    Redis instance used as cache. If Redis fails, a lookup counts as a miss
+    and the result is computed, so the cache never fails a request.
+    """
+
+    def __init__(self, client, ttl: float = DEFAULT_TTL_SECONDS, key_prefix: str = "analysis"):
+        """
+        Args:
+            client: A `redis.asyncio.Redis` (or compatible, e.g. fakeredis) client.
+            ttl (float): Seconds a result is kept.
+            key_prefix (str): Prefix of the keys in Redis.
+        """
+        super().__init__(max_entries=0, ttl=ttl)
+        self.client = client
+        self.key_prefix = key_prefix
+
+    @classmethod
+    def from_url(cls, url: str, **kwargs) -> "RedisResultCache":
+        """Create a cache with a `redis.asyncio` client connected to `url`."""
+        import redis.asyncio as redis
+
+        return cls(redis.Redis.from_url(url), **kwargs)
+
+    async def get(self, key: str) -> Optional[float]:
+        try:
+            value = await self.client.get(f"{self.key_prefix}:{key}")
+        except Exception:
+            logger.exception("Result cache lookup failed")
+            value = None
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return float(value)
+
+    async def set(self, key: str, result: float) -> None:
+        try:
+            await self.client.set(f"{self.key_prefix}:{key}", repr(result), px=int(self.ttl * 1000))
+        except Exception:
+            logger.exception("Storing a result in the cache failed")
+
+    def clear(self) -> None:
+        """Only the counters; entries in Redis expire on their own."""
+        self.hits = self.misses = 0
+
+    def __len__(self) -> int:
+        return 0
+
+
+def create_result_cache() -> Optional[ResultCache]:
+    """
+    Cache configured by ANALYZE_CACHE_SIZE (entries, 0 disables the cache),
+    ANALYZE_CACHE_TTL (seconds) and ANALYZE_CACHE_REDIS_URL (shared cache in
+    Redis instead of one per process).
+    """
+    max_entries = int(os.environ.get("ANALYZE_CACHE_SIZE", str(DEFAULT_MAX_ENTRIES)))
+    ttl = float(os.environ.get("ANALYZE_CACHE_TTL", str(DEFAULT_TTL_SECONDS)))
+    if max_entries <= 0:
+        return None
+    redis_url = os.environ.get("ANALYZE_CACHE_REDIS_URL")
+    if redis_url:
+        return RedisResultCache.from_url(redis_url, ttl=ttl)
+    return ResultCache(max_entries, ttl)
+
+
+# Results of /analyze, None if caching is disabled
+analysis_cache = create_result_cache()
+
+metrics.registry.gauge("analyze_cache_hits", "/analyze requests answered from the result cache.", lambda: analysis_cache.hits if analysis_cache else 0)
+metrics.registry.gauge("analyze_cache_misses", "/analyze requests not found in the result cache.", lambda: analysis_cache.misses if analysis_cache else 0)
+metrics.registry.gauge("analyze_cache_entries", "Results in the result cache of this process.", lambda: len(analysis_cache) if analysis_cache else 0)
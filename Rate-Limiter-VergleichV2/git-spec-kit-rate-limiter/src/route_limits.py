@@ -0,0 +1,94 @@
+import json
+import os
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Tuple
+
+
+@dataclass
+class RouteLimit:
+    """Quota of one route, resolved once at startup."""
+    # Requests per window by tier; tiers not listed use the tier limit
+    limits: Dict[str, int] = field(default_factory=dict)
+    # Routes with the same bucket share one quota per client. The default
+    # bucket "" is the client's main quota, which per-key limits apply to.
+    bucket: str = ""
+
+    def client_key(self, client_id: str) -> str:
+        """Key of the client's state for this route."""
+        return f"{self.bucket}:{client_id}" if self.bucket else client_id
+
+    def limit_for(self, user_tier: str, key_limit: Optional[int]) -> Optional[int]:
+        """
+        Quota of a client on this route; None means the tier limit
+        (LIMIT_FREE/LIMIT_PRO).
+        """
+        if key_limit is not None and not self.bucket:
+            return key_limit
+        return self.limits.get(user_tier)
+
+
+RouteTable = Dict[Tuple[str, str], RouteLimit]
+
+# Limited routes if no configuration is given: the /analyze variants with
+# the tier limits, sharing the client's main quota
+DEFAULT_ROUTES: Dict[str, dict] = {"POST /analyze": {}, "POST /analyze/batch": {}, "POST /analyze/jobs": {}}
+
+
+def compile_routes(config: Dict[str, dict]) -> RouteTable:
+    """
+    Compile route configuration into a table keyed by (method, route template).
+
+    Args:
+        config: Maps `"<METHOD> <route template>"` (as declared in the app,
+            e.g. `"GET /items/{item_id}"`) to an object with requests per
+            window by tier and an optional `"bucket"`, e.g.
+            `{"free": 5, "pro": 100}`. Routes with an own bucket default to
+            their own quota.
+
+    Raises:
+        ValueError: If an entry is malformed.
+    """
+    table = {}
+    for route, settings in config.items():
+        method, _, path = route.partition(" ")
+        if not path.startswith("/") or not isinstance(settings, dict):
+            raise ValueError(f"Invalid route limit {route!r}: expected '<METHOD> /path': {{...}}")
+        settings = dict(settings)
+        bucket = settings.pop("bucket", "")
+        limits = {}
+        for tier, limit in settings.items():
+            if not isinstance(limit, int) or isinstance(limit, bool) or limit < 1:
+                raise ValueError(f"Invalid limit for {tier!r} on {route!r}: {limit!r}")
+            limits[tier] = limit
+        table[(method.upper(), path)] = RouteLimit(limits=limits, bucket=str(bucket))
+    return table
+
+
+def load_routes(path: Optional[str]) -> RouteTable:
+    """
+    Route table from a JSON file in the format of compile_routes, on top of
+    DEFAULT_ROUTES; DEFAULT_ROUTES only if `path` is None.
+
+    Raises:
+        ValueError: If the file is malformed.
+    """
+    config = dict(DEFAULT_ROUTES)
+    if path is not None:
+        with open(path, encoding="utf-8") as routes_file:
+            config.update(json.load(routes_file))
+    return compile_routes(config)
+
+
+# Limits by (method, route template), configured with RATE_LIMIT_ROUTES_PATH
+route_table = load_routes(os.environ.get("RATE_LIMIT_ROUTES_PATH"))
+
+
+def set_route_table(table: RouteTable) -> None:
+    """Replace the route table, e.g. after loading another configuration."""
+    global route_table
+    route_table = table
+
+
+def lookup(method: str, path: str) -> Optional[RouteLimit]:
+    """Limit of a route, None if the route is not limited."""
+    return route_table.get((method, path))
@@ -0,0 +1,196 @@
+import hashlib
+import mmap
+import os
+import struct
+import tempfile
+import threading
+from contextlib import ExitStack, contextmanager
+from typing import Dict, Iterable, List, Sequence
+from src.algorithms import STATE_FIELDS, RateLimitAlgorithm, state_from_values, state_to_values
+from src.backend import QuotaCheck, RateLimitBackend
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# /dev/shm keeps the table in RAM on Linux; any local file works with mmap.
+DEFAULT_PATH = os.path.join(
+    "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir(),
+    "spec-kit-rate-limit.shm",
+)
+
+_MAGIC = b"RLSHM001"
+# magic, number of buckets, slots per bucket
+_HEADER = struct.Struct("<8sII")
+# key hash (0 = empty), expires_at, algorithm state fields
+_SLOT = struct.Struct(f"<Q{1 + STATE_FIELDS}d")
+
+
+def _key_hash(algorithm_name: str, client_id: str) -> int:
+    """
+    Stable 64 bit key hash. Python's hash() is randomized per process and
+    cannot be shared between workers.
+    """
+    digest = hashlib.blake2b(f"{algorithm_name}:{client_id}".encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "little") or 1
+
+
+class SharedMemoryBackend(RateLimitBackend):
+    """
+    Rate limit backend that keeps client state in a memory-mapped hash table,
+    so all worker processes on one host enforce one shared quota.
+
+    The table is split into buckets of a few slots. A client always lives in
+    the bucket selected by its key hash, so a decision touches one bucket
+    only. Each bucket is guarded by a POSIX byte-range lock on the mapped
+    file (plus a thread lock, since file locks are per process), which makes
+    the read-decide-write sequence atomic across processes without any
+    network hop.
+
+    If a bucket is full, an expired slot is reused first, otherwise the slot
+    that expires next is overwritten. As with the in-process store, losing a
+    state early only hands that client a fresh quota.
+    """
+
+    def __init__(self, path: str = DEFAULT_PATH, buckets: int = 8192, slots_per_bucket: int = 8):
+        """
+        Args:
+            path (str): File backing the shared table. All workers must use the same path.
+            buckets (int): Number of buckets (and locks) in the table.
+            slots_per_bucket (int): Number of clients a bucket can hold.
+
+        Raises:
+            RuntimeError: If the platform has no POSIX file locks.
+            ValueError: If an existing table at `path` has a different layout.
+        """
+        if fcntl is None:
+            raise RuntimeError("SharedMemoryBackend requires POSIX file locks (fcntl)")
+        self.path = path
+        self.buckets = buckets
+        self.slots_per_bucket = slots_per_bucket
+        self._bucket_size = slots_per_bucket * _SLOT.size
+        self._size = _HEADER.size + buckets * self._bucket_size
+        self._thread_locks: List[threading.Lock] = [threading.Lock() for _ in range(64)]
+
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            self._init_file()
+            self._map = mmap.mmap(self._fd, self._size)
+        except Exception:
+            os.close(self._fd)
+            raise
+
+    def _init_file(self) -> None:
+        # Serialize initialization between workers starting at the same time
+        fcntl.lockf(self._fd, fcntl.LOCK_EX, _HEADER.size, 0, os.SEEK_SET)
+        try:
+            header = os.pread(self._fd, _HEADER.size, 0)
+            if len(header) < _HEADER.size or header[:8] == b"\0" * 8:
+                os.ftruncate(self._fd, self._size)
+                os.pwrite(self._fd, _HEADER.pack(_MAGIC, self.buckets, self.slots_per_bucket), 0)
+                return
+            magic, buckets, slots_per_bucket = _HEADER.unpack(header)
+            if (magic, buckets, slots_per_bucket) != (_MAGIC, self.buckets, self.slots_per_bucket):
+                raise ValueError(f"Shared rate limit table at {self.path} has an incompatible layout")
+        finally:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN, _HEADER.size, 0, os.SEEK_SET)
+
+    @contextmanager
+    def _locked_bucket(self, bucket: int):
+        offset = _HEADER.size + bucket * self._bucket_size
+        with self._thread_locks[bucket % len(self._thread_locks)]:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, self._bucket_size, offset, os.SEEK_SET)
+            try:
+                yield offset
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, self._bucket_size, offset, os.SEEK_SET)
+
+    @contextmanager
+    def _locked_buckets(self, buckets: Iterable[int]):
+        """
+        Lock several buckets at once. Thread locks and then file locks are
+        taken in ascending order, so concurrent callers cannot deadlock.
+        """
+        buckets = sorted(set(buckets))
+        with ExitStack() as stack:
+            for index in sorted({bucket % len(self._thread_locks) for bucket in buckets}):
+                stack.enter_context(self._thread_locks[index])
+            for bucket in buckets:
+                offset = _HEADER.size + bucket * self._bucket_size
+                fcntl.lockf(self._fd, fcntl.LOCK_EX, self._bucket_size, offset, os.SEEK_SET)
+                stack.callback(fcntl.lockf, self._fd, fcntl.LOCK_UN, self._bucket_size, offset, os.SEEK_SET)
+            yield
+
+    def _bucket_offset(self, key: int) -> int:
+        return _HEADER.size + (key % self.buckets) * self._bucket_size
+
+    def _find_slot(self, bucket_offset: int, key: int, algorithm: RateLimitAlgorithm, now: float, limit: int):
+        """Return the slot offset for `key` and its state (a fresh one if the key is not stored)."""
+        victim_offset = bucket_offset
+        victim_expiry = float("inf")
+        for slot in range(self.slots_per_bucket):
+            offset = bucket_offset + slot * _SLOT.size
+            slot_key, expires_at, *values = _SLOT.unpack_from(self._map, offset)
+            if slot_key == key:
+                return offset, state_from_values(algorithm.state_type, values)
+            if slot_key == 0 or expires_at <= now:
+                expires_at = float("-inf")
+            if expires_at < victim_expiry:
+                victim_offset, victim_expiry = offset, expires_at
+        return victim_offset, algorithm.new_state(now, limit)
+
+    def take(
+        self, client_id: str, algorithm: RateLimitAlgorithm, now: float, limit: int, window: float,
+        min_units: int = 1, max_units: int = 1, refund: int = 0,
+    ):
+        key = _key_hash(algorithm.name, client_id)
+        with self._locked_bucket(key % self.buckets) as bucket_offset:
+            offset, state = self._find_slot(bucket_offset, key, algorithm, now, limit)
+            granted, wait = algorithm.take(state, now, limit, window, min_units, max_units, refund)
+            _SLOT.pack_into(
+                self._map, offset, key, algorithm.expires_at(state, limit, window), *state_to_values(state)
+            )
+        return granted, wait
+
+    def acquire_all(self, checks: Sequence[QuotaCheck], now: float) -> float:
+        """
+        Lock the buckets of all levels, check every level and only then
+        consume on all of them, so a rejected request takes nothing.
+        """
+        keys = [_key_hash(check.algorithm.name, check.client_id) for check in checks]
+        with self._locked_buckets(key % self.buckets for key in keys):
+            wait = 0.0
+            for check, key in zip(checks, keys):
+                _, state = self._find_slot(self._bucket_offset(key), key, check.algorithm, now, check.limit)
+                wait = max(wait, check.algorithm.retry_after(state, now, check.limit, check.window, check.units))
+            if wait > 0:
+                return wait
+            for check, key in zip(checks, keys):
+                # Looked up again, so two new levels in one bucket get different slots
+                offset, state = self._find_slot(self._bucket_offset(key), key, check.algorithm, now, check.limit)
+                check.algorithm.consume(state, now, check.limit, check.window, check.units)
+                _SLOT.pack_into(
+                    self._map, offset, key, check.algorithm.expires_at(state, check.limit, check.window),
+                    *state_to_values(state),
+                )
+        return 0.0
+
+    def clear(self) -> None:
+        """Drop all entries of the shared table."""
+        for bucket in range(self.buckets):
+            with self._locked_bucket(bucket) as offset:
+                self._map[offset:offset + self._bucket_size] = b"\0" * self._bucket_size
+
+    def stats(self, now: float) -> Dict[str, int]:
+        """Count live entries. Walks the whole table, not meant for the request path."""
+        entries = 0
+        for offset in range(_HEADER.size, self._size, _SLOT.size):
+            slot_key, expires_at = struct.unpack_from("<Qd", self._map, offset)
+            if slot_key != 0 and expires_at > now:
+                entries += 1
+        return {"entries": entries, "capacity": self.buckets * self.slots_per_bucket}
+
+    def close(self) -> None:
+        self._map.close()
+        os.close(self._fd)
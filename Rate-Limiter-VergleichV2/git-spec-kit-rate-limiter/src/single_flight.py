@@ -0,0 +1,35 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+
+class SingleFlight:
+    """
+    Runs a call only once for concurrent callers with the same key.
+
+    The first caller of a key starts the call; callers arriving while it runs
+    await the same result (or exception) instead of starting it again. Once
+    it is done, the next caller starts a new one. The call runs as its own
+    task, so a caller that goes away does not cancel it for the others.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+
+    async def do(self, key: Hashable, call: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        Result of `call()`, or of the call already running for `key`.
+
+        Returns:
+            Tuple[Any, bool]: The result and whether it came from a call
+            started by another caller.
+        """
+        task = self._calls.get(key)
+        shared = task is not None
+        if task is None:
+            task = self._calls[key] = asyncio.ensure_future(call())
+            task.add_done_callback(lambda _: self._calls.pop(key, None))
+        return await asyncio.shield(task), shared
+
+    def __len__(self) -> int:
+        """Calls running."""
+        return len(self._calls)
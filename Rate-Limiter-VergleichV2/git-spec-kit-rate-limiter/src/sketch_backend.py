@@ -0,0 +1,147 @@
+import math
+from array import array
+from typing import Dict, List, Tuple
+from src.algorithms import RateLimitAlgorithm, SlidingWindowCounter, SlidingWindowState
+from src.backend import RateLimitBackend
+
+# Counters per row and number of rows. Memory is 2 windows * DEPTH * WIDTH * 8
+# bytes per window length, i.e. 16 MiB by default, whatever the number of clients.
+DEFAULT_WIDTH = 1 << 18
+DEFAULT_DEPTH = 4
+# Slack for the float sums of fractional units
+_EPSILON = 1e-9
+
+
+class CountMinSketch:
+    """
+    Count-Min Sketch: `depth` rows of `width` counters. A key adds to one
+    counter per row and is estimated by the smallest of them, so estimates
+    are never too low. With total mass N added, an estimate is too high by
+    more than e / width * N only with probability exp(-depth).
+
+    Keys are hashed with Python's hash(), which is randomized per process,
+    so clients cannot pick keys that collide on purpose.
+    """
+
+    def __init__(self, width: int = DEFAULT_WIDTH, depth: int = DEFAULT_DEPTH):
+        self.width = width
+        self.depth = depth
+        self.rows = [array("d", bytes(8 * width)) for _ in range(depth)]
+
+    def indexes(self, key: str) -> List[int]:
+        """Counter of `key` in each row (double hashing of one 64 bit hash)."""
+        h = hash(key) & 0xFFFFFFFFFFFFFFFF
+        h1, h2 = h & 0xFFFFFFFF, (h >> 32) | 1
+        width = self.width
+        return [(h1 + i * h2) % width for i in range(self.depth)]
+
+    def estimate(self, indexes: List[int]) -> float:
+        return min([row[index] for row, index in zip(self.rows, indexes)])
+
+    def add(self, indexes: List[int], amount: float) -> None:
+        for row, index in zip(self.rows, indexes):
+            row[index] += amount
+
+    def clear(self) -> None:
+        self.rows = [array("d", bytes(8 * self.width)) for _ in range(self.depth)]
+
+
+class _WindowedSketch:
+    """Sketches of the current and the previous fixed window of one window length."""
+
+    def __init__(self, width: int, depth: int):
+        self.start = float("-inf")
+        self.current = CountMinSketch(width, depth)
+        self.previous = CountMinSketch(width, depth)
+
+    def roll(self, now: float, window: float) -> None:
+        aligned_start = now - (now % window)
+        if aligned_start == self.start:
+            return
+        # Reuse the memory of the window that drops out
+        self.previous, self.current = self.current, self.previous
+        if aligned_start - self.start != window:
+            self.previous.clear()
+        self.current.clear()
+        self.start = aligned_start
+
+
+class SketchBackend(RateLimitBackend):
+    """
+    Approximate rate limit backend in fixed memory, for more clients than
+    the exact store can hold (e.g. millions of source IPs during an attack).
+
+    Every client is limited by a sliding window counter (see
+    SlidingWindowCounter) whose two counts are read from Count-Min Sketches
+    of the current and the previous window, whatever algorithm the tier
+    configures. Counts are kept as fractions of each client's limit, so
+    clients with different limits and units share one sketch per window
+    length.
+
+    Error bound: estimates are never too low, so a client is never admitted
+    over its limit. A client may be rejected early: with N the requests of
+    all clients in the window, each weighted by 1/limit of its client, its
+    estimate is too high by more than e / width * N quotas only with
+    probability exp(-depth). With the default width of 2**18, 100k free
+    clients (limit 5) sending 5 requests each make N = 100k, so a client
+    loses more than 1.04 of its quota with probability 1.8% at most.
+    """
+
+    def __init__(self, width: int = DEFAULT_WIDTH, depth: int = DEFAULT_DEPTH):
+        self.width = width
+        self.depth = depth
+        # Window length -> sketches, allocated on first use
+        self._windows: Dict[float, _WindowedSketch] = {}
+        self._estimator = SlidingWindowCounter()
+
+    def _lookup(self, key: str, now: float, window: float) -> Tuple[_WindowedSketch, List[int], float, float]:
+        """Sketches of `window`, counters of `key` and its current and previous count."""
+        sketches = self._windows.get(window)
+        if sketches is None:
+            sketches = self._windows[window] = _WindowedSketch(self.width, self.depth)
+        sketches.roll(now, window)
+        indexes = sketches.current.indexes(key)
+        return sketches, indexes, sketches.current.estimate(indexes), sketches.previous.estimate(indexes)
+
+    def _wait(self, sketches: _WindowedSketch, current: float, previous: float, now: float, window: float, units: float) -> float:
+        # Weighted like SlidingWindowCounter, counts in quotas (limit 1)
+        estimate = previous * (1.0 - (now - sketches.start) / window) + current
+        if estimate + units <= 1.0 + _EPSILON:
+            return 0.0
+        state = SlidingWindowState(current_count=current, previous_count=previous, window_start_time=sketches.start)
+        return self._estimator.retry_after(state, now, 1.0 + _EPSILON, window, units)
+
+    def retry_after(self, key: str, now: float, limit: int, window: float, units: int = 1) -> float:
+        """Seconds until `units` would be admitted for `key`, 0 if now."""
+        sketches, _, current, previous = self._lookup(key, now, window)
+        return self._wait(sketches, current, previous, now, window, units / limit)
+
+    def consume(self, key: str, now: float, limit: int, window: float, units: int = 1) -> None:
+        sketches, indexes, _, _ = self._lookup(key, now, window)
+        sketches.current.add(indexes, units / limit)
+
+    def take(
+        self, client_id: str, algorithm: RateLimitAlgorithm, now: float, limit: int, window: float,
+        min_units: int = 1, max_units: int = 1, refund: int = 0,
+    ) -> Tuple[int, float]:
+        sketches, indexes, current, previous = self._lookup(client_id, now, window)
+        if refund > 0:
+            # Only what is still in the current window can be given back
+            amount = min(refund / limit, current)
+            sketches.current.add(indexes, -amount)
+            current -= amount
+        if min_units > 0:
+            wait = self._wait(sketches, current, previous, now, window, min_units / limit)
+            if wait > 0:
+                return 0, wait
+        estimate = previous * (1.0 - (now - sketches.start) / window) + current
+        units = min(max_units, max(min_units, math.floor((1.0 - estimate) * limit + _EPSILON)))
+        if units > 0:
+            sketches.current.add(indexes, units / limit)
+        return units, 0.0
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "windows": len(self._windows),
+            "bytes": len(self._windows) * 2 * self.depth * self.width * 8,
+        }
@@ -0,0 +1,165 @@
+import asyncio
+import logging
+import os
+import struct
+import time
+from typing import Dict, List, Optional
+from src.algorithms import ALGORITHMS, STATE_FIELDS, state_from_values, state_to_values
+from src.store import RateLimitStore
+
+logger = logging.getLogger(__name__)
+
+_MAGIC = b"RLSNAP01"
+# magic, written at, number of algorithm names, number of entries
+_HEADER = struct.Struct("<8sdBI")
+# algorithm index, expires_at, key length, state fields; followed by the key
+_RECORD = struct.Struct(f"<BdH{STATE_FIELDS}d")
+# Entries packed between two yields to the event loop
+_CHUNK = 5_000
+
+
+class StoreSnapshotter:
+    """
+    Writes the client states of a RateLimitStore to a compact binary file and
+    restores them, so a restarted process keeps enforcing the quotas that
+    were in use instead of handing every client a fresh one.
+
+    Only entries scheduled to expire are written (the others are equivalent
+    to a fresh state), in least recently used order, so restoring keeps the
+    eviction order. Entries that expired in the meantime are dropped on load.
+
+    `save_async` packs the entries in chunks between which the event loop
+    keeps serving requests, and writes the file in a worker thread. The file
+    is replaced atomically, a crash while writing leaves the previous
+    snapshot in place.
+    """
+
+    def __init__(self, store: RateLimitStore, path: str):
+        self.store = store
+        self.path = path
+        self._names = sorted(ALGORITHMS)
+        self._codes = {ALGORITHMS[name].state_type: code for code, name in enumerate(self._names)}
+        self.last_write_seconds: Optional[float] = None
+        self.last_load_seconds: Optional[float] = None
+        self.last_entries = 0
+
+    def _header(self, now: float, count: int) -> bytes:
+        names = b"".join(bytes([len(name)]) + name.encode() for name in self._names)
+        return _HEADER.pack(_MAGIC, now, len(self._names), count) + names
+
+    def _pack(self, key: str, state) -> Optional[bytes]:
+        code = self._codes.get(type(state))
+        expires_at = self.store.expires_at(key)
+        if code is None or expires_at is None:
+            return None
+        encoded = key.encode()
+        return _RECORD.pack(code, expires_at, len(encoded), *state_to_values(state)) + encoded
+
+    def _write(self, now: float, records: List[bytes]) -> None:
+        temporary = f"{self.path}.tmp"
+        with open(temporary, "wb") as snapshot_file:
+            snapshot_file.write(self._header(now, len(records)))
+            snapshot_file.write(b"".join(records))
+        os.replace(temporary, self.path)
+
+    def save(self, now: float) -> int:
+        """
+        Write a snapshot, blocking until it is on disk.
+
+        Returns:
+            int: Number of entries written.
+        """
+        start = time.perf_counter()
+        records = [record for record in (self._pack(key, state) for key, state in self.store.items()) if record]
+        self._write(now, records)
+        self._report_write(start, len(records))
+        return len(records)
+
+    async def save_async(self) -> int:
+        """Like save, but yields to the event loop while packing and writes in a thread."""
+        start = time.perf_counter()
+        now = time.time()
+        items = list(self.store.items())
+        records = []
+        for offset in range(0, len(items), _CHUNK):
+            for key, state in items[offset:offset + _CHUNK]:
+                record = self._pack(key, state)
+                if record:
+                    records.append(record)
+            await asyncio.sleep(0)
+        await asyncio.to_thread(self._write, now, records)
+        self._report_write(start, len(records))
+        return len(records)
+
+    def _report_write(self, start: float, count: int) -> None:
+        self.last_write_seconds = time.perf_counter() - start
+        self.last_entries = count
+        logger.info("Wrote %d rate limit entries to %s in %.1f ms", count, self.path, self.last_write_seconds * 1000)
+
+    def load(self, now: float) -> int:
+        """
+        Restore the entries of the snapshot that have not expired at `now`.
+
+        Returns:
+            int: Number of restored entries, 0 if there is no snapshot.
+
+        Raises:
+            ValueError: If the file is not a valid snapshot.
+        """
+        start = time.perf_counter()
+        try:
+            with open(self.path, "rb") as snapshot_file:
+                data = snapshot_file.read()
+        except FileNotFoundError:
+            return 0
+
+        try:
+            magic, _, name_count, count = _HEADER.unpack_from(data)
+            if magic != _MAGIC:
+                raise ValueError(f"{self.path} is not a rate limit snapshot")
+            offset = _HEADER.size
+            state_types = []
+            for _ in range(name_count):
+                length = data[offset]
+                name = data[offset + 1:offset + 1 + length].decode()
+                offset += 1 + length
+                # Algorithms removed since the snapshot was written are skipped
+                state_types.append(ALGORITHMS[name].state_type if name in ALGORITHMS else None)
+
+            restored = 0
+            for _ in range(count):
+                code, expires_at, key_length, *values = _RECORD.unpack_from(data, offset)
+                offset += _RECORD.size
+                key = data[offset:offset + key_length].decode()
+                offset += key_length
+                state_type = state_types[code]
+                if expires_at <= now or state_type is None:
+                    continue
+                self.store[key] = state_from_values(state_type, values)
+                self.store.schedule(key, expires_at)
+                restored += 1
+        except (struct.error, IndexError, UnicodeDecodeError) as exc:
+            raise ValueError(f"{self.path} is truncated or corrupt") from exc
+
+        self.last_load_seconds = time.perf_counter() - start
+        logger.info(
+            "Restored %d of %d rate limit entries from %s in %.1f ms",
+            restored, count, self.path, self.last_load_seconds * 1000,
+        )
+        return restored
+
+    async def run(self, interval: float = 10.0) -> None:
+        """Write a snapshot every `interval` seconds until cancelled."""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.save_async()
+            except Exception:
+                logger.exception("Writing rate limit snapshot to %s failed", self.path)
+
+    def stats(self) -> Dict[str, Optional[float]]:
+        return {
+            "entries": self.last_entries,
+            "last_write_seconds": self.last_write_seconds,
+            "last_load_seconds": self.last_load_seconds,
+        }
@@ -0,0 +1,164 @@
+import math
+from collections import OrderedDict
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+
+class RateLimitStore:
+    """
+    Bounded in-memory store for per-client rate limit state.
+
+    Memory is bounded in two ways:
+    - TTL: Every entry can be scheduled to expire at the time its state is
+      equivalent to a fresh one. Expiry is tracked in a hashed timer wheel, so
+      a sweep only visits the slots of the ticks that passed since the last
+      sweep instead of walking the whole store.
+    - Capacity: If more than `max_entries` clients are tracked, the least
+      recently used entry is evicted.
+
+    Dropping an entry early is always safe, the client simply starts with a
+    fresh state again.
+    """
+
+    def __init__(self, max_entries: int = 100_000, resolution: float = 1.0, slots: int = 256):
+        """
+        Args:
+            max_entries (int): Hard cap on the number of tracked clients.
+            resolution (float): Length of one timer wheel tick in seconds.
+            slots (int): Number of timer wheel slots. Expiries further away
+                than `slots * resolution` seconds stay in the wheel for more
+                than one rotation.
+        """
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+        self.max_entries = max_entries
+        self.resolution = resolution
+        self._entries: "OrderedDict[str, object]" = OrderedDict()
+        self._expiry_ticks: Dict[str, int] = {}
+        self._wheel: List[Set[str]] = [set() for _ in range(slots)]
+        self._last_tick: Optional[int] = None
+        # A few service-wide entries every request touches (e.g. the global
+        # quota); never evicted and not subject to expiry
+        self.pinned: Dict[str, object] = {}
+        self.expired = 0
+        self.evicted = 0
+
+    # --- Mapping interface ---
+
+    def get(self, key: str, default=None):
+        entry = self._entries.get(key)
+        if entry is None:
+            return default
+        self._entries.move_to_end(key)
+        return entry
+
+    def __getitem__(self, key: str):
+        entry = self.get(key)
+        if entry is None:
+            raise KeyError(key)
+        return entry
+
+    def __setitem__(self, key: str, entry) -> None:
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            oldest, _ = self._entries.popitem(last=False)
+            self._unschedule(oldest)
+            self.evicted += 1
+
+    def __delitem__(self, key: str) -> None:
+        del self._entries[key]
+        self._unschedule(key)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._entries)
+
+    def items(self) -> Iterator[Tuple[str, object]]:
+        return iter(self._entries.items())
+
+    def clear(self) -> None:
+        """Drop all entries and reset the statistics."""
+        self._entries.clear()
+        self._expiry_ticks.clear()
+        self.pinned.clear()
+        for slot in self._wheel:
+            slot.clear()
+        self._last_tick = None
+        self.expired = 0
+        self.evicted = 0
+
+    # --- Expiry ---
+
+    def schedule(self, key: str, expires_at: float) -> None:
+        """Schedule `key` to be dropped by the first sweep at or after `expires_at`."""
+        if key not in self._entries:
+            return
+        tick = math.ceil(expires_at / self.resolution)
+        previous = self._expiry_ticks.get(key)
+        if previous == tick:
+            return
+        if previous is not None:
+            self._wheel[previous % len(self._wheel)].discard(key)
+        self._expiry_ticks[key] = tick
+        self._wheel[tick % len(self._wheel)].add(key)
+
+    def expires_at(self, key: str) -> Optional[float]:
+        """Return when `key` is scheduled to expire, or None if it is not scheduled."""
+        tick = self._expiry_ticks.get(key)
+        return None if tick is None else tick * self.resolution
+
+    def _unschedule(self, key: str) -> None:
+        tick = self._expiry_ticks.pop(key, None)
+        if tick is not None:
+            self._wheel[tick % len(self._wheel)].discard(key)
+
+    def sweep(self, now: float) -> int:
+        """
+        Drop all entries that expired up to `now`.
+
+        Only the wheel slots of ticks that passed since the previous sweep are
+        visited, at most one full rotation. Calling this on every request keeps
+        the cost per call amortized O(1).
+
+        Returns:
+            int: Number of dropped entries.
+        """
+        current_tick = int(now // self.resolution)
+        if self._last_tick is None or current_tick - self._last_tick > len(self._wheel):
+            first_tick = current_tick - len(self._wheel) + 1
+        elif current_tick > self._last_tick:
+            first_tick = self._last_tick + 1
+        else:
+            return 0
+        self._last_tick = current_tick
+
+        removed = 0
+        for tick in range(first_tick, current_tick + 1):
+            slot = self._wheel[tick % len(self._wheel)]
+            if not slot:
+                continue
+            # Keys scheduled for a later rotation share the slot and stay
+            due = [key for key in slot if self._expiry_ticks[key] <= current_tick]
+            for key in due:
+                slot.discard(key)
+                del self._expiry_ticks[key]
+                del self._entries[key]
+            removed += len(due)
+
+        self.expired += removed
+        return removed
+
+    def stats(self) -> Dict[str, int]:
+        """Entry count and eviction statistics."""
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "scheduled": len(self._expiry_ticks),
+            "expired": self.expired,
+            "evicted": self.evicted,
+        }
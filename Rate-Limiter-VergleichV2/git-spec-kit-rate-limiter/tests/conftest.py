@@ -1,6 +1,7 @@
 import pytest
 from fastapi.testclient import TestClient
 from src.main import app
+from src import result_cache
 from src.rate_limiter import rate_limit_store
 import time
 from unittest.mock import patch
@@ -13,6 +14,8 @@ def client():
 def clear_rate_limit_store():
     """Clear the rate limit store before each test."""
     rate_limit_store.clear()
+    if result_cache.analysis_cache is not None:
+        result_cache.analysis_cache.clear()
     yield
 
 @pytest.fixture
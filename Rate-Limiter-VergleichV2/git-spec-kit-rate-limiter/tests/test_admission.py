@@ -0,0 +1,122 @@
+import asyncio
+import math
+import httpx
+import pytest
+from unittest.mock import patch
+from src import main, metrics
+from src.admission import PriorityAdmissionQueue
+from src.concurrency import AdaptiveConcurrencyLimiter, ConcurrencyLimitExceeded
+
+def single_slot_queue(**kwargs) -> PriorityAdmissionQueue:
+    # Average latency starts at half the threshold, i.e. 10ms
+    return PriorityAdmissionQueue(AdaptiveConcurrencyLimiter(initial_limit=1, max_limit=1, latency_threshold=0.02), **kwargs)
+
+async def admit_in_order(queue: PriorityAdmissionQueue, arrivals, delay: float = 0.0):
+    """Let `arrivals` (tier, name) wait for the single busy slot; return the order they get it."""
+    order = []
+
+    async def request(tier, name):
+        async with queue.slot(tier):
+            order.append(name)
+
+    held = await queue.acquire("free")
+    tasks = []
+    for tier, name in arrivals:
+        tasks.append(asyncio.create_task(request(tier, name)))
+        await asyncio.sleep(delay)
+    await asyncio.sleep(0)
+    queue.release(held)
+    await asyncio.gather(*tasks)
+    return order
+
+def test_pro_requests_are_admitted_first():
+    queue = single_slot_queue()
+    arrivals = [("free", "free-1"), ("free", "free-2"), ("pro", "pro-1"), ("free", "free-3"), ("pro", "pro-2")]
+    order = asyncio.run(admit_in_order(queue, arrivals))
+    assert order == ["pro-1", "pro-2", "free-1", "free-2", "free-3"]
+
+def test_aging_lets_waiting_free_requests_go_first():
+    queue = single_slot_queue(head_start={"pro": 0.05})
+    arrivals = [("free", "free-1"), ("pro", "pro-1")]
+    # The free request has waited longer than the head start of pro
+    order = asyncio.run(admit_in_order(queue, arrivals, delay=0.1))
+    assert order == ["free-1", "pro-1"]
+
+def test_requests_past_their_deadline_leave_the_queue():
+    queue = single_slot_queue()
+
+    async def scenario():
+        held = await queue.acquire("free")
+        with pytest.raises(ConcurrencyLimitExceeded):
+            await queue.acquire("pro", timeout=0.05)
+        # The slot is not handed to the request that gave up
+        queue.release(held)
+        assert queue.limiter.in_flight == 0
+
+    asyncio.run(scenario())
+    assert queue.stats() == {"waiting": 0, "rejected": 0, "expired": 1}
+
+def test_full_queue_sheds_right_away():
+    queue = single_slot_queue(max_depth=1)
+
+    async def scenario():
+        held = await queue.acquire("free")
+        waiting = asyncio.create_task(queue.acquire("pro"))
+        await asyncio.sleep(0)
+        with pytest.raises(ConcurrencyLimitExceeded):
+            await queue.acquire("pro")
+        queue.release(held)
+        queue.release(await waiting)
+
+    asyncio.run(scenario())
+    assert queue.stats() == {"waiting": 0, "rejected": 1, "expired": 0}
+
+def test_accepted_work_waits_without_deadline_in_a_full_queue():
+    queue = single_slot_queue(max_depth=0, timeout=0.01)
+
+    async def scenario():
+        held = await queue.acquire("free")
+        waiting = asyncio.create_task(queue.acquire("free", timeout=math.inf, sheddable=False))
+        await asyncio.sleep(0.05)
+        assert not waiting.done()
+        queue.release(held)
+        queue.release(await waiting)
+
+    asyncio.run(scenario())
+    assert queue.stats() == {"waiting": 0, "rejected": 0, "expired": 0}
+
+def test_wait_time_is_exported_by_tier():
+    queue = single_slot_queue()
+    waited = metrics.admission_wait_seconds.labels("pro")
+    before = waited.count
+    asyncio.run(admit_in_order(queue, [("pro", "pro-1")]))
+    assert waited.count == before + 1
+    assert 'admission_queue_wait_seconds_bucket{tier="pro",le="+Inf"}' in metrics.registry.render()
+
+def test_integration_waits_for_a_slot(monkeypatch):
+    queue = single_slot_queue()
+    monkeypatch.setattr(main, "admission_queue", queue)
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            held = await queue.acquire("free")  # a computation still running
+            request = asyncio.create_task(client.post("/analyze", json={"text": "test"}))
+            await asyncio.sleep(0.05)
+            assert queue.waiting == 1
+            queue.release(held)
+            return await request
+
+    with patch("src.main.expensive_computation"):
+        response = asyncio.run(scenario())
+    assert response.status_code == 200
+
+def test_integration_expired_request_returns_503(client, monkeypatch):
+    queue = single_slot_queue(timeout=0.05)
+    monkeypatch.setattr(main, "admission_queue", queue)
+    queue.limiter.acquire()  # a computation still running
+
+    with patch("src.main.expensive_computation"):
+        response = client.post("/analyze", json={"text": "test"})
+    assert response.status_code == 503
+    assert queue.stats()["expired"] == 1
@@ -0,0 +1,145 @@
+import pytest
+from src.algorithms import ALGORITHMS, get_algorithm
+from src.rate_limiter import check_rate_limit, RateLimitExceeded, TIER_ALGORITHMS
+
+@pytest.mark.parametrize("name", sorted(ALGORITHMS))
+def test_algorithm_admits_limit_then_rejects(name):
+    """
+    Every algorithm admits a fresh client's full limit and rejects the next request.
+    """
+    algorithm = get_algorithm(name)
+    now = 1020.0  # aligned to a 60s window
+    state = algorithm.new_state(now, 5)
+
+    for _ in range(5):
+        assert algorithm.retry_after(state, now, 5, 60) == 0
+        algorithm.consume(state, now, 5, 60)
+
+    assert algorithm.retry_after(state, now, 5, 60) > 0
+
+@pytest.mark.parametrize("name", sorted(ALGORITHMS))
+def test_take_grants_between_min_and_max_units(name):
+    algorithm = get_algorithm(name)
+    now = 1020.0
+    state = algorithm.new_state(now, 10)
+
+    assert algorithm.take(state, now, 10, 60, min_units=1, max_units=4) == (4, 0.0)
+    assert algorithm.take(state, now, 10, 60, min_units=1, max_units=10) == (6, 0.0)
+
+    granted, wait = algorithm.take(state, now, 10, 60, min_units=1, max_units=4)
+    assert granted == 0 and wait > 0
+    assert algorithm.take(state, now, 10, 60, min_units=0, max_units=4) == (0, 0.0)
+
+    # Refunded units can be taken again
+    assert algorithm.take(state, now, 10, 60, min_units=2, max_units=2, refund=3) == (2, 0.0)
+    assert algorithm.take(state, now, 10, 60, min_units=1, max_units=5) == (1, 0.0)
+
+def test_unknown_algorithm():
+    with pytest.raises(ValueError):
+        get_algorithm("leaky_sieve")
+
+@pytest.mark.parametrize("name", ["sliding_window", "gcra", "token_bucket"])
+def test_no_double_burst_at_window_edge(mock_time, monkeypatch, name):
+    """
+    A fixed window admits 2x the limit around its boundary; the smoothing
+    algorithms must not.
+    """
+    monkeypatch.setitem(TIER_ALGORITHMS, "free", name)
+    client_id = "10.0.0.1"
+
+    # 5 requests at the very end of one window ...
+    mock_time.return_value = 1079.0
+    for _ in range(5):
+        check_rate_limit(client_id, "free")
+
+    # ... and another burst right after the boundary.
+    mock_time.return_value = 1081.0
+    with pytest.raises(RateLimitExceeded):
+        check_rate_limit(client_id, "free")
+
+def test_fixed_window_double_burst_at_window_edge(mock_time):
+    """
+    Documents the fixed window weakness the other algorithms address.
+    """
+    client_id = "10.0.0.1"
+
+    mock_time.return_value = 1000.0
+    check_rate_limit(client_id, "free")
+
+    mock_time.return_value = 1059.0
+    for _ in range(4):
+        check_rate_limit(client_id, "free")
+
+    mock_time.return_value = 1061.0
+    for _ in range(5):
+        check_rate_limit(client_id, "free")
+
+def test_sliding_window_retry_after(mock_time, monkeypatch):
+    monkeypatch.setitem(TIER_ALGORITHMS, "free", "sliding_window")
+    client_id = "10.0.0.1"
+    mock_time.return_value = 1020.0
+
+    for _ in range(5):
+        check_rate_limit(client_id, "free")
+
+    with pytest.raises(RateLimitExceeded) as excinfo:
+        check_rate_limit(client_id, "free")
+
+    # Rest of this window (60s) plus the decay of 5 previous requests to 4 (12s)
+    assert excinfo.value.retry_after == 72
+
+    mock_time.return_value += 72
+    check_rate_limit(client_id, "free")
+
+def test_gcra_spaces_requests_after_burst(mock_time, monkeypatch):
+    monkeypatch.setitem(TIER_ALGORITHMS, "free", "gcra")
+    client_id = "10.0.0.1"
+
+    for _ in range(5):
+        check_rate_limit(client_id, "free")
+
+    with pytest.raises(RateLimitExceeded) as excinfo:
+        check_rate_limit(client_id, "free")
+
+    # Emission interval is 60s / 5 = 12s
+    assert excinfo.value.retry_after == 12
+
+    mock_time.return_value += 12
+    check_rate_limit(client_id, "free")
+    with pytest.raises(RateLimitExceeded):
+        check_rate_limit(client_id, "free")
+
+def test_token_bucket_refills_continuously(mock_time, monkeypatch):
+    monkeypatch.setitem(TIER_ALGORITHMS, "pro", "token_bucket")
+    client_id = "secret-pro-key"
+
+    for _ in range(100):
+        check_rate_limit(client_id, "pro")
+    with pytest.raises(RateLimitExceeded):
+        check_rate_limit(client_id, "pro")
+
+    # 100 tokens per 60s -> 3 seconds refill 5 tokens
+    mock_time.return_value += 3
+    for _ in range(5):
+        check_rate_limit(client_id, "pro")
+    with pytest.raises(RateLimitExceeded):
+        check_rate_limit(client_id, "pro")
+
+def test_algorithms_selected_per_tier(mock_time, monkeypatch):
+    """
+    Tiers keep independent algorithms; changing one does not affect the other.
+    """
+    monkeypatch.setitem(TIER_ALGORITHMS, "free", "gcra")
+
+    for _ in range(5):
+        check_rate_limit("10.0.0.1", "free")
+    for _ in range(100):
+        check_rate_limit("secret-pro-key", "pro")
+
+    with pytest.raises(RateLimitExceeded) as excinfo:
+        check_rate_limit("10.0.0.1", "free")
+    assert excinfo.value.retry_after == 12
+
+    with pytest.raises(RateLimitExceeded) as excinfo:
+        check_rate_limit("secret-pro-key", "pro")
+    assert excinfo.value.retry_after == 60
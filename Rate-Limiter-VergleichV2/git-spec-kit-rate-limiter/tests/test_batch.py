@@ -0,0 +1,77 @@
+import time
+import pytest
+from unittest.mock import patch
+from src import main, rate_limiter
+from src.admission import PriorityAdmissionQueue
+from src.concurrency import AdaptiveConcurrencyLimiter
+from src.rate_limiter import rate_limit_store
+
+@pytest.fixture(autouse=True)
+def mock_expensive_computation():
+    with patch("src.main.expensive_computation") as computation:
+        yield computation
+
+def test_results_in_item_order(client):
+    texts = ["a", "bb", "ccc"]
+    response = client.post("/analyze/batch", json={"items": [{"text": text} for text in texts]})
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [result["text_length"] for result in results] == [1, 2, 3]
+    assert all(-1.0 <= result["sentiment_score"] <= 1.0 for result in results)
+
+def test_limiter_is_charged_once_with_the_item_count(client, mock_time):
+    response = client.post("/analyze/batch", json={"items": [{"text": "x"}] * 4})
+    assert response.status_code == 200
+    assert rate_limit_store["testclient"].request_count == 4
+
+    # The batch shares the main quota with single calls
+    assert client.post("/analyze", json={"text": "x"}).status_code == 200
+    assert client.post("/analyze", json={"text": "x"}).status_code == 429
+
+def test_micro_batches_call_the_computation_once_each(client, monkeypatch, mock_expensive_computation):
+    monkeypatch.setattr(main, "ANALYZE_MICRO_BATCH_SIZE", 2)
+    headers = {"x-api-key": "secret-pro-key"}
+    response = client.post("/analyze/batch", json={"items": [{"text": "x"}] * 5}, headers=headers)
+    assert response.status_code == 200
+    assert len(response.json()["results"]) == 5
+    assert mock_expensive_computation.call_count == 3
+
+def test_accepted_batch_waits_for_slots_instead_of_being_shed(client, monkeypatch, mock_expensive_computation):
+    # Two slots and no waiting room: the micro-batches must not shed each other
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=2, max_limit=2)
+    monkeypatch.setattr(main, "admission_queue", PriorityAdmissionQueue(limiter, max_depth=0))
+    monkeypatch.setattr(main, "ANALYZE_MICRO_BATCH_SIZE", 1)
+    monkeypatch.setattr(rate_limiter, "COMPUTE_BUDGET_MS", {"free": 60000})
+    mock_expensive_computation.side_effect = lambda: time.sleep(0.05)
+
+    response = client.post("/analyze/batch", json={"items": [{"text": "x"}] * 4})
+    assert response.status_code == 200
+    assert len(response.json()["results"]) == 4
+    assert mock_expensive_computation.call_count == 4
+    # The time of all four computations is charged to the compute budget
+    assert rate_limit_store["cpu:testclient"].request_count >= 200
+
+def test_compute_time_is_charged_when_a_micro_batch_fails(client, monkeypatch, mock_expensive_computation):
+    monkeypatch.setattr(main, "ANALYZE_MICRO_BATCH_SIZE", 1)
+    monkeypatch.setattr(rate_limiter, "COMPUTE_BUDGET_MS", {"free": 60000})
+
+    def computation():
+        # The first micro-batch runs, the second fails
+        if mock_expensive_computation.call_count == 2:
+            raise RuntimeError("model unavailable")
+        time.sleep(0.1)
+
+    mock_expensive_computation.side_effect = computation
+
+    with pytest.raises(RuntimeError):
+        client.post("/analyze/batch", json={"items": [{"text": "x"}] * 2})
+    assert rate_limit_store["cpu:testclient"].request_count >= 100
+
+def test_batch_over_the_quota_is_refused(client, mock_time):
+    response = client.post("/analyze/batch", json={"items": [{"text": "x"}] * 6})
+    assert response.status_code == 413
+    # Nothing was charged
+    assert "testclient" not in rate_limit_store
+
+def test_empty_batch_is_invalid(client):
+    assert client.post("/analyze/batch", json={"items": []}).status_code == 422
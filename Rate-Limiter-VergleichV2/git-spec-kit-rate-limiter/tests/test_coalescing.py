@@ -0,0 +1,76 @@
+import asyncio
+import httpx
+from unittest.mock import patch
+from src import main, metrics
+from src.coalescing import RequestCoalescer
+
+def recording_coalescer(max_batch_size=4, window=0.01):
+    batches = []
+
+    async def run_batch(items):
+        batches.append(items)
+        return [item * 2 for item in items]
+
+    return RequestCoalescer(run_batch, max_batch_size, window), batches
+
+def test_requests_within_the_window_run_together():
+    coalescer, batches = recording_coalescer()
+
+    async def scenario():
+        return await asyncio.gather(*(coalescer.submit(i) for i in range(3)))
+
+    assert asyncio.run(scenario()) == [0, 2, 4]
+    assert batches == [[0, 1, 2]]
+
+def test_full_batch_runs_without_waiting_for_the_window():
+    coalescer, batches = recording_coalescer(max_batch_size=2, window=10.0)
+
+    async def scenario():
+        return await asyncio.wait_for(asyncio.gather(*(coalescer.submit(i) for i in range(4))), 1.0)
+
+    assert asyncio.run(scenario()) == [0, 2, 4, 6]
+    assert batches == [[0, 1], [2, 3]]
+
+def test_requests_after_the_window_start_a_new_batch():
+    coalescer, batches = recording_coalescer(window=0.01)
+
+    async def scenario():
+        first = await coalescer.submit(1)
+        second = await coalescer.submit(2)
+        return first, second
+
+    assert asyncio.run(scenario()) == (2, 4)
+    assert batches == [[1], [2]]
+
+def test_failure_reaches_every_request_of_the_batch():
+    async def run_batch(items):
+        raise RuntimeError("model unavailable")
+
+    coalescer = RequestCoalescer(run_batch, window=0.01)
+
+    async def scenario():
+        return await asyncio.gather(coalescer.submit(1), coalescer.submit(2), return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+def test_integration_concurrent_requests_share_one_computation(monkeypatch):
+    coalescer = RequestCoalescer(main.analyze_coalesced, max_batch_size=8, window=0.05)
+    monkeypatch.setattr(main, "analysis_coalescer", coalescer)
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            headers = {"x-api-key": "secret-pro-key"}
+            return await asyncio.gather(*(
+                client.post("/analyze", json={"text": "x" * length}, headers=headers) for length in (1, 2, 3)
+            ))
+
+    observed = metrics.analyze_batch_size.count, metrics.analyze_batch_size.sum
+    with patch("src.main.expensive_computation") as computation:
+        responses = asyncio.run(scenario())
+    assert [response.status_code for response in responses] == [200, 200, 200]
+    assert [response.json()["text_length"] for response in responses] == [1, 2, 3]
+    assert computation.call_count == 1
+    # One computation of three texts
+    assert (metrics.analyze_batch_size.count, metrics.analyze_batch_size.sum) == (observed[0] + 1, observed[1] + 3)
@@ -0,0 +1,76 @@
+import pytest
+from unittest.mock import patch
+from src import rate_limiter
+from src.leases import LeasingBackend
+from src.rate_limiter import (
+    check_rate_limit, charge_compute_time, compute_budgets, InMemoryBackend, RateLimitExceeded, rate_limit_store,
+)
+from src.store import RateLimitStore
+
+@pytest.fixture
+def budgets(monkeypatch):
+    monkeypatch.setattr(rate_limiter, "COMPUTE_BUDGET_MS", {"pro": 5000})
+
+def admitted_requests(client_id: str, seconds: float) -> int:
+    admitted = 0
+    while True:
+        try:
+            check_rate_limit(client_id, "pro")
+        except RateLimitExceeded:
+            return admitted
+        charge_compute_time(client_id, "pro", seconds)
+        admitted += 1
+
+def test_compute_budgets():
+    assert compute_budgets("free=2, pro=60") == {"free": 2000, "pro": 60000}
+    assert compute_budgets("") == {}
+    with pytest.raises(ValueError):
+        compute_budgets("free")
+
+def test_slow_requests_are_throttled_harder(mock_time, budgets):
+    # 5 seconds per window: requests are admitted until the budget is spent
+    assert admitted_requests("key-slow", 0.8) == 7
+    assert admitted_requests("key-fast", 0.2) == 25
+
+def test_charges_are_not_lost_with_leases(mock_time, budgets, monkeypatch):
+    shared = InMemoryBackend(RateLimitStore())
+    monkeypatch.setattr(rate_limiter, "rate_limit_backend", LeasingBackend(shared, lease_fraction=0.1))
+    # The leases cover only part of each charge, the rest is taken from the shared budget
+    assert admitted_requests("key-slow", 0.8) == 7
+
+def test_budget_refills_with_the_window(mock_time, budgets):
+    admitted_requests("key-a", 0.8)
+    with pytest.raises(RateLimitExceeded) as excinfo:
+        check_rate_limit("key-a", "pro")
+    assert excinfo.value.retry_after == 60
+
+    mock_time.return_value += 60
+    check_rate_limit("key-a", "pro")
+
+def test_rejected_by_compute_budget_consumes_no_request_quota(mock_time, budgets):
+    check_rate_limit("key-a", "pro")
+    charge_compute_time("key-a", "pro", 10.0)
+    with pytest.raises(RateLimitExceeded):
+        check_rate_limit("key-a", "pro")
+    assert rate_limit_store["key-a"].request_count == 1
+
+def test_tiers_without_budget(mock_time, budgets):
+    check_rate_limit("10.0.0.1", "free")
+    charge_compute_time("10.0.0.1", "free", 10.0)
+    assert "cpu:10.0.0.1" not in rate_limit_store
+
+def test_integration_processing_time_is_charged(client, mock_time, monkeypatch):
+    monkeypatch.setattr(rate_limiter, "COMPUTE_BUDGET_MS", {"free": 2000})
+
+    def slow_computation():
+        mock_time.return_value += 0.8
+
+    with patch("src.main.expensive_computation", side_effect=slow_computation):
+        # 0.8s each out of 2s, although the request quota allows 5
+        # Different texts, so none is answered from the result cache
+        for i in range(3):
+            response = client.post("/analyze", json={"text": f"test {i}"})
+            assert response.status_code == 200
+        response = client.post("/analyze", json={"text": "test 3"})
+        assert response.status_code == 429
+    assert rate_limit_store["testclient"].request_count == 3
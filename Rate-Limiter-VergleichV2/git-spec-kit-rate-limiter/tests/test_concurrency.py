@@ -0,0 +1,104 @@
+import asyncio
+import threading
+import httpx
+import pytest
+from unittest.mock import patch
+from src import main
+from src.admission import PriorityAdmissionQueue
+from src.concurrency import AdaptiveConcurrencyLimiter, ConcurrencyLimitExceeded
+
+@pytest.fixture
+def clock():
+    with patch("src.concurrency.time.monotonic") as monotonic:
+        monotonic.return_value = 100.0
+        yield monotonic
+
+def test_sheds_requests_over_the_limit(clock):
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=2, latency_threshold=1.0)
+    limiter.acquire()
+    limiter.acquire()
+
+    with pytest.raises(ConcurrencyLimitExceeded) as excinfo:
+        limiter.acquire()
+    assert excinfo.value.retry_after >= 1
+    assert limiter.stats()["rejected"] == 1
+
+def test_additive_increase_while_saturated_and_fast(clock):
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=2, max_limit=3, latency_threshold=1.0)
+    for _ in range(10):
+        first, second = limiter.acquire(), limiter.acquire()
+        clock.return_value += 0.1
+        limiter.release(first)
+        limiter.release(second)
+    assert limiter.stats()["limit"] == 3  # capped at max_limit
+
+def test_no_increase_without_load(clock):
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=4)
+    for _ in range(20):
+        limiter.release(limiter.acquire())
+    assert limiter.limit == 4
+
+def test_multiplicative_decrease_once_per_overload(clock):
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=10, latency_threshold=1.0, backoff=0.5)
+    slow = [limiter.acquire() for _ in range(4)]
+    clock.return_value += 2.0
+    for started in slow:
+        limiter.release(started)
+    # All four were slow for the same reason
+    assert limiter.stats()["limit"] == 5
+
+    started = limiter.acquire()
+    clock.return_value += 2.0
+    limiter.release(started)
+    assert limiter.stats()["limit"] == 2
+
+def test_failures_shrink_the_limit_and_free_the_slot(clock):
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=4, min_limit=2, backoff=0.5)
+    for _ in range(3):
+        with pytest.raises(RuntimeError):
+            with limiter.slot():
+                clock.return_value += 0.1
+                raise RuntimeError("computation failed")
+    assert limiter.stats() == {"limit": 2, "in_flight": 0, "rejected": 0, "average_latency": pytest.approx(0.3, abs=0.1)}
+
+def test_integration_overload_returns_503(client, monkeypatch):
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=1)
+    # No room to wait either
+    monkeypatch.setattr(main, "admission_queue", PriorityAdmissionQueue(limiter, max_depth=0))
+    limiter.acquire()  # a computation still running
+
+    with patch("src.main.expensive_computation"):
+        response = client.post("/analyze", json={"text": "test"})
+    assert response.status_code == 503
+    assert int(response.headers["Retry-After"]) >= 1
+
+def test_integration_computations_run_concurrently_and_overflow_is_shed(monkeypatch):
+    """
+    The computation runs off the event loop, so requests overlap up to the
+    limit and the next one is shed instead of queuing behind the loop.
+    """
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=2, max_limit=2)
+    monkeypatch.setattr(main, "admission_queue", PriorityAdmissionQueue(limiter, max_depth=0))
+    release = threading.Event()
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            headers = {"x-api-key": "secret-pro-key"}
+            running = [
+                asyncio.create_task(client.post("/analyze", json={"text": f"text {i}"}, headers=headers))
+                for i in range(2)
+            ]
+            for _ in range(200):
+                if limiter.in_flight == 2:
+                    break
+                await asyncio.sleep(0.01)
+            assert limiter.in_flight == 2
+            shed = await client.post("/analyze", json={"text": "text 2"}, headers=headers)
+            release.set()
+            return shed, await asyncio.gather(*running)
+
+    with patch("src.main.expensive_computation", side_effect=lambda: release.wait(5)):
+        shed, responses = asyncio.run(scenario())
+    assert shed.status_code == 503
+    assert [response.status_code for response in responses] == [200, 200]
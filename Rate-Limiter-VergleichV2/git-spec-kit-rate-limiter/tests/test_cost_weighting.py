@@ -0,0 +1,83 @@
+import pytest
+from fastapi.testclient import TestClient
+from unittest.mock import patch
+from src import rate_limiter
+from src.main import app
+from src.middleware import RateLimitMiddleware
+from src.rate_limiter import check_rate_limit, RateLimitExceeded, rate_limit_store, request_cost
+
+def test_request_cost():
+    assert request_cost("") == 1
+    assert request_cost("x" * 1000) == 1
+    assert request_cost("x" * 1001) == 2
+    assert request_cost("x" * 100_000) == 100
+
+def test_language_cost_factors(monkeypatch):
+    monkeypatch.setitem(rate_limiter.LANGUAGE_COST_FACTORS, "en", 2.0)
+    assert request_cost("x" * 1000, "en") == 2
+    assert request_cost("x" * 1000, "de") == 1
+
+def test_multi_unit_request_is_all_or_nothing(mock_time):
+    check_rate_limit("10.0.0.1", "free", units=4)
+
+    # 2 units do not fit into the single unit left, and none are taken
+    with pytest.raises(RateLimitExceeded):
+        check_rate_limit("10.0.0.1", "free", units=2)
+    assert rate_limit_store["10.0.0.1"].request_count == 4
+
+    check_rate_limit("10.0.0.1", "free", units=1)
+    with pytest.raises(RateLimitExceeded):
+        check_rate_limit("10.0.0.1", "free", units=1)
+
+def test_cost_is_capped_at_the_budget(mock_time):
+    check_rate_limit("10.0.0.1", "free", units=100)
+    assert rate_limit_store["10.0.0.1"].request_count == 5
+
+@pytest.mark.parametrize("algorithm", ["sliding_window", "gcra", "token_bucket"])
+def test_large_payloads_exhaust_quota_proportionally(mock_time, monkeypatch, algorithm):
+    monkeypatch.setitem(rate_limiter.TIER_ALGORITHMS, "pro", algorithm)
+    admitted = 0
+    while True:
+        try:
+            check_rate_limit("key-a", "pro", units=request_cost("x" * 10_000))
+        except RateLimitExceeded:
+            break
+        admitted += 1
+    # 10 units each out of 100
+    assert admitted == 10
+
+def test_integration_large_texts_use_more_quota(client):
+    with patch("src.main.expensive_computation"):
+        for _ in range(2):
+            response = client.post("/analyze", json={"text": "x" * 2000})
+            assert response.status_code == 200
+
+        response = client.post("/analyze", json={"text": "x" * 2000})
+        assert response.status_code == 429
+
+        # The unit left is enough for a short text
+        response = client.post("/analyze", json={"text": "short"})
+        assert response.status_code == 200
+
+def test_integration_middleware_charges_the_rest_after_parsing():
+    client = TestClient(RateLimitMiddleware(app, paths=["/analyze"]))
+    with patch("src.main.expensive_computation"):
+        for _ in range(2):
+            response = client.post("/analyze", json={"text": "x" * 2000})
+            assert response.status_code == 200
+
+        # Admitted by the middleware (1 unit), rejected once the cost is known;
+        # the middleware's unit is given back
+        response = client.post("/analyze", json={"text": "x" * 2000})
+        assert response.status_code == 429
+    assert rate_limit_store["testclient"].request_count == 4
+    assert rate_limit_store.pinned[rate_limiter.GLOBAL_KEY].request_count == 4
+
+def test_integration_middleware_admits_text_costing_more_than_the_quota(mock_time):
+    client = TestClient(RateLimitMiddleware(app, paths=["/analyze"]))
+    with patch("src.main.expensive_computation"):
+        # 20 units, charged as the whole quota of 5 like without the middleware
+        response = client.post("/analyze", json={"text": "x" * 20_000})
+        assert response.status_code == 200
+        assert rate_limit_store["testclient"].request_count == 5
+        assert client.post("/analyze", json={"text": "x"}).status_code == 429
@@ -0,0 +1,85 @@
+import asyncio
+import threading
+import pytest
+from unittest.mock import patch
+from src import main
+from src.concurrency import ConcurrencyLimitExceeded
+from src.executor import ComputationPool
+
+def test_runs_work_in_a_worker_thread():
+    pool = ComputationPool("thread", workers=2)
+    try:
+        name = asyncio.run(pool.run(lambda: threading.current_thread().name))
+    finally:
+        pool.shutdown()
+    assert name.startswith("computation")
+    assert pool.pending == 0
+
+def test_event_loop_keeps_running_while_work_runs():
+    pool = ComputationPool("thread", workers=1)
+    release = threading.Event()
+
+    async def scenario():
+        work = asyncio.create_task(pool.run(release.wait, 5))
+        # The loop is free: this coroutine runs while the worker blocks
+        await asyncio.sleep(0.01)
+        assert pool.pending == 1
+        release.set()
+        assert await work is True
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        pool.shutdown()
+
+def test_full_queue_is_rejected():
+    pool = ComputationPool("thread", workers=1, max_queue=1)
+    release = threading.Event()
+
+    async def scenario():
+        running = asyncio.create_task(pool.run(release.wait, 5))
+        queued = asyncio.create_task(pool.run(release.wait, 5))
+        await asyncio.sleep(0)
+        with pytest.raises(ConcurrencyLimitExceeded):
+            await pool.run(release.wait, 5)
+        release.set()
+        await asyncio.gather(running, queued)
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        pool.shutdown()
+    assert pool.stats()["rejected"] == 1
+
+def test_shut_down_pool_starts_again():
+    pool = ComputationPool("thread", workers=1)
+    assert asyncio.run(pool.run(sum, [1, 2])) == 3
+    pool.shutdown()
+    assert asyncio.run(pool.run(sum, [3, 4])) == 7
+    pool.shutdown()
+
+def test_process_pool_runs_picklable_work():
+    pool = ComputationPool("process", workers=1)
+    try:
+        assert asyncio.run(pool.run(pow, 2, 10)) == 1024
+    finally:
+        pool.shutdown()
+
+def test_unknown_kind_is_rejected():
+    with pytest.raises(ValueError):
+        ComputationPool("fiber")
+
+def test_pool_configured_from_env(monkeypatch):
+    monkeypatch.setenv("COMPUTE_EXECUTOR", "process")
+    monkeypatch.setenv("COMPUTE_WORKERS", "3")
+    monkeypatch.setenv("COMPUTE_QUEUE", "5")
+    pool = ComputationPool.from_env()
+    assert (pool.kind, pool.workers, pool.max_queue) == ("process", 3, 5)
+
+def test_integration_full_pool_returns_503(client, monkeypatch):
+    pool = ComputationPool("thread", workers=0, max_queue=0)
+    monkeypatch.setattr(main, "computation_pool", pool)
+    with patch("src.main.expensive_computation"):
+        response = client.post("/analyze", json={"text": "hello"})
+    assert response.status_code == 503
+    assert "Retry-After" in response.headers
@@ -0,0 +1,93 @@
+import random
+import pytest
+from unittest.mock import patch
+from src import heavy_hitters, main
+from src.heavy_hitters import HeavyHitterTracker, SpaceSaving
+from src.key_registry import hash_key
+from src.rate_limiter import check_rate_limit, RateLimitExceeded
+
+@pytest.fixture
+def trackers(monkeypatch):
+    clients, ips = HeavyHitterTracker(capacity=8), HeavyHitterTracker(capacity=8)
+    monkeypatch.setattr(heavy_hitters, "heavy_clients", clients)
+    monkeypatch.setattr(heavy_hitters, "heavy_ips", ips)
+    return clients, ips
+
+def test_space_saving_finds_heavy_keys_in_fixed_memory():
+    summary = SpaceSaving(capacity=20)
+    rng = random.Random(1)
+    stream = ["heavy-1"] * 3000 + ["heavy-2"] * 2000 + [f"light-{rng.randrange(5000)}" for _ in range(5000)]
+    rng.shuffle(stream)
+    for key in stream:
+        summary.add(key)
+
+    assert len(summary.counters) == 20
+    top = sorted(summary.counters.items(), key=lambda item: -item[1][0])[:2]
+    assert [key for key, _ in top] == ["heavy-1", "heavy-2"]
+    for key, (count, error, _) in top:
+        # Never too low, too high by at most the error
+        assert count - error <= stream.count(key) <= count
+
+def test_deny_ratio_over_rolling_windows():
+    tracker = HeavyHitterTracker(capacity=4, window=60, windows=3)
+    for _ in range(10):
+        tracker.record("key-a", False, 1000.0)
+    for denied in (False, True, True, True):
+        tracker.record("key-a", denied, 1070.0)
+    tracker.record("key-b", False, 1070.0)
+
+    assert tracker.top(1070.0, k=1) == [{"key": "key-a", "requests": 4, "error": 0, "deny_ratio": 0.75}]
+    assert tracker.top(1070.0, k=1, windows=2)[0] == {"key": "key-a", "requests": 14, "error": 0, "deny_ratio": 0.214}
+    # Windows start on the minute: 960, 1020, 1140 and 1200
+    tracker.record("key-b", False, 1150.0)
+    assert [entry["key"] for entry in tracker.top(1150.0, windows=3)] == ["key-a", "key-b"]
+    tracker.record("key-b", False, 1210.0)
+    assert [entry["key"] for entry in tracker.top(1210.0, windows=3)] == ["key-b"]
+
+def test_merged_counts_stay_upper_bounds():
+    tracker = HeavyHitterTracker(capacity=2, window=60, windows=2)
+    # key-a is evicted from the first window by two newer keys
+    for key in ["key-a", "key-b", "key-b", "key-c", "key-c"]:
+        tracker.record(key, False, 1000.0)
+    for _ in range(3):
+        tracker.record("key-a", False, 1060.0)
+
+    entry = {entry["key"]: entry for entry in tracker.top(1060.0, windows=2)}["key-a"]
+    # 4 requests in truth; the first window may have had up to 2 more
+    assert (entry["requests"], entry["error"]) == (5, 2)
+    assert entry["requests"] - entry["error"] <= 4 <= entry["requests"]
+
+def test_fed_by_rate_limit_decisions(mock_time, trackers):
+    clients, ips = trackers
+    for _ in range(7):
+        try:
+            check_rate_limit("10.0.0.1", "free", ip="10.0.0.1")
+        except RateLimitExceeded:
+            pass
+    check_rate_limit("key-a", "pro", ip="10.0.0.1")
+
+    assert clients.top(1000.0) == [
+        {"key": "10.0.0.1", "requests": 7, "error": 0, "deny_ratio": 0.286},
+        {"key": "key-a", "requests": 1, "error": 0, "deny_ratio": 0.0},
+    ]
+    assert ips.top(1000.0) == [{"key": "10.0.0.1", "requests": 8, "error": 0, "deny_ratio": 0.25}]
+
+def test_integration_admin_endpoint(client, mock_time, trackers, monkeypatch):
+    monkeypatch.setattr(main, "ADMIN_TOKEN", "secret")
+    check_rate_limit("my-api-key", "pro", ip="10.0.0.1")
+    with patch("src.main.expensive_computation"):
+        client.post("/analyze", json={"text": "test"})
+
+    assert client.get("/admin/heavy-hitters").status_code == 403
+    assert client.get("/admin/heavy-hitters", headers={"X-Admin-Token": "wrong"}).status_code == 403
+
+    response = client.get("/admin/heavy-hitters", headers={"X-Admin-Token": "secret"})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["window_seconds"] == 60
+    # API keys are only shown hashed
+    assert [entry["key"] for entry in body["clients"]] == [hash_key("my-api-key"), hash_key("testclient")]
+    assert [entry["key"] for entry in body["ips"]] == ["10.0.0.1", "testclient"]
+
+def test_integration_admin_endpoint_disabled_without_token(client):
+    assert client.get("/admin/heavy-hitters", headers={"X-Admin-Token": ""}).status_code == 403
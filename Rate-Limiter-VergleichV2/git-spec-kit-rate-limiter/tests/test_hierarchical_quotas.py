@@ -0,0 +1,67 @@
+import asyncio
+import pytest
+from src import rate_limiter
+from src.algorithms import get_algorithm
+from src.backend import QuotaCheck
+from src.rate_limiter import check_rate_limit, RateLimitExceeded, rate_limit_store
+from src.shared_memory_backend import SharedMemoryBackend
+
+def test_rejected_by_ip_consumes_no_client_quota(mock_time, monkeypatch):
+    monkeypatch.setattr(rate_limiter, "LIMIT_IP", 3)
+    for _ in range(3):
+        check_rate_limit("key-a", "pro", ip="10.0.0.1")
+
+    # Another key behind the same IP address
+    with pytest.raises(RateLimitExceeded) as excinfo:
+        check_rate_limit("key-b", "pro", ip="10.0.0.1")
+    assert excinfo.value.retry_after == 60
+    assert "key-b" not in rate_limit_store
+    assert rate_limit_store["key-a"].request_count == 3
+
+def test_rejected_by_client_consumes_no_ip_or_global_quota(mock_time):
+    for _ in range(5):
+        check_rate_limit("10.0.0.1", "free", ip="10.0.0.1")
+    for _ in range(3):
+        with pytest.raises(RateLimitExceeded):
+            check_rate_limit("10.0.0.1", "free", ip="10.0.0.1")
+
+    assert rate_limit_store["ip:10.0.0.1"].request_count == 5
+    assert rate_limit_store.pinned[rate_limiter.GLOBAL_KEY].request_count == 5
+
+def test_global_quota_caps_all_clients(mock_time, monkeypatch):
+    monkeypatch.setattr(rate_limiter, "LIMIT_GLOBAL", 7)
+    for i in range(7):
+        check_rate_limit(f"10.0.0.{i}", "free", ip=f"10.0.0.{i}")
+
+    with pytest.raises(RateLimitExceeded):
+        check_rate_limit("10.0.0.99", "free", ip="10.0.0.99")
+    assert "10.0.0.99" not in rate_limit_store
+
+    # The global state is pinned, it is neither evicted nor counted as a client
+    assert len(rate_limit_store) == 14
+
+def test_disabled_levels(mock_time, monkeypatch):
+    monkeypatch.setattr(rate_limiter, "LIMIT_IP", None)
+    monkeypatch.setattr(rate_limiter, "LIMIT_GLOBAL", None)
+    check_rate_limit("10.0.0.1", "free", ip="10.0.0.1")
+    assert list(rate_limit_store) == ["10.0.0.1"]
+    assert rate_limit_store.pinned == {}
+
+def test_backend_default_gives_back_units_of_admitting_levels(tmp_path):
+    """
+    Backends without a single-pass check refund the levels taken before the rejecting one.
+    """
+    backend = SharedMemoryBackend(str(tmp_path / "limits.shm"), buckets=16)
+    algorithm = get_algorithm("fixed_window")
+    checks = [
+        QuotaCheck("key-a", algorithm, 5, 60),
+        QuotaCheck("ip:10.0.0.1", algorithm, 2, 60),
+    ]
+    assert backend.acquire_all(checks, 1000.0) == 0
+    assert backend.acquire_all(checks, 1000.0) == 0
+    assert backend.acquire_all(checks, 1000.0) == 60
+    assert asyncio.run(backend.acquire_all_async(checks, 1000.0)) == 60
+
+    # Only the two admitted requests count on the client level
+    assert backend.take("key-a", algorithm, 1000.0, 5, 60, 0, 5) == (3, 0.0)
+    backend.close()
@@ -0,0 +1,148 @@
+import asyncio
+import time
+import pytest
+from fastapi.testclient import TestClient
+from unittest.mock import patch
+from src import main
+from src.admission import PriorityAdmissionQueue
+from src.concurrency import AdaptiveConcurrencyLimiter, ConcurrencyLimitExceeded
+from src.jobs import DONE, FAILED, Job, JobRunner, JobTable, SQLiteJobTable
+
+async def double(payload):
+    await asyncio.sleep(0)
+    return {"value": payload * 2}
+
+async def run_until_finished(runner, jobs, timeout=1.0):
+    worker = asyncio.create_task(runner.run())
+    deadline = time.monotonic() + timeout
+    while not all(job.finished for job in jobs) and time.monotonic() < deadline:
+        await asyncio.sleep(0.005)
+    worker.cancel()
+
+def test_submitted_jobs_are_processed():
+    runner = JobRunner(JobTable(), double, workers=2)
+
+    async def scenario():
+        jobs = [runner.submit(i) for i in range(3)]
+        await run_until_finished(runner, jobs)
+        return jobs
+
+    jobs = asyncio.run(scenario())
+    assert [job.status for job in jobs] == [DONE] * 3
+    assert [job.result["value"] for job in jobs] == [0, 2, 4]
+    assert all(job.submitted_at <= job.started_at <= job.finished_at for job in jobs)
+    assert runner.get(jobs[0].id) is jobs[0]
+
+def test_failed_job_keeps_the_reason():
+    async def overloaded(payload):
+        raise ConcurrencyLimitExceeded(retry_after=1)
+
+    runner = JobRunner(JobTable(), overloaded)
+
+    async def scenario():
+        job = runner.submit(None)
+        await run_until_finished(runner, [job])
+        return job
+
+    job = asyncio.run(scenario())
+    assert (job.status, job.error) == (FAILED, "Service overloaded")
+
+def test_full_queue_is_refused():
+    runner = JobRunner(JobTable(), double, max_queued=1)
+    runner.submit(1)
+    with pytest.raises(ConcurrencyLimitExceeded):
+        runner.submit(2)
+
+def test_finished_jobs_expire():
+    table = JobTable()
+    runner = JobRunner(table, double, ttl=60.0)
+    now = time.time()
+    table.save(Job("old", status=DONE, submitted_at=now - 100, finished_at=now - 61))
+    table.save(Job("recent", status=DONE, submitted_at=now - 100, finished_at=now - 59))
+    table.save(Job("waiting", submitted_at=now - 100))
+    assert runner.get("old") is None
+    assert runner.get("recent") is not None
+    assert table.expire(now - 60) == 1
+    assert len(table) == 2
+
+def test_sqlite_table_survives_a_restart(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    table = SQLiteJobTable(path)
+    table.save(Job("done", status=DONE, submitted_at=1.0, started_at=2.0, finished_at=3.0, result={"value": 1}))
+    table.save(Job("queued", submitted_at=1.0))
+    table.close()
+
+    restarted = SQLiteJobTable(path)
+    assert restarted.get("done") == Job("done", status=DONE, submitted_at=1.0, started_at=2.0, finished_at=3.0, result={"value": 1})
+    # Its text is gone, so it cannot run anymore
+    assert (restarted.get("queued").status, restarted.get("queued").error) == (FAILED, "Interrupted by restart")
+    assert restarted.expire(time.time() + 1) == 2
+    restarted.close()
+    assert len(SQLiteJobTable(path)) == 0
+
+def test_analysis_jobs_wait_for_a_slot_instead_of_failing(monkeypatch):
+    # Interactive requests would give up after 50ms, and nobody may queue
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=1, max_limit=1)
+    queue = PriorityAdmissionQueue(limiter, max_depth=0, timeout=0.05)
+    monkeypatch.setattr(main, "admission_queue", queue)
+
+    async def scenario():
+        held = await queue.acquire("free")  # a computation still running
+        job = asyncio.create_task(main.run_analysis_job(("Ein langer Text", "de", "free", None)))
+        await asyncio.sleep(0.2)
+        assert not job.done()
+        queue.release(held)
+        return await job
+
+    with patch("src.main.expensive_computation"):
+        result = asyncio.run(scenario())
+    assert result["text_length"] == len("Ein langer Text")
+    assert queue.stats() == {"waiting": 0, "rejected": 0, "expired": 0}
+
+def test_job_slot_timeout_can_be_configured(monkeypatch):
+    queue = PriorityAdmissionQueue(AdaptiveConcurrencyLimiter(initial_limit=1, max_limit=1), timeout=60.0)
+    monkeypatch.setattr(main, "admission_queue", queue)
+    monkeypatch.setattr(main, "ANALYZE_JOB_SLOT_TIMEOUT", 0.05)
+
+    async def scenario():
+        await queue.acquire("free")
+        await main.run_analysis_job(("Ein anderer Text", "de", "free", None))
+
+    with pytest.raises(ConcurrencyLimitExceeded):
+        asyncio.run(scenario())
+
+def test_integration_submit_poll_and_fetch_result(monkeypatch):
+    monkeypatch.setattr(main, "analysis_jobs", JobRunner(JobTable(), main.run_analysis_job))
+    with patch("src.main.expensive_computation"), TestClient(main.app) as client:
+        response = client.post("/analyze/jobs", json={"text": "Ein langer Text"})
+        assert response.status_code == 202
+        job_id = response.json()["job_id"]
+        assert response.headers["Location"] == f"/analyze/jobs/{job_id}"
+
+        deadline = time.monotonic() + 2.0
+        while time.monotonic() < deadline:
+            status = client.get(f"/analyze/jobs/{job_id}").json()
+            if status["status"] == DONE:
+                break
+            time.sleep(0.01)
+        assert status["status"] == DONE
+        assert status["queue_seconds"] >= 0 and status["run_seconds"] >= 0
+
+        result = client.get(f"/analyze/jobs/{job_id}/result")
+        assert result.status_code == 200
+        assert result.json()["text_length"] == len("Ein langer Text")
+        assert result.json() == status["result"]
+
+def test_integration_unknown_and_unfinished_jobs(client, monkeypatch):
+    # Not started with the application, so jobs stay queued
+    monkeypatch.setattr(main, "analysis_jobs", JobRunner(JobTable(), main.run_analysis_job))
+    job_id = client.post("/analyze/jobs", json={"text": "x"}).json()["job_id"]
+    response = client.get(f"/analyze/jobs/{job_id}/result")
+    assert (response.status_code, response.json()["detail"]) == (409, "Job is queued")
+    assert client.get("/analyze/jobs/unknown").status_code == 404
+
+def test_integration_submission_is_rate_limited(client, mock_time, monkeypatch):
+    monkeypatch.setattr(main, "analysis_jobs", JobRunner(JobTable(), main.run_analysis_job))
+    for i in range(5):
+        assert client.post("/analyze/jobs", json={"text": f"text {i}"}).status_code == 202
+    assert client.post("/analyze/jobs", json={"text": "text 5"}).status_code == 429
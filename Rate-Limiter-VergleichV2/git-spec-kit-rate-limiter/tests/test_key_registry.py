@@ -0,0 +1,89 @@
+import os
+import sqlite3
+import pytest
+from unittest.mock import patch
+from src import key_registry
+from src.key_registry import ApiKeyRecord, KeyRegistry, hash_key
+
+def write_keys(path, lines, mtime_ns=None):
+    path.write_text("\n".join(lines) + "\n")
+    if mtime_ns is not None:
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+
+def test_default_registry_knows_only_the_builtin_pro_key():
+    registry = KeyRegistry()
+    assert registry.lookup("secret-pro-key") == ApiKeyRecord(tier="pro")
+    assert registry.lookup("guessed-key") is None
+
+def test_key_file_stores_only_hashes(tmp_path):
+    path = tmp_path / "keys.txt"
+    write_keys(path, [
+        "# sha256 tier [limit]",
+        f"{hash_key('key-a')} pro",
+        f"{hash_key('key-b')} pro 1000",
+        "",
+    ])
+    registry = KeyRegistry(str(path))
+
+    assert len(registry) == 2
+    assert "key-a" not in registry._state[0]
+    assert registry.lookup("key-a") == ApiKeyRecord(tier="pro")
+    assert registry.lookup("key-b") == ApiKeyRecord(tier="pro", limit=1000)
+    assert registry.lookup("secret-pro-key") is None
+
+def test_malformed_key_file(tmp_path):
+    path = tmp_path / "keys.txt"
+    write_keys(path, ["not-a-hash pro"])
+    with pytest.raises(ValueError):
+        KeyRegistry(str(path))
+
+def test_sqlite_key_table(tmp_path):
+    path = tmp_path / "keys.db"
+    connection = sqlite3.connect(path)
+    connection.execute("CREATE TABLE api_keys (key_hash TEXT PRIMARY KEY, tier TEXT NOT NULL, rate_limit INTEGER)")
+    connection.execute("INSERT INTO api_keys VALUES (?, 'pro', NULL)", (hash_key("key-a"),))
+    connection.execute("INSERT INTO api_keys VALUES (?, 'pro', 20)", (hash_key("key-b"),))
+    connection.commit()
+    connection.close()
+
+    registry = KeyRegistry(str(path))
+    assert registry.lookup("key-a") == ApiKeyRecord(tier="pro")
+    assert registry.lookup("key-b") == ApiKeyRecord(tier="pro", limit=20)
+
+def test_reload_swaps_key_set_and_cache(tmp_path):
+    path = tmp_path / "keys.txt"
+    write_keys(path, [f"{hash_key('key-a')} pro"], mtime_ns=1_000_000_000)
+    registry = KeyRegistry(str(path))
+    assert registry.lookup("key-a") is not None  # now cached
+
+    assert registry.reload_if_changed() is False
+
+    write_keys(path, [f"{hash_key('key-b')} pro"], mtime_ns=2_000_000_000)
+    assert registry.reload_if_changed() is True
+    assert registry.lookup("key-a") is None
+    assert registry.lookup("key-b") == ApiKeyRecord(tier="pro")
+
+def test_lru_cache_is_bounded():
+    registry = KeyRegistry(cache_size=2)
+    for key in ["a", "b", "secret-pro-key", "c"]:
+        registry.lookup(key)
+    assert list(registry._state[1]) == ["secret-pro-key", "c"]
+
+def test_registered_key_quota_applies_to_requests(tmp_path, client, monkeypatch):
+    path = tmp_path / "keys.txt"
+    write_keys(path, [f"{hash_key('key-a')} pro 3"])
+    monkeypatch.setattr(key_registry, "api_key_registry", KeyRegistry(str(path)))
+
+    headers = {"x-api-key": "key-a"}
+    with patch("src.main.expensive_computation"):
+        for _ in range(3):
+            response = client.post("/analyze", json={"text": "test"}, headers=headers)
+            assert response.status_code == 200
+            assert response.json()["status"] == "Processed for pro tier"
+
+        response = client.post("/analyze", json={"text": "test"}, headers=headers)
+        assert response.status_code == 429
+
+        # The old hardcoded key is no longer known
+        response = client.post("/analyze", json={"text": "test"}, headers={"x-api-key": "secret-pro-key"})
+        assert response.json()["status"] == "Processed for free tier"
@@ -0,0 +1,120 @@
+import asyncio
+import pytest
+from src.algorithms import get_algorithm
+from src.backend import QuotaCheck
+from src.leases import LeasingBackend
+from src.rate_limiter import InMemoryBackend
+from src.store import RateLimitStore
+
+@pytest.fixture
+def shared():
+    return InMemoryBackend(RateLimitStore())
+
+def test_requests_are_decided_from_local_lease(shared):
+    """
+    With 10% leases a pro client needs one shared backend call per 10 requests.
+    """
+    worker = LeasingBackend(shared, lease_fraction=0.1)
+    algorithm = get_algorithm("fixed_window")
+
+    for _ in range(100):
+        assert worker.acquire("secret-pro-key", algorithm, 1000.0, 100, 60) == 0
+    assert worker.acquire("secret-pro-key", algorithm, 1000.0, 100, 60) > 0
+
+    assert worker.stats()["remote_calls"] == 11
+    assert worker.stats()["local_decisions"] == 90
+
+@pytest.mark.parametrize("name", ["fixed_window", "sliding_window", "gcra", "token_bucket"])
+def test_workers_never_exceed_shared_limit(shared, name):
+    algorithm = get_algorithm(name)
+    workers = [LeasingBackend(shared, lease_fraction=0.1) for _ in range(3)]
+
+    admitted = sum(
+        1 for i in range(300)
+        if workers[i % 3].acquire("secret-pro-key", algorithm, 1020.0, 100, 60) == 0
+    )
+    assert admitted <= 100
+
+def test_expired_lease_is_refunded(shared):
+    algorithm = get_algorithm("fixed_window")
+    worker_a = LeasingBackend(shared, lease_fraction=0.5, lease_seconds=5.0)
+    worker_b = LeasingBackend(shared, lease_fraction=0.5, lease_seconds=5.0)
+
+    # A leases 5 units but uses only one, B takes the other 5
+    assert worker_a.acquire("10.0.0.1", algorithm, 1000.0, 10, 60) == 0
+    for _ in range(5):
+        assert worker_b.acquire("10.0.0.1", algorithm, 1000.0, 10, 60) == 0
+    worker_b.leases.clear()
+    assert worker_b.acquire("10.0.0.1", algorithm, 1001.0, 10, 60) > 0
+
+    # Once A's lease ran out, the reconciler gives its 4 unused units back
+    assert asyncio.run(worker_a.reconcile(1006.0)) == 1
+    assert worker_a.stats()["refunded_units"] == 4
+    admitted = sum(1 for _ in range(10) if worker_b.acquire("10.0.0.1", algorithm, 1006.0, 10, 60) == 0)
+    assert admitted == 4
+
+def test_reconcile_tops_up_running_low_leases(shared):
+    algorithm = get_algorithm("gcra")
+    worker = LeasingBackend(shared, lease_fraction=0.1, refill_threshold=0.25)
+
+    for _ in range(7):
+        worker.acquire("secret-pro-key", algorithm, 1000.0, 100, 60)
+    assert asyncio.run(worker.reconcile(1000.5)) == 0
+
+    worker.acquire("secret-pro-key", algorithm, 1000.5, 100, 60)
+    assert asyncio.run(worker.reconcile(1001.0)) == 1
+
+    lease = worker.leases["gcra:secret-pro-key"]
+    assert lease.remaining == 10
+    # The top-up happened in the background, not on the request path
+    assert worker.stats()["remote_calls"] == 1
+
+def test_leases_on_async_backend(shared):
+    algorithm = get_algorithm("token_bucket")
+    worker = LeasingBackend(shared, lease_fraction=0.2)
+
+    async def run():
+        return [await worker.acquire_async("10.0.0.1", algorithm, 1000.0, 5, 60) for _ in range(6)]
+
+    waits = asyncio.run(run())
+    assert waits[:5] == [0, 0, 0, 0, 0]
+    assert waits[5] > 0
+
+def test_multi_level_requests_are_all_or_nothing(shared):
+    algorithm = get_algorithm("fixed_window")
+    worker = LeasingBackend(shared, lease_fraction=0.5)
+    ip = QuotaCheck("ip:10.0.0.1", algorithm, 6, 60)
+
+    def key(client_id):
+        return QuotaCheck(client_id, algorithm, 2, 60)
+
+    # Leases of 1 unit for key-a and 3 for the IP; the second request takes
+    # key-a's last unit from the shared backend and one of the IP's lease
+    assert worker.acquire_all([key("key-a"), ip], 1000.0) == 0
+    assert worker.acquire_all([key("key-a"), ip], 1000.0) == 0
+    # Rejected on its own level, key-a keeps nothing of the IP's lease
+    assert worker.acquire_all([key("key-a"), ip], 1000.0) == 60
+    assert worker.leases["fixed_window:ip:10.0.0.1"].remaining == 1
+
+    other = LeasingBackend(shared, lease_fraction=0.5)
+
+    async def run():
+        return [
+            await other.acquire_all_async([key("key-a"), ip], 1000.0),
+            await other.acquire_all_async([key("key-b"), ip], 1000.0),
+        ]
+
+    assert asyncio.run(run()) == [60, 0]
+    # key-b leased the IP's 3 units left, the rejected request took none
+    assert shared.acquire("ip:10.0.0.1", algorithm, 1000.0, 6, 60) == 60
+    assert other.leases["fixed_window:ip:10.0.0.1"].remaining == 2
+
+def test_multi_level_requests_are_decided_from_local_leases(shared):
+    algorithm = get_algorithm("gcra")
+    worker = LeasingBackend(shared, lease_fraction=0.1)
+    checks = [QuotaCheck("secret-pro-key", algorithm, 100, 60), QuotaCheck("global", algorithm, 1000, 60)]
+
+    for _ in range(10):
+        assert worker.acquire_all(checks, 1000.0) == 0
+    assert worker.stats()["remote_calls"] == 1
+    assert worker.stats()["local_decisions"] == 9
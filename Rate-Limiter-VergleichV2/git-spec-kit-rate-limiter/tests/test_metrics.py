@@ -0,0 +1,59 @@
+import pytest
+from unittest.mock import patch
+from src import metrics
+from src.metrics import MetricsRegistry
+
+def test_render_prometheus_text_format():
+    registry = MetricsRegistry()
+    decisions = registry.counter("decisions_total", "Decisions.", ["tier", "decision"])
+    latency = registry.histogram("latency_seconds", "Latency.", [0.1, 1.0])
+    registry.gauge("entries", "Entries.", lambda: 42)
+
+    decisions.labels("free", "allowed").inc()
+    decisions.labels("free", "allowed").inc()
+    decisions.labels("pro", "denied").inc()
+    for value in (0.05, 0.1, 0.5, 3.0):
+        latency.observe(value)
+
+    assert registry.render() == "\n".join([
+        "# HELP decisions_total Decisions.",
+        "# TYPE decisions_total counter",
+        'decisions_total{tier="free",decision="allowed"} 2',
+        'decisions_total{tier="pro",decision="denied"} 1',
+        "# HELP latency_seconds Latency.",
+        "# TYPE latency_seconds histogram",
+        'latency_seconds_bucket{le="0.1"} 2',
+        'latency_seconds_bucket{le="1.0"} 3',
+        'latency_seconds_bucket{le="+Inf"} 4',
+        "latency_seconds_sum 3.65",
+        "latency_seconds_count 4",
+        "# HELP entries Entries.",
+        "# TYPE entries gauge",
+        "entries 42",
+    ]) + "\n"
+
+def test_duplicate_metric_names():
+    registry = MetricsRegistry()
+    registry.counter("requests_total", "Requests.")
+    with pytest.raises(ValueError):
+        registry.counter("requests_total", "Requests.")
+
+def test_integration_metrics_endpoint(client):
+    allowed = metrics.rate_limit_decisions.labels("free", "allowed")
+    denied = metrics.rate_limit_decisions.labels("free", "denied")
+    before = allowed.value, denied.value, metrics.rate_limit_decision_seconds.count, metrics.analyze_processing_seconds.count
+
+    with patch("src.main.expensive_computation"):
+        for i in range(6):
+            client.post("/analyze", json={"text": f"test {i}"})
+
+    assert (allowed.value, denied.value) == (before[0] + 5, before[1] + 1)
+    assert metrics.rate_limit_decision_seconds.count == before[2] + 6
+    assert metrics.analyze_processing_seconds.count == before[3] + 5
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert f'rate_limit_decisions_total{{tier="free",decision="denied"}} {int(denied.value)}' in response.text
+    assert "rate_limit_store_entries 2" in response.text  # client and IP level
+    assert 'rate_limit_decision_seconds_bucket{le="+Inf"}' in response.text
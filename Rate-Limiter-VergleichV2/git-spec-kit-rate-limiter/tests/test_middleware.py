@@ -0,0 +1,76 @@
+import asyncio
+import pytest
+from fastapi.testclient import TestClient
+from unittest.mock import patch
+from src.main import app
+from src.middleware import RateLimitMiddleware
+
+@pytest.fixture
+def middleware_client():
+    return TestClient(RateLimitMiddleware(app, paths=["/analyze"]))
+
+def test_admitted_requests_are_counted_once(middleware_client):
+    """
+    The dependency must not check again what the middleware admitted.
+    """
+    payload = {"text": "test"}
+    with patch("src.main.expensive_computation"):
+        for _ in range(5):
+            response = middleware_client.post("/analyze", json=payload)
+            assert response.status_code == 200
+            assert response.json()["status"] == "Processed for free tier"
+
+        response = middleware_client.post("/analyze", json=payload)
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "60"
+    assert response.json() == {"detail": "Rate limit exceeded"}
+
+def test_rejects_before_body_validation(middleware_client):
+    with patch("src.main.expensive_computation"):
+        for _ in range(5):
+            middleware_client.post("/analyze", json={"text": "test"})
+
+    # An invalid body would be a 422 if the app got to parse it
+    response = middleware_client.post("/analyze", content=b"{not json")
+    assert response.status_code == 429
+
+def test_pro_key_from_headers(middleware_client):
+    headers = {"x-api-key": "secret-pro-key"}
+    with patch("src.main.expensive_computation"):
+        for _ in range(6):
+            response = middleware_client.post("/analyze", json={"text": "test"}, headers=headers)
+            assert response.status_code == 200
+    assert response.json()["status"] == "Processed for pro tier"
+
+def test_unlimited_paths_pass_through(middleware_client):
+    for _ in range(10):
+        assert middleware_client.get("/health").status_code == 200
+
+def test_rejected_request_never_reaches_app():
+    calls = []
+
+    async def inner_app(scope, receive, send):
+        calls.append(scope["path"])
+        await receive()
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def receive():
+        calls.append("receive")
+        return {"type": "http.request", "body": b"{}", "more_body": False}
+
+    async def run():
+        middleware = RateLimitMiddleware(inner_app)
+        scope = {"type": "http", "method": "POST", "path": "/analyze", "headers": [], "client": ("10.0.0.1", 1234)}
+        statuses = []
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                statuses.append(message["status"])
+
+        for _ in range(6):
+            await middleware(dict(scope), receive, send)
+        return statuses
+
+    assert asyncio.run(run()) == [200] * 5 + [429]
+    assert calls == ["/analyze", "receive"] * 5
@@ -0,0 +1,146 @@
+import asyncio
+import random
+import time
+import pytest
+from unittest.mock import patch
+from src import rate_limiter
+from src.algorithms import ALGORITHMS, get_algorithm
+from src.backend import QuotaCheck
+from src.rate_limiter import InMemoryBackend, set_rate_limit_backend
+from src.store import RateLimitStore
+
+fakeredis = pytest.importorskip("fakeredis")
+pytest.importorskip("lupa")  # Lua scripting support for fakeredis
+
+from src.redis_backend import RedisBackend
+
+@pytest.fixture
+def redis_backend():
+    backend = RedisBackend(fakeredis.FakeAsyncRedis())
+    previous = rate_limiter.rate_limit_backend
+    set_rate_limit_backend(backend)
+    yield backend
+    set_rate_limit_backend(previous)
+
+@pytest.mark.parametrize("name", sorted(ALGORITHMS))
+def test_scripts_match_in_process_algorithms(name):
+    """
+    The Lua scripts must decide exactly like the Python algorithms.
+    """
+    algorithm = get_algorithm(name)
+    local = InMemoryBackend(RateLimitStore())
+    rng = random.Random(42)
+
+    async def run():
+        remote = RedisBackend(fakeredis.FakeAsyncRedis())
+        # Keys expire in real time, so the simulated clock must not lag behind it
+        now = float(int(time.time()))
+        for _ in range(400):
+            now += rng.choice([0.0, 0.5, 1.0, 3.0, 13.0])
+            client_id = rng.choice(["a", "b"])
+            min_units = rng.choice([0, 1, 1, 1, 2])
+            max_units = min_units + rng.choice([0, 0, 3])
+            refund = rng.choice([0, 0, 0, 1, 3])
+            expected = local.take(client_id, algorithm, now, 5, 60, min_units, max_units, refund)
+            actual = await remote.take_async(client_id, algorithm, now, 5, 60, min_units, max_units, refund)
+            assert actual[0] == expected[0], f"at t={now}"
+            assert actual[1] == pytest.approx(expected[1]), f"at t={now}"
+
+    asyncio.run(run())
+
+def test_keys_expire_with_their_window():
+    now = float(int(time.time()))
+
+    async def run():
+        client = fakeredis.FakeAsyncRedis()
+        backend = RedisBackend(client)
+        await backend.acquire_async("10.0.0.1", get_algorithm("fixed_window"), now, 5, 60)
+        return await client.pexpiretime("rate_limit:fixed_window:10.0.0.1")
+
+    assert asyncio.run(run()) == int((now + 60) * 1000)
+
+def test_take_many_is_pipelined():
+    now = float(int(time.time()))
+    algorithm = get_algorithm("gcra")
+
+    async def run():
+        backend = RedisBackend(fakeredis.FakeAsyncRedis())
+        return await backend.take_many_async([
+            ("a", algorithm, now, 10, 60, 0, 4, 0),
+            ("a", algorithm, now, 10, 60, 0, 10, 0),
+            ("a", algorithm, now, 10, 60, 0, 0, 2),
+            ("b", algorithm, now, 10, 60, 1, 1, 0),
+        ])
+
+    assert asyncio.run(run()) == [(4, 0.0), (6, 0.0), (0, 0.0), (1, 0.0)]
+
+def test_sync_check_is_rejected():
+    backend = RedisBackend(fakeredis.FakeAsyncRedis())
+    with pytest.raises(RuntimeError):
+        backend.acquire("10.0.0.1", get_algorithm("gcra"), 1000.0, 5, 60)
+
+def test_integration_free_user_limit_on_redis(redis_backend, client):
+    payload = {"text": "test"}
+    with patch("src.main.expensive_computation"):
+        for _ in range(5):
+            response = client.post("/analyze", json=payload)
+            assert response.status_code == 200
+
+        response = client.post("/analyze", json=payload)
+    assert response.status_code == 429
+    assert 0 < int(response.headers["Retry-After"]) <= 60
+
+@pytest.fixture
+def latency(monkeypatch):
+    """Replies arrive 10 ms after the server executed the commands."""
+    from redis.asyncio.client import Pipeline
+
+    def delayed(method):
+        async def call(*args, **kwargs):
+            result = await method(*args, **kwargs)
+            await asyncio.sleep(0.01)
+            return result
+        return call
+
+    monkeypatch.setattr(fakeredis.FakeAsyncRedis, "execute_command", delayed(fakeredis.FakeAsyncRedis.execute_command))
+    monkeypatch.setattr(Pipeline, "execute", delayed(Pipeline.execute))
+
+def test_rejected_request_takes_nothing_on_other_levels(latency):
+    """
+    An exhausted key must not hold its IP's last unit while it is rejected,
+    even for a moment: a concurrent request of another key on that IP passes.
+    """
+    now = float(int(time.time()))
+    algorithm = get_algorithm("fixed_window")
+
+    def checks(key):
+        return [QuotaCheck(key, algorithm, 1, 60), QuotaCheck("ip:10.0.0.1", algorithm, 2, 60)]
+
+    async def run():
+        backend = RedisBackend(fakeredis.FakeAsyncRedis())
+        assert await backend.acquire_all_async(checks("key-a"), now) == 0
+        return await asyncio.gather(
+            backend.acquire_all_async(checks("key-a"), now), backend.acquire_all_async(checks("key-b"), now)
+        )
+
+    rejected, admitted = asyncio.run(run())
+    assert rejected == 60
+    assert admitted == 0
+
+def test_acquire_all_mixes_algorithms():
+    now = float(int(time.time()))
+
+    async def run():
+        backend = RedisBackend(fakeredis.FakeAsyncRedis())
+        checks = [
+            QuotaCheck("key", get_algorithm("token_bucket"), 3, 60, 2),
+            QuotaCheck("ip", get_algorithm("gcra"), 10, 60, 2),
+        ]
+        return [await backend.acquire_all_async(checks, now) for _ in range(2)], await backend.take_async(
+            "ip", get_algorithm("gcra"), now, 10, 60, 0, 10
+        )
+
+    waits, (ip_left, _) = asyncio.run(run())
+    assert waits[0] == 0 and waits[1] > 0
+    # Only the admitted request was taken on the IP level
+    assert ip_left == 8
@@ -0,0 +1,86 @@
+import asyncio
+import pytest
+from unittest.mock import patch
+from src import main, result_cache
+from src.result_cache import RedisResultCache, ResultCache, cache_key
+
+@pytest.fixture
+def clock():
+    with patch("src.result_cache.time.monotonic") as monotonic:
+        monotonic.return_value = 100.0
+        yield monotonic
+
+def test_cache_key_depends_on_text_and_language():
+    assert cache_key("gut", "de") == cache_key("gut", "de")
+    assert cache_key("gut", "de") != cache_key("gut", "en")
+    assert cache_key("a", "b\0c") != cache_key("a\0b", "c")
+
+def test_hits_and_misses_are_counted(clock):
+    cache = ResultCache()
+    assert asyncio.run(cache.get("k")) is None
+    asyncio.run(cache.set("k", 0.5))
+    assert asyncio.run(cache.get("k")) == 0.5
+    assert (cache.hits, cache.misses) == (1, 1)
+
+def test_least_recently_used_result_is_dropped(clock):
+    cache = ResultCache(max_entries=2)
+
+    async def scenario():
+        await cache.set("a", 1.0)
+        await cache.set("b", 2.0)
+        await cache.get("a")  # b is now the least recently used
+        await cache.set("c", 3.0)
+        return [await cache.get(key) for key in ("a", "b", "c")]
+
+    assert asyncio.run(scenario()) == [1.0, None, 3.0]
+    assert len(cache) == 2
+
+def test_results_expire_after_the_ttl(clock):
+    cache = ResultCache(ttl=10.0)
+    asyncio.run(cache.set("k", 0.5))
+    clock.return_value += 9.0
+    assert asyncio.run(cache.get("k")) == 0.5
+    clock.return_value += 1.0
+    assert asyncio.run(cache.get("k")) is None
+    assert len(cache) == 0
+
+def test_redis_cache_is_shared():
+    fakeredis = pytest.importorskip("fakeredis")
+
+    async def scenario():
+        server = fakeredis.FakeServer()
+        first = RedisResultCache(fakeredis.FakeAsyncRedis(server=server), ttl=60.0)
+        second = RedisResultCache(fakeredis.FakeAsyncRedis(server=server), ttl=60.0)
+        await first.set("k", -0.25)
+        return await second.get("k"), await second.get("other")
+
+    assert asyncio.run(scenario()) == (-0.25, None)
+
+def test_redis_failure_counts_as_miss():
+    class BrokenClient:
+        async def get(self, key):
+            raise ConnectionError("down")
+
+        async def set(self, key, value, px):
+            raise ConnectionError("down")
+
+    cache = RedisResultCache(BrokenClient())
+    asyncio.run(cache.set("k", 0.5))
+    assert asyncio.run(cache.get("k")) is None
+    assert cache.misses == 1
+
+def test_integration_hits_skip_the_computation_but_not_the_limit(client, mock_time, monkeypatch):
+    monkeypatch.setattr(result_cache, "analysis_cache", ResultCache())
+    with patch("src.main.expensive_computation") as computation:
+        scores = [client.post("/analyze", json={"text": "Tolles Produkt"}).json()["sentiment_score"] for _ in range(5)]
+        assert client.post("/analyze", json={"text": "Tolles Produkt"}).status_code == 429
+    assert computation.call_count == 1
+    assert len(set(scores)) == 1
+    assert (result_cache.analysis_cache.hits, result_cache.analysis_cache.misses) == (4, 1)
+
+def test_integration_cache_can_be_disabled(client, monkeypatch):
+    monkeypatch.setattr(result_cache, "analysis_cache", None)
+    with patch("src.main.expensive_computation") as computation:
+        for _ in range(2):
+            assert client.post("/analyze", json={"text": "Tolles Produkt"}).status_code == 200
+    assert computation.call_count == 2
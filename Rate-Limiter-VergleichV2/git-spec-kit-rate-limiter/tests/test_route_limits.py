@@ -0,0 +1,78 @@
+import json
+import pytest
+from fastapi.testclient import TestClient
+from unittest.mock import patch
+from src import route_limits
+from src.main import app
+from src.middleware import RateLimitMiddleware
+from src.rate_limiter import rate_limit_store
+from src.route_limits import RouteLimit, compile_routes, load_routes
+
+@pytest.fixture
+def routes(monkeypatch):
+    def configure(config):
+        monkeypatch.setattr(route_limits, "route_table", load_routes(None) | compile_routes(config))
+    return configure
+
+def test_compile_routes():
+    table = compile_routes({
+        "post /analyze": {"free": 2, "pro": 50},
+        "GET /health": {"free": 10, "bucket": "health"},
+    })
+    assert table == {
+        ("POST", "/analyze"): RouteLimit({"free": 2, "pro": 50}),
+        ("GET", "/health"): RouteLimit({"free": 10}, "health"),
+    }
+    for config in ({"/analyze": {}}, {"POST /analyze": {"free": "5/minute"}}, {"POST /analyze": {"free": 0}}):
+        with pytest.raises(ValueError):
+            compile_routes(config)
+
+def test_load_routes(tmp_path):
+    defaults = {("POST", "/analyze"), ("POST", "/analyze/batch"), ("POST", "/analyze/jobs")}
+    assert load_routes(None) == {route: RouteLimit() for route in defaults}
+    path = tmp_path / "routes.json"
+    path.write_text(json.dumps({"GET /health": {"free": 10}}))
+    assert set(load_routes(str(path))) == defaults | {("GET", "/health")}
+
+def test_limit_for():
+    assert RouteLimit({"free": 2}).limit_for("free", None) == 2
+    assert RouteLimit({"free": 2}).limit_for("pro", None) is None
+    # Per-key limits belong to the client's main quota
+    assert RouteLimit({"pro": 50}).limit_for("pro", 500) == 500
+    assert RouteLimit({"pro": 50}, "search").limit_for("pro", 500) == 50
+
+def test_integration_route_quota(client, routes):
+    routes({"POST /analyze": {"free": 2}})
+    with patch("src.main.expensive_computation"):
+        assert [client.post("/analyze", json={"text": "test"}).status_code for _ in range(3)] == [200, 200, 429]
+
+def test_integration_buckets_are_separate_quotas(client, routes):
+    routes({"GET /health": {"free": 2, "bucket": "health"}})
+    assert [client.get("/health").status_code for _ in range(3)] == [200, 200, 429]
+    assert rate_limit_store["health:testclient"].request_count == 2
+
+    with patch("src.main.expensive_computation"):
+        assert client.post("/analyze", json={"text": "test"}).status_code == 200
+    assert rate_limit_store["testclient"].request_count == 1
+
+def test_integration_unconfigured_routes_are_not_limited(client):
+    assert all(client.get("/health").status_code == 200 for _ in range(10))
+    assert len(rate_limit_store) == 0
+
+def test_integration_analysis_routes_can_be_unlimited(client, monkeypatch):
+    # A table without the analysis routes: nothing is limited or charged there
+    monkeypatch.setattr(route_limits, "route_table", compile_routes({"GET /health": {"free": 10}}))
+    with patch("src.main.expensive_computation"):
+        assert client.post("/analyze", json={"text": "test"}).status_code == 200
+        assert client.post("/analyze/batch", json={"items": [{"text": "test"}]}).status_code == 200
+        assert client.post("/analyze/jobs", json={"text": "test"}).status_code == 202
+    assert len(rate_limit_store) == 0
+
+def test_integration_middleware_uses_the_route_table(routes):
+    routes({"POST /analyze": {"free": 1}})
+    middleware_client = TestClient(RateLimitMiddleware(app))
+    with patch("src.main.expensive_computation"):
+        assert middleware_client.post("/analyze", json={"text": "test"}).status_code == 200
+        assert middleware_client.post("/analyze", json={"text": "test"}).status_code == 429
+    # Not in the table
+    assert middleware_client.get("/").status_code == 200
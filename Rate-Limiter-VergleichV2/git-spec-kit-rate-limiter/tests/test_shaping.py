@@ -0,0 +1,95 @@
+import asyncio
+import pytest
+from unittest.mock import patch
+from src import rate_limiter
+from src.rate_limiter import check_rate_limit_async, RateLimitExceeded
+
+@pytest.fixture
+def shaping(mock_time, monkeypatch):
+    """Enable shaping with a 1s delay; waiting advances the mocked clock instead of sleeping."""
+    monkeypatch.setattr(rate_limiter, "MAX_DELAY_SECONDS", 1.0)
+    monkeypatch.setitem(rate_limiter.TIER_ALGORITHMS, "pro", "token_bucket")
+    real_sleep = asyncio.sleep
+    waits = []
+
+    async def sleep(seconds):
+        if seconds:
+            waits.append(seconds)
+            mock_time.return_value += seconds
+        await real_sleep(0)
+
+    with patch("src.rate_limiter.asyncio.sleep", sleep):
+        yield waits
+
+async def exhaust(client_id: str, user_tier: str, requests: int):
+    for _ in range(requests):
+        await check_rate_limit_async(client_id, user_tier)
+
+def test_request_waits_for_the_next_token(shaping):
+    async def scenario():
+        await exhaust("key-a", "pro", 100)
+        # 100 per minute: the next token comes after 0.6s
+        await check_rate_limit_async("key-a", "pro")
+
+    asyncio.run(scenario())
+    assert shaping == [pytest.approx(0.6)]
+    assert rate_limiter.parked_requests == 0
+
+def test_rejects_when_the_wait_exceeds_the_max_delay(shaping):
+    async def scenario():
+        await exhaust("10.0.0.1", "free", 5)
+        # The fixed window of the free tier ends in 60s
+        with pytest.raises(RateLimitExceeded) as excinfo:
+            await check_rate_limit_async("10.0.0.1", "free")
+        assert excinfo.value.retry_after == 60
+
+    asyncio.run(scenario())
+    assert shaping == []
+
+def test_parked_requests_are_capped(shaping, monkeypatch):
+    monkeypatch.setattr(rate_limiter, "MAX_PARKED", 1)
+
+    async def scenario():
+        await exhaust("key-a", "pro", 100)
+        await exhaust("key-b", "pro", 100)
+        parked = asyncio.create_task(check_rate_limit_async("key-a", "pro"))
+        await asyncio.sleep(0)
+        assert rate_limiter.parked_requests == 1
+        # key-b would have to wait as well, but no more requests may
+        with pytest.raises(RateLimitExceeded):
+            await check_rate_limit_async("key-b", "pro", limit=50)
+        await parked
+
+    asyncio.run(scenario())
+
+def test_waits_again_if_another_request_took_the_token(shaping, monkeypatch):
+    monkeypatch.setattr(rate_limiter, "MAX_DELAY_SECONDS", 2.0)
+
+    async def scenario():
+        await exhaust("key-a", "pro", 100)
+        parked = asyncio.create_task(check_rate_limit_async("key-a", "pro"))
+        await asyncio.sleep(0)
+        # Arrives just as the token is there, before the parked request retries
+        await check_rate_limit_async("key-a", "pro")
+        await parked
+
+    asyncio.run(scenario())
+    assert shaping == [pytest.approx(0.6), pytest.approx(0.6)]
+
+def test_disabled_by_default(mock_time):
+    async def scenario():
+        await exhaust("10.0.0.1", "free", 5)
+        with pytest.raises(RateLimitExceeded):
+            await check_rate_limit_async("10.0.0.1", "free")
+
+    asyncio.run(scenario())
+
+def test_integration_delayed_instead_of_rejected(client, shaping, monkeypatch):
+    monkeypatch.setitem(rate_limiter.TIER_ALGORITHMS, "free", "token_bucket")
+    monkeypatch.setattr(rate_limiter, "LIMIT_FREE", 120)
+
+    with patch("src.main.expensive_computation"):
+        for _ in range(121):
+            response = client.post("/analyze", json={"text": "test"})
+            assert response.status_code == 200
+    assert shaping == [pytest.approx(0.5)]
@@ -0,0 +1,116 @@
+import multiprocessing
+import pytest
+from src import rate_limiter
+from src.algorithms import get_algorithm
+from src.backend import QuotaCheck
+from src.rate_limiter import check_rate_limit, RateLimitExceeded, set_rate_limit_backend
+from src.shared_memory_backend import SharedMemoryBackend
+
+try:
+    import fcntl  # noqa: F401
+except ImportError:
+    pytest.skip("shared memory backend requires POSIX file locks", allow_module_level=True)
+
+@pytest.fixture
+def shm_path(tmp_path):
+    return str(tmp_path / "rate-limit.shm")
+
+@pytest.fixture
+def shm_backend(shm_path):
+    backend = SharedMemoryBackend(shm_path, buckets=64)
+    previous = rate_limiter.rate_limit_backend
+    set_rate_limit_backend(backend)
+    yield backend
+    set_rate_limit_backend(previous)
+    backend.close()
+
+def test_free_user_limit_on_shared_memory(shm_backend, mock_time):
+    for _ in range(5):
+        check_rate_limit("127.0.0.1", "free")
+
+    with pytest.raises(RateLimitExceeded) as excinfo:
+        check_rate_limit("127.0.0.1", "free")
+    assert excinfo.value.retry_after == 60
+
+    mock_time.return_value += 61
+    check_rate_limit("127.0.0.1", "free")
+
+@pytest.mark.parametrize("name", ["fixed_window", "sliding_window", "gcra", "token_bucket"])
+def test_workers_share_one_quota(shm_path, name):
+    """
+    Two backends mapping the same file behave like two workers on one host.
+    """
+    algorithm = get_algorithm(name)
+    worker_a = SharedMemoryBackend(shm_path, buckets=64)
+    worker_b = SharedMemoryBackend(shm_path, buckets=64)
+    try:
+        admitted = 0
+        for i in range(10):
+            worker = worker_a if i % 2 else worker_b
+            if worker.acquire("10.0.0.1", algorithm, 1020.0, 5, 60) == 0:
+                admitted += 1
+        assert admitted == 5
+        assert worker_a.stats(1020.0)["entries"] == 1
+    finally:
+        worker_a.close()
+        worker_b.close()
+
+def test_full_bucket_reuses_slot_expiring_next(shm_path):
+    backend = SharedMemoryBackend(shm_path, buckets=1, slots_per_bucket=2)
+    algorithm = get_algorithm("fixed_window")
+    try:
+        backend.acquire("a", algorithm, 1000.0, 5, 60)
+        backend.acquire("b", algorithm, 1010.0, 5, 60)
+        backend.acquire("c", algorithm, 1020.0, 5, 60)
+
+        # "a" expired first and was overwritten, it starts with a fresh quota
+        assert backend.stats(1020.0)["entries"] == 2
+        for _ in range(4):
+            assert backend.acquire("b", algorithm, 1020.0, 5, 60) == 0
+        assert backend.acquire("b", algorithm, 1020.0, 5, 60) > 0
+    finally:
+        backend.close()
+
+def test_acquire_all_is_all_or_nothing(shm_path):
+    # One bucket and many levels: every lock and slot is shared
+    backend = SharedMemoryBackend(shm_path, buckets=1)
+    algorithm = get_algorithm("fixed_window")
+    ip = QuotaCheck("ip:10.0.0.1", algorithm, 3, 60)
+    service = QuotaCheck("global", algorithm, 100, 60)
+    try:
+        assert backend.acquire_all([QuotaCheck("key-a", algorithm, 1, 60), ip, service], 1000.0) == 0
+        assert backend.acquire_all([QuotaCheck("key-a", algorithm, 1, 60), ip, service], 1000.0) == 60
+        # The rejected request took nothing on the IP and service levels
+        assert backend.take("ip:10.0.0.1", algorithm, 1000.0, 3, 60, 0, 3) == (2, 0.0)
+        assert backend.take("global", algorithm, 1000.0, 100, 60, 0, 100) == (99, 0.0)
+    finally:
+        backend.close()
+
+def test_incompatible_layout_is_rejected(shm_path):
+    SharedMemoryBackend(shm_path, buckets=64).close()
+    with pytest.raises(ValueError):
+        SharedMemoryBackend(shm_path, buckets=128)
+
+def _hammer(path, attempts, results):
+    backend = SharedMemoryBackend(path, buckets=64)
+    algorithm = get_algorithm("fixed_window")
+    admitted = sum(
+        1 for _ in range(attempts)
+        if backend.acquire("10.0.0.1", algorithm, 1000.0, 50, 60) == 0
+    )
+    backend.close()
+    results.put(admitted)
+
+@pytest.mark.skipif("fork" not in multiprocessing.get_all_start_methods(), reason="needs fork")
+def test_concurrent_processes_never_over_admit(shm_path):
+    SharedMemoryBackend(shm_path, buckets=64).close()
+    context = multiprocessing.get_context("fork")
+    results = context.Queue()
+    processes = [context.Process(target=_hammer, args=(shm_path, 40, results)) for _ in range(4)]
+    for process in processes:
+        process.start()
+    admitted = sum(results.get(timeout=30) for _ in processes)
+    for process in processes:
+        process.join()
+
+    assert admitted == 50
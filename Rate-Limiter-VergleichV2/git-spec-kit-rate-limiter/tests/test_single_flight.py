@@ -0,0 +1,91 @@
+import asyncio
+import threading
+import httpx
+from unittest.mock import patch
+from src import main, result_cache
+from src.single_flight import SingleFlight
+
+def counting_call(calls, result="result"):
+    async def call():
+        calls.append(result)
+        await asyncio.sleep(0.01)
+        return result
+    return call
+
+def test_concurrent_callers_share_one_call():
+    flights, calls = SingleFlight(), []
+
+    async def scenario():
+        return await asyncio.gather(*(flights.do("k", counting_call(calls)) for _ in range(5)))
+
+    results = asyncio.run(scenario())
+    assert calls == ["result"]
+    assert [result for result, _ in results] == ["result"] * 5
+    assert [shared for _, shared in results] == [False, True, True, True, True]
+    assert len(flights) == 0
+
+def test_different_keys_and_later_callers_run_again():
+    flights, calls = SingleFlight(), []
+
+    async def scenario():
+        await asyncio.gather(flights.do("a", counting_call(calls, "a")), flights.do("b", counting_call(calls, "b")))
+        await flights.do("a", counting_call(calls, "a"))
+
+    asyncio.run(scenario())
+    assert calls == ["a", "b", "a"]
+
+def test_failure_reaches_every_caller():
+    flights = SingleFlight()
+
+    async def failing():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("model unavailable")
+
+    async def scenario():
+        return await asyncio.gather(*(flights.do("k", failing) for _ in range(3)), return_exceptions=True)
+
+    assert all(isinstance(result, RuntimeError) for result in asyncio.run(scenario()))
+
+def test_caller_going_away_does_not_cancel_the_call():
+    flights, calls = SingleFlight(), []
+
+    async def scenario():
+        first = asyncio.create_task(flights.do("k", counting_call(calls)))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(flights.do("k", counting_call(calls)))
+        await asyncio.sleep(0)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(scenario()) == ("result", True)
+    assert calls == ["result"]
+
+def test_integration_identical_concurrent_requests_compute_once(monkeypatch):
+    # Without the result cache, so only single-flight can save computations
+    monkeypatch.setattr(result_cache, "analysis_cache", None)
+    started, release = threading.Event(), threading.Event()
+
+    def computation():
+        started.set()
+        release.wait(5)
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            headers = {"x-api-key": "secret-pro-key"}
+            requests = [
+                asyncio.create_task(client.post("/analyze", json={"text": "Beliebter Text"}, headers=headers))
+                for _ in range(10)
+            ]
+            # All requests are in flight before the first computation ends
+            await asyncio.to_thread(started.wait, 5)
+            await asyncio.sleep(0.05)
+            assert len(main.analysis_flights) == 1
+            release.set()
+            return await asyncio.gather(*requests)
+
+    with patch("src.main.expensive_computation", side_effect=computation) as expensive:
+        responses = asyncio.run(scenario())
+    assert [response.status_code for response in responses] == [200] * 10
+    assert len({response.json()["sentiment_score"] for response in responses}) == 1
+    assert expensive.call_count == 1
@@ -0,0 +1,73 @@
+import math
+import pytest
+from src import rate_limiter
+from src.algorithms import get_algorithm
+from src.backend import QuotaCheck
+from src.rate_limiter import InMemoryBackend, create_backend
+from src.sketch_backend import SketchBackend
+from src.store import RateLimitStore
+
+FIXED_WINDOW = get_algorithm("fixed_window")
+
+def admitted(backend, client_id: str, now: float, requests: int, limit: int = 5) -> int:
+    return sum(backend.acquire(client_id, FIXED_WINDOW, now, limit, 60) == 0 for _ in range(requests))
+
+def test_limits_each_client():
+    backend = SketchBackend(width=4096)
+    assert [admitted(backend, f"10.0.0.{i}", 1000.0, 8) for i in range(20)] == [5] * 20
+    # Different limits share the sketch
+    assert admitted(backend, "key-a", 1000.0, 150, limit=100) == 100
+
+def test_never_admits_over_the_limit_despite_collisions():
+    # Far more clients than counters: estimates are much too high, never too low
+    backend = SketchBackend(width=64)
+    counts = [admitted(backend, f"10.0.{i // 256}.{i % 256}", 1000.0, 8) for i in range(1000)]
+    assert max(counts) <= 5
+    assert counts[0] == 5
+
+def test_error_bound():
+    width, clients, limit = 4096, 500, 5
+    backend = SketchBackend(width=width)
+    counts = [admitted(backend, f"10.0.{i // 256}.{i % 256}", 1000.0, limit) for i in range(clients)]
+    # Overestimated by more than e / width * N quotas with probability exp(-4) < 2% per client
+    bound = math.e / width * clients
+    early = sum(count < limit - math.ceil(bound * limit) for count in counts)
+    assert early <= 0.05 * clients
+
+def test_sliding_window_and_refund():
+    backend = SketchBackend(width=4096)
+    assert admitted(backend, "10.0.0.1", 1000.0, 5) == 5
+    # Window [960, 1020) is full; at 1020 its 5 requests still weigh 100%
+    assert backend.acquire("10.0.0.1", FIXED_WINDOW, 1000.0, 5, 60) == pytest.approx(32.0)
+    assert admitted(backend, "10.0.0.1", 1032.0, 5) == 1
+
+    assert backend.take("10.0.0.1", FIXED_WINDOW, 1032.0, 5, 60, 0, 0, 1) == (0, 0.0)
+    assert admitted(backend, "10.0.0.1", 1032.0, 5) == 1
+
+def test_new_clients_go_to_the_sketch_when_the_store_is_full():
+    store = RateLimitStore(max_entries=100)
+    backend = InMemoryBackend(store, SketchBackend(width=4096), sketch_threshold=3)
+    global_check = QuotaCheck("global", FIXED_WINDOW, 1000, 60, pinned=True)
+
+    for i in range(10):
+        checks = [QuotaCheck(f"10.0.0.{i}", FIXED_WINDOW, 5, 60), global_check]
+        assert [backend.acquire_all(checks, 1000.0) == 0 for _ in range(6)] == [True] * 5 + [False]
+
+    # The store did not grow past the threshold and evicted nobody
+    assert list(store) == ["10.0.0.0", "10.0.0.1", "10.0.0.2"]
+    assert store.evicted == 0
+    assert store.pinned["global"].request_count == 50
+
+    # Tracked clients stay exact, also through `take`
+    assert admitted(backend, "10.0.0.0", 1000.0, 1) == 0
+    assert admitted(backend, "10.0.0.9", 1000.0, 1) == 0
+
+    # Once tracked clients expire, new clients are exact again
+    assert admitted(backend, "10.0.1.1", 1100.0, 1) == 1
+    assert "10.0.1.1" in store
+
+def test_create_backend(monkeypatch):
+    assert isinstance(create_backend("sketch"), SketchBackend)
+    assert create_backend("memory").sketch_threshold == rate_limiter.MAX_STORE_ENTRIES
+    monkeypatch.setattr(rate_limiter, "SKETCH_THRESHOLD", 0)
+    assert create_backend("memory").sketch is None
@@ -0,0 +1,88 @@
+import asyncio
+import pytest
+from fastapi.testclient import TestClient
+from unittest.mock import patch
+from src.algorithms import GcraState, RateLimitEntry, TokenBucketState
+from src.main import app
+from src.rate_limiter import check_rate_limit, RateLimitExceeded, rate_limit_store
+from src.snapshot import StoreSnapshotter
+from src.store import RateLimitStore
+
+def test_round_trip_drops_expired_entries(tmp_path):
+    store = RateLimitStore()
+    store["a"] = RateLimitEntry(request_count=3, window_start_time=1000.0)
+    store.schedule("a", 1060.0)
+    store["b"] = GcraState(theoretical_arrival_time=1010.0)
+    store.schedule("b", 1010.0)
+    store["c"] = TokenBucketState(tokens=2.5, last_refill_time=1000.0)
+    store.schedule("c", 1030.0)
+    store["fresh"] = RateLimitEntry(request_count=0, window_start_time=1000.0)  # never scheduled
+
+    snapshotter = StoreSnapshotter(store, str(tmp_path / "limits.snap"))
+    assert snapshotter.save(1000.0) == 3
+
+    restored = RateLimitStore()
+    assert StoreSnapshotter(restored, snapshotter.path).load(1020.0) == 2
+    assert list(restored) == ["a", "c"]
+    assert restored["a"] == RateLimitEntry(request_count=3, window_start_time=1000.0)
+    assert restored["c"] == TokenBucketState(tokens=2.5, last_refill_time=1000.0)
+    assert restored.expires_at("a") == 1060.0
+
+    # Restored entries still expire
+    restored.sweep(1061.0)
+    assert list(restored) == []
+
+def test_snapshot_is_compact(tmp_path):
+    store = RateLimitStore()
+    for i in range(1000):
+        store[f"10.0.{i // 256}.{i % 256}"] = RateLimitEntry(request_count=1, window_start_time=1000.0)
+        store.schedule(f"10.0.{i // 256}.{i % 256}", 1060.0)
+    snapshotter = StoreSnapshotter(store, str(tmp_path / "limits.snap"))
+    snapshotter.save(1000.0)
+    assert (tmp_path / "limits.snap").stat().st_size < 1000 * 50
+    assert snapshotter.stats()["last_write_seconds"] is not None
+
+def test_missing_and_corrupt_snapshots(tmp_path):
+    path = tmp_path / "limits.snap"
+    snapshotter = StoreSnapshotter(RateLimitStore(), str(path))
+    assert snapshotter.load(1000.0) == 0
+
+    path.write_bytes(b"garbage")
+    with pytest.raises(ValueError):
+        snapshotter.load(1000.0)
+
+    store = RateLimitStore()
+    store["a"] = RateLimitEntry(request_count=3, window_start_time=1000.0)
+    store.schedule("a", 1060.0)
+    StoreSnapshotter(store, str(path)).save(1000.0)
+    path.write_bytes(path.read_bytes()[:-3])
+    with pytest.raises(ValueError):
+        snapshotter.load(1000.0)
+
+def test_save_async(tmp_path):
+    store = RateLimitStore()
+    for i in range(12_000):
+        store[str(i)] = GcraState(theoretical_arrival_time=2e9)
+        store.schedule(str(i), 2e9)
+    snapshotter = StoreSnapshotter(store, str(tmp_path / "limits.snap"))
+
+    assert asyncio.run(snapshotter.save_async()) == 12_000
+    restored = RateLimitStore()
+    assert StoreSnapshotter(restored, snapshotter.path).load(1e9) == 12_000
+
+def test_warm_restart_keeps_quota(tmp_path, monkeypatch, mock_time):
+    """
+    A client that used its quota before a restart stays limited after it.
+    """
+    monkeypatch.setenv("RATE_LIMIT_SNAPSHOT_PATH", str(tmp_path / "limits.snap"))
+    with patch("src.main.time.time", return_value=1000.0), TestClient(app):
+        for _ in range(5):
+            check_rate_limit("10.0.0.1", "free")
+
+    # Restart
+    rate_limit_store.clear()
+    mock_time.return_value = 1030.0
+    with patch("src.main.time.time", return_value=1030.0), TestClient(app):
+        with pytest.raises(RateLimitExceeded) as excinfo:
+            check_rate_limit("10.0.0.1", "free")
+    assert excinfo.value.retry_after == 30
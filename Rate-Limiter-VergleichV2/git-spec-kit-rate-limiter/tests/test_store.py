@@ -0,0 +1,96 @@
+import pytest
+from src.store import RateLimitStore
+from src.rate_limiter import check_rate_limit, rate_limit_store, TIER_ALGORITHMS
+
+def test_lru_eviction_at_capacity():
+    store = RateLimitStore(max_entries=2)
+    store["a"] = 1
+    store["b"] = 2
+
+    # Touch "a" so "b" becomes the least recently used entry
+    assert store.get("a") == 1
+    store["c"] = 3
+
+    assert "a" in store
+    assert "b" not in store
+    assert "c" in store
+    assert store.stats()["evicted"] == 1
+
+def test_sweep_drops_expired_entries_only():
+    store = RateLimitStore()
+    store.sweep(1000.0)
+    store["short"] = 1
+    store["long"] = 2
+    store.schedule("short", 1010.0)
+    store.schedule("long", 1100.0)
+
+    assert store.sweep(1009.0) == 0
+    assert store.sweep(1010.0) == 1
+    assert "short" not in store
+    assert "long" in store
+
+    assert store.sweep(1100.0) == 1
+    assert len(store) == 0
+    assert store.stats()["expired"] == 2
+
+def test_reschedule_moves_expiry():
+    store = RateLimitStore()
+    store.sweep(1000.0)
+    store["a"] = 1
+    store.schedule("a", 1010.0)
+    store.schedule("a", 1050.0)
+
+    assert store.sweep(1020.0) == 0
+    assert store.sweep(1050.0) == 1
+
+def test_expiry_beyond_one_wheel_rotation():
+    store = RateLimitStore(slots=8)
+    store.sweep(1000.0)
+    store["a"] = 1
+    store.schedule("a", 1020.0)
+
+    # The slot of tick 1020 is visited at tick 1012 already, the key must stay
+    assert store.sweep(1012.0) == 0
+    assert "a" in store
+    assert store.sweep(1020.0) == 1
+
+def test_long_idle_gap_sweeps_everything_due():
+    store = RateLimitStore(slots=8)
+    store.sweep(1000.0)
+    for i in range(20):
+        store[f"client-{i}"] = i
+        store.schedule(f"client-{i}", 1000.0 + i)
+
+    assert store.sweep(5000.0) == 20
+    assert len(store) == 0
+
+def test_delete_unschedules():
+    store = RateLimitStore()
+    store.sweep(1000.0)
+    store["a"] = 1
+    store.schedule("a", 1010.0)
+    del store["a"]
+
+    assert store.stats()["scheduled"] == 0
+    assert store.sweep(1010.0) == 0
+
+def test_invalid_capacity():
+    with pytest.raises(ValueError):
+        RateLimitStore(max_entries=0)
+
+@pytest.mark.parametrize("name", ["fixed_window", "sliding_window", "gcra", "token_bucket"])
+def test_idle_clients_are_expired(mock_time, monkeypatch, name):
+    """
+    Clients that stopped sending requests leave the store once their state is stale.
+    """
+    monkeypatch.setitem(TIER_ALGORITHMS, "free", name)
+
+    for i in range(50):
+        check_rate_limit(f"10.0.0.{i}", "free")
+    assert len(rate_limit_store) == 50
+
+    mock_time.return_value += 121
+    check_rate_limit("10.0.1.1", "free")
+
+    assert len(rate_limit_store) == 1
+    assert rate_limit_store.stats()["expired"] == 50
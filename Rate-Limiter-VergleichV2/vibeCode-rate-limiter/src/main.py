@@ -1,19 +1,122 @@
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import os
 import time
 import random
-from typing import Optional
-from fastapi import FastAPI, Header, HTTPException, Request
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+from fastapi import Depends, FastAPI, Header, HTTPException, Request
+from limits import RateLimitItem, parse
 from pydantic import BaseModel
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
 from slowapi.middleware import SlowAPIMiddleware
 
+logger = logging.getLogger(__name__)
+
 limiter = Limiter(key_func=get_remote_address)
 
+# --- API Keys ---
+# Datei mit einer Zeile pro Key: "<sha256 hex> <tier> [limit pro Minute]"
+API_KEYS_PATH = os.environ.get("API_KEYS_PATH")
+
+@lru_cache(maxsize=1024)
+def hash_key(api_key: str) -> str:
+    # Häufige Keys werden nur einmal gehasht
+    return hashlib.sha256(api_key.encode()).hexdigest()
+
+def load_api_key_quotas(path: str) -> Dict[str, RateLimitItem]:
+    # Fehlerhafte Zeilen: ValueError mit Zeilennummer, statt still ignoriert zu werden
+    quotas = {}
+    with open(path, encoding="utf-8") as key_file:
+        for line_number, line in enumerate(key_file, 1):
+            fields = line.split()
+            if not fields or fields[0].startswith("#"):
+                continue
+            if len(fields) not in (2, 3) or len(fields[0]) != 64 or (len(fields) == 3 and not fields[2].isdigit()):
+                raise ValueError(f"{path}:{line_number}: expected '<sha256 hex> <tier> [limit]'")
+            key_hash, tier = fields[0].lower(), fields[1]
+            if tier == "pro":
+                quotas[key_hash] = parse(f"{fields[2] if len(fields) > 2 else 100}/minute")
+    return quotas
+
+# Nur Hashes der Pro-Keys; wird beim Neuladen als Ganzes ersetzt
+api_key_quotas = load_api_key_quotas(API_KEYS_PATH) if API_KEYS_PATH else {hash_key("secret-pro-key"): parse("100/minute")}
+
+# --- Limits pro Route ---
+# JSON-Datei: {"GET /health": {"free": "60/minute", "pro": "600/minute"}}
+# Tiers ohne Eintrag: Pro-Keys nutzen ihr eigenes Kontingent, Free-User sind unbegrenzt.
+ROUTE_LIMITS_PATH = os.environ.get("ROUTE_LIMITS_PATH")
+DEFAULT_ROUTE_LIMITS = {"POST /analyze": {"free": "5/minute"}}
+
+def compile_route_limits(config: Dict[str, Dict[str, str]]) -> Dict[Tuple[str, str], Dict[str, RateLimitItem]]:
+    # Limit-Strings werden einmal beim Start geparst, pro Request bleibt ein Dict-Lookup
+    table = {}
+    for route, limits_by_tier in config.items():
+        method, _, path = route.partition(" ")
+        table[(method.upper(), path)] = {tier: parse(limit) for tier, limit in limits_by_tier.items()}
+    return table
+
+def load_route_limits(path: Optional[str]) -> Dict[Tuple[str, str], Dict[str, RateLimitItem]]:
+    config = dict(DEFAULT_ROUTE_LIMITS)
+    if path:
+        with open(path, encoding="utf-8") as routes_file:
+            config.update(json.load(routes_file))
+    return compile_route_limits(config)
+
+route_limits = load_route_limits(ROUTE_LIMITS_PATH)
+
+# --- Worker-Pool ---
+# Teure Berechnungen laufen im Pool, damit die Event-Loop weiter Anfragen bedient.
+# "thread" für Arbeit, die den GIL freigibt (Sleep, I/O), "process" für CPU-lastigen Python-Code.
+COMPUTE_EXECUTOR = os.environ.get("COMPUTE_EXECUTOR", "thread")
+COMPUTE_WORKERS = int(os.environ.get("COMPUTE_WORKERS", "8"))
+# Berechnungen, die höchstens auf einen freien Worker warten; darüber gibt es 503
+COMPUTE_QUEUE = int(os.environ.get("COMPUTE_QUEUE", "64"))
+compute_executor = (ProcessPoolExecutor if COMPUTE_EXECUTOR == "process" else ThreadPoolExecutor)(max_workers=COMPUTE_WORKERS)
+compute_pending = 0
+
+async def run_computation(fn, *args):
+    global compute_pending
+    if compute_pending >= COMPUTE_WORKERS + COMPUTE_QUEUE:
+        raise HTTPException(status_code=503, detail="Service overloaded", headers={"Retry-After": "1"})
+    compute_pending += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(compute_executor, fn, *args)
+    finally:
+        compute_pending -= 1
+
+async def reload_api_keys(interval: float = 5.0):
+    global api_key_quotas
+    version = os.stat(API_KEYS_PATH).st_mtime_ns
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            current = os.stat(API_KEYS_PATH).st_mtime_ns
+            if current != version:
+                api_key_quotas = await asyncio.to_thread(load_api_key_quotas, API_KEYS_PATH)
+                version = current
+        except (OSError, ValueError):
+            logger.exception("Reloading API keys from %s failed, keeping the previous keys", API_KEYS_PATH)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    task = asyncio.create_task(reload_api_keys()) if API_KEYS_PATH else None
+    yield
+    if task is not None:
+        task.cancel()
+
 app = FastAPI(
     title="Sentiment Analysis Service (Base Project)",
     description="Eine API, die Text analysiert. Simuliert teure Berechnungen.",
-    version="0.1.0"
+    version="0.1.0",
+    lifespan=lifespan
 )
 
 app.state.limiter = limiter
@@ -23,10 +126,24 @@ app.add_middleware(SlowAPIMiddleware)
 def rate_limit_key(request: Request):
     return request.headers.get("x-api-key") or get_remote_address(request)
 
-def get_rate_limit_quota(key: str):
-    if key == "secret-pro-key":
-        return "100/minute"
-    return "5/minute"
+async def enforce_route_limit(request: Request):
+    limits_by_tier = route_limits.get((request.method, request.scope["route"].path))
+    if limits_by_tier is None:
+        return
+    key = rate_limit_key(request)
+    key_quota = api_key_quotas.get(hash_key(key))
+    item = limits_by_tier.get("pro" if key_quota is not None else "free", key_quota)
+    if item is None:
+        return
+    # Eigener Zähler pro Route und Methode, gleicher Speicher wie der slowapi-Limiter
+    route = (request.method, request.scope["route"].path)
+    if not limiter.limiter.hit(item, key, *route):
+        reset_time = limiter.limiter.get_window_stats(item, key, *route).reset_time
+        raise HTTPException(
+            status_code=429,
+            detail=f"Rate limit exceeded: {item}",
+            headers={"Retry-After": str(max(1, math.ceil(reset_time - time.time())))},
+        )
 
 # --- Datenmodelle ---
 class AnalysisRequest(BaseModel):
@@ -51,16 +168,15 @@ def expensive_computation():
 
 # --- Endpoints ---
 
-@app.get("/")
+@app.get("/", dependencies=[Depends(enforce_route_limit)])
 async def root():
     return {"message": "Service is online. Use /analyze to process text."}
 
-@app.get("/health")
+@app.get("/health", dependencies=[Depends(enforce_route_limit)])
 async def health_check():
     return {"status": "ok", "load": "low"}
 
-@app.post("/analyze", response_model=AnalysisResponse)
-@limiter.limit(get_rate_limit_quota, key_func=rate_limit_key)
+@app.post("/analyze", response_model=AnalysisResponse, dependencies=[Depends(enforce_route_limit)])
 async def analyze_text(
     request: Request,
     analysis_request: AnalysisRequest,
@@ -74,7 +190,7 @@ async def analyze_text(
     
     # 1. Logik für Authentifizierung (Mock)
     user_tier = "free"
-    if x_api_key == "secret-pro-key":
+    if x_api_key and hash_key(x_api_key) in api_key_quotas:
         user_tier = "pro"
     
     print(f"Request from User-Tier: {user_tier} | IP: [Simulated]")
@@ -82,8 +198,8 @@ async def analyze_text(
     # 2. Start der 'teuren' Verarbeitung
     start_time = time.time()
     
-    # Simuliere Arbeit (CPU-intensiv)
-    expensive_computation()
+    # Simuliere Arbeit (CPU-intensiv) im Worker-Pool
+    await run_computation(expensive_computation)
     
     # Generiere Dummy-Ergebnis
     sentiment = random.uniform(-1.0, 1.0)
@@ -1,4 +1,8 @@
+import asyncio
 import pytest
+from types import SimpleNamespace
+from fastapi import HTTPException
+from starlette.requests import Request
 from fastapi.testclient import TestClient
 from src.main import app, expensive_computation
 from unittest.mock import patch
@@ -59,4 +63,47 @@ def test_rate_limit_pro_user():
             json={"text": "test"},
             headers={"x-api-key": "secret-pro-key"}
         )
-        assert response.status_code == 429
\ No newline at end of file
+        assert response.status_code == 429
+
+
+def test_route_limits_from_config():
+    from src import main
+
+    routes = main.compile_route_limits({"GET /health": {"free": "2/minute"}})
+    with patch.object(main, "route_limits", routes), patch("src.main.get_remote_address", return_value="127.0.0.3"):
+        assert [client.get("/health").status_code for _ in range(3)] == [200, 200, 429]
+        # Nicht konfigurierte Routen sind unbegrenzt
+        assert all(client.post("/analyze", json={"text": "test"}).status_code == 200 for _ in range(10))
+
+
+def test_route_limits_per_method():
+    from src import main
+
+    def request(method):
+        return Request({
+            "type": "http", "method": method, "path": "/health", "headers": [],
+            "client": ("127.0.0.4", 0), "route": SimpleNamespace(path="/health"),
+        })
+
+    routes = main.compile_route_limits({"GET /health": {"free": "2/minute"}, "POST /health": {"free": "2/minute"}})
+    with patch.object(main, "route_limits", routes):
+        for _ in range(2):
+            asyncio.run(main.enforce_route_limit(request("GET")))
+        # Eigener Zähler für POST auf demselben Pfad
+        for _ in range(2):
+            asyncio.run(main.enforce_route_limit(request("POST")))
+        with pytest.raises(HTTPException) as excinfo:
+            asyncio.run(main.enforce_route_limit(request("POST")))
+        assert excinfo.value.status_code == 429
+
+
+def test_malformed_api_key_file_is_rejected(tmp_path):
+    from src import main
+
+    path = tmp_path / "keys.txt"
+    path.write_text(f"# Kommentar\n{main.hash_key('a')} pro 50\n{main.hash_key('b')}\n")
+    with pytest.raises(ValueError, match=":3:"):
+        main.load_api_key_quotas(str(path))
+
+    path.write_text(f"{main.hash_key('a')} pro 50\n{main.hash_key('b')} free\n")
+    assert main.load_api_key_quotas(str(path)) == {main.hash_key("a"): main.parse("50/minute")}